@@ -0,0 +1,122 @@
+"""
+Benchmark of the toot model of the mastodon extension against pandas.
+
+Runs the parsing and metadata filtering of a batch of toots in a fresh
+interpreter, once with the __slots__ based Toot records and generators used
+by the extension and once with the pandas DataFrame it used before, and
+reports the import time, the processing time, the peak memory allocated by
+the processing (tracemalloc) and the peak RSS of the process:
+
+    python benchmarks/bench_mastodon_pipeline.py --count 200
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "html")
+MASTODON_PATH = os.path.join(HTML_PATH, "extensions", "mastodon")
+
+# Both variants get the toots as JSON on stdin and print their measurements as JSON
+TOOT_SCRIPT = """
+import sys, json, time, resource, tracemalloc
+from datetime import datetime, timedelta, timezone
+toots = json.load(sys.stdin)
+start = time.perf_counter()
+sys.path[:0] = sys.argv[1:3]
+from toot import parse_toots
+from post_filter import get_removal_reason
+import_time = time.perf_counter() - start
+
+tracemalloc.start()
+start = time.perf_counter()
+not_older_then = datetime.now(timezone.utc) - timedelta(hours=3)
+kept = [toot for toot in parse_toots((toot, "bench") for toot in toots)
+        if get_removal_reason(toot, not_older_then) is None]
+run_time = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1]
+print(json.dumps({"import_s": import_time, "run_s": run_time, "kept": len(kept), "peak_bytes": peak,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+PANDAS_SCRIPT = """
+import sys, json, time, resource, tracemalloc
+from datetime import datetime, timedelta, timezone
+toots = json.load(sys.stdin)
+start = time.perf_counter()
+sys.path[:0] = sys.argv[1:3]
+import pandas as pd
+from post_filter import SUPPORTED_LANGUAGES
+import_time = time.perf_counter() - start
+
+tracemalloc.start()
+start = time.perf_counter()
+not_older_then = datetime.now(timezone.utc) - timedelta(hours=3)
+df = pd.DataFrame(toots)
+df['n2i_tag'] = "bench"
+df['created_at'] = pd.to_datetime(df['created_at']).dt.tz_convert('Europe/Berlin')
+df = df[df['created_at'] >= not_older_then]
+df = df[~df['sensitive'].fillna(False).astype(bool) & df['in_reply_to_id'].isna() &
+        df['in_reply_to_account_id'].isna() & df['poll'].isna() &
+        df['language'].isin(SUPPORTED_LANGUAGES)]
+kept = df.to_dict('records')
+run_time = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1]
+print(json.dumps({"import_s": import_time, "run_s": run_time, "kept": len(kept), "peak_bytes": peak,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+WORDS = ("hackerspace", "bielefeld", "event", "workshop", "soldering", "printer", "tonight")
+
+
+def make_toot(i, rng, now):
+    return {
+        "id": str(i),
+        "created_at": (now - timedelta(minutes=rng.randint(0, 240))).isoformat(),
+        "sensitive": rng.random() < 0.05,
+        "in_reply_to_id": str(i - 1) if rng.random() < 0.2 else None,
+        "in_reply_to_account_id": None,
+        "poll": None,
+        "language": rng.choice(("en", "de", "fr", None)),
+        "content": "<p>" + " ".join(rng.choice(WORDS) for _ in range(30)) + "</p>",
+        "account": {"id": str(i % 50), "username": f"user{i % 50}",
+                    "avatar": f"https://example.com/{i % 50}.png"},
+        "tags": [{"name": "bench"}],
+    }
+
+
+def run_variant(script, toots):
+    process = subprocess.run([sys.executable, "-c", script, MASTODON_PATH, HTML_PATH], input=json.dumps(toots),
+                             capture_output=True, text=True, check=True)
+    return json.loads(process.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N2i mastodon toot model benchmark')
+    parser.add_argument('--count', type=int, default=200, help='Amount of toots per run')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    toots = [make_toot(i, rng, now) for i in range(args.count)]
+
+    results = {"toot records": run_variant(TOOT_SCRIPT, toots)}
+    try:
+        results["pandas"] = run_variant(PANDAS_SCRIPT, toots)
+    except subprocess.CalledProcessError:
+        print("pandas isn't installed, skipping the comparison")
+
+    print(f"{args.count} toots")
+    for name, result in results.items():
+        print(f"{name:<13} import {result['import_s'] * 1000:7.1f} ms, "
+              f"run {result['run_s'] * 1000:6.2f} ms, kept {result['kept']}, "
+              f"peak {result['peak_bytes'] / 1024:8.1f} KiB, "
+              f"max RSS {result['max_rss_kb'] / 1024:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
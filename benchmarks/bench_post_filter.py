@@ -0,0 +1,123 @@
+"""
+Benchmark for the toot filter of the mastodon extension.
+
+Filters a few thousand toots with the post_filter pipeline, which scores all
+toots with one model call, and with a reference implementation making one
+model call per toot, like the filter used before, and compares the time per
+toot. By default synthetic toots with a realistic mix of replies, polls,
+languages and HTML content are used, a recorded timeline (a JSON list of
+toots as returned by the Mastodon API) can be passed with --toots:
+
+    python benchmarks/bench_post_filter.py --count 5000
+    python benchmarks/bench_post_filter.py --toots recorded_toots.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "html", "extensions", "mastodon"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "html"))
+
+from profanity_check import predict  # pylint: disable=wrong-import-position
+
+from post_filter import post_filter, adjust_content, get_removal_reason  # pylint: disable=wrong-import-position
+from toot import parse_toots  # pylint: disable=wrong-import-position
+from profanity_scorer import get_scorer  # pylint: disable=wrong-import-position
+
+WORDS = ("hackerspace", "bielefeld", "event", "workshop", "soldering", "3d", "printer", "tonight",
+         "open", "day", "welcome", "everyone", "coffee", "laser", "cutter", "meetup")
+
+
+def make_toot(i, rng, now):
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 80)))
+    return {
+        "id": str(i),
+        "created_at": (now - timedelta(minutes=rng.randint(0, 240))).isoformat(),
+        "sensitive": rng.random() < 0.05,
+        "in_reply_to_id": str(i - 1) if rng.random() < 0.2 else None,
+        "in_reply_to_account_id": None,
+        "poll": {"id": str(i)} if rng.random() < 0.02 else None,
+        "language": rng.choice(("en", "en", "de", "de", "fr", None)),
+        "content": f'<p>{text} :smile: <a href="https://example.com/{i}">#tag</a></p>',
+        "account": {"username": f"user{i % 300}"},
+    }
+
+
+def reference_filter(toots, not_older_then):
+    """ Filter with one model call per toot """
+    kept = []
+    for toot in toots:
+        if get_removal_reason(toot, not_older_then):
+            continue
+        if predict([toot.content]) or predict([toot.account['username']]):
+            continue
+        toot.content = adjust_content(toot.content)
+        kept.append(toot)
+    return kept
+
+
+def pipeline_filter(toots, not_older_then):
+    return list(post_filter(toots, not_older_then))
+
+
+def load_toots(args):
+    if args.toots:
+        with open(args.toots, "r", encoding="utf-8") as f:
+            return json.load(f)
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    return [make_toot(i, rng, now) for i in range(args.count)]
+
+
+def bench(function, toots, not_older_then, rounds):
+    timings = []
+    for _ in range(rounds):
+        # The filter adjusts the contents, parse fresh toots for every round
+        parsed = list(parse_toots((toot, "bench") for toot in toots))
+        get_scorer().cache.clear()
+        start = time.perf_counter()
+        result = function(parsed, not_older_then)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N2i mastodon post_filter benchmark')
+    parser.add_argument('--count', type=int, default=3000, help='Amount of synthetic toots')
+    parser.add_argument('--toots', help='JSON file with recorded toots instead of synthetic ones')
+    parser.add_argument('--rounds', type=int, default=3, help='Rounds per implementation')
+    args = parser.parse_args()
+
+    toots = load_toots(args)
+    not_older_then = datetime.now(timezone.utc) - timedelta(hours=3)
+
+    # Load the model before timing
+    predict(["warm up"])
+
+    # The filter prints a line per removal reason, keep the output readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w", encoding="utf-8")
+    try:
+        reference_time, reference = bench(reference_filter, toots, not_older_then, args.rounds)
+        pipeline_time, pipeline = bench(pipeline_filter, toots, not_older_then, args.rounds)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    if [(toot.id, toot.content) for toot in reference] != \
+            [(toot.id, toot.content) for toot in pipeline]:
+        print("Warning: the implementations kept different toots")
+
+    print(f"{len(toots)} toots, {len(pipeline)} kept")
+    for name, duration in (("per toot", reference_time), ("batched", pipeline_time)):
+        print(f"{name:<9} {duration * 1000:8.1f} ms total, "
+              f"{duration / len(toots) * 1e6:8.1f} us per toot")
+    print(f"Speedup: {reference_time / pipeline_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
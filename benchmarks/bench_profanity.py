@@ -0,0 +1,79 @@
+"""
+Benchmark for the shared profanity scorer.
+
+Compares the throughput of scoring a batch of texts
+- cold: in a fresh interpreter, including loading the model,
+- warm: with the model loaded, but texts which weren't scored before,
+- cached: texts which were scored before, like toots fetched again,
+- one by one: one model call per text, like the toot filter used before.
+
+    python benchmarks/bench_profanity.py --count 2000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+
+HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "html")
+sys.path.insert(0, HTML_PATH)
+
+from profanity_scorer import ProfanityScorer  # pylint: disable=wrong-import-position
+
+WORDS = ("hackerspace", "bielefeld", "event", "workshop", "soldering", "printer", "tonight",
+         "open", "day", "welcome", "everyone", "coffee", "laser", "cutter", "meetup", "damn")
+
+COLD_SCRIPT = """
+import sys, time, random
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from profanity_scorer import ProfanityScorer
+words = sys.argv[3].split(",")
+rng = random.Random(int(sys.argv[4]))
+texts = [" ".join(rng.choice(words) for _ in range(20)) + f" {i}" for i in range(int(sys.argv[2]))]
+ProfanityScorer().score(texts)
+print(time.perf_counter() - start)
+"""
+
+
+def make_texts(count, seed):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(20)) + f" {i}" for i in range(count)]
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N2i profanity scorer benchmark')
+    parser.add_argument('--count', type=int, default=2000, help='Texts per batch')
+    args = parser.parse_args()
+
+    cold = subprocess.run([sys.executable, "-c", COLD_SCRIPT, HTML_PATH, str(args.count),
+                           ",".join(WORDS), "1"], capture_output=True, text=True, check=True)
+    cold_time = float(cold.stdout.strip())
+
+    scorer = ProfanityScorer()
+    scorer.load()
+    texts = make_texts(args.count, 2)
+    warm_time = timed(lambda: scorer.score(texts))
+    cached_time = timed(lambda: scorer.score(texts))
+
+    one_by_one = ProfanityScorer(cache_size=0)
+    one_by_one.load()
+    single_texts = make_texts(args.count, 3)
+    single_time = timed(lambda: [one_by_one.score([text]) for text in single_texts])
+
+    print(f"{args.count} texts per batch")
+    for name, duration in (("cold", cold_time), ("warm", warm_time), ("cached", cached_time),
+                           ("one by one", single_time)):
+        print(f"{name:<11} {duration * 1000:9.1f} ms, {args.count / duration:10.0f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
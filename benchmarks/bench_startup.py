@@ -0,0 +1,94 @@
+"""
+Benchmark of the startup of the CMS app, i.e. of a uWSGI worker (re)start.
+
+Imports app.py in fresh interpreters from a copy of the html folder, once
+with a new database (first start) and once with the existing database
+(restart), and reports the median import time:
+
+    python benchmarks/bench_startup.py --repeat 10
+
+With --ref the html folder of a git revision is measured instead of the
+working tree, to compare a change against its base:
+
+    python benchmarks/bench_startup.py --ref HEAD~1
+"""
+
+import os
+import sys
+import json
+import shutil
+import tarfile
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HTML_PATH = os.path.join(REPO_PATH, "html")
+
+STARTUP_SCRIPT = """
+import sys, json, time, resource
+start = time.perf_counter()
+sys.path.insert(0, ".")
+import app
+print(json.dumps({"import_s": time.perf_counter() - start,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+# Created by the app at runtime, removed for a first start
+STATE_PATHS = ("instance", os.path.join("extensions", "cms", "instance"))
+
+
+def copy_html(destination:str, ref:str=None):
+    if ref is None:
+        shutil.copytree(HTML_PATH, destination, ignore=shutil.ignore_patterns("__pycache__", "instance"))
+        return
+
+    archive = subprocess.run(["git", "-C", REPO_PATH, "archive", "--format=tar", ref, "html"],
+                             check=True, capture_output=True).stdout
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        with tarfile.open(fileobj=f) as tar:
+            tar.extractall(os.path.dirname(destination))
+
+
+def reset_state(html_path:str):
+    for path in STATE_PATHS:
+        shutil.rmtree(os.path.join(html_path, path), ignore_errors=True)
+
+
+def start_app(html_path:str) -> dict:
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=html_path, check=True,
+                            capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ref", default=None, help="git revision to measure instead of the working tree")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        html_path = os.path.join(tmp, "html")
+        copy_html(html_path, args.ref)
+
+        # Warms the page cache and the bytecode cache, like a restarted worker finds them
+        start_app(html_path)
+
+        first, restart = [], []
+        for _ in range(args.repeat):
+            reset_state(html_path)
+            first.append(start_app(html_path))
+            restart.append(start_app(html_path))
+
+    print(f"revision: {args.ref or 'working tree'}")
+    for name, runs in (("first start", first), ("restart", restart)):
+        import_ms = statistics.median(run["import_s"] for run in runs) * 1000
+        rss_mb = statistics.median(run["max_rss_kb"] for run in runs) / 1024
+        print(f"{name:12} import {import_ms:7.1f} ms   max RSS {rss_mb:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark for the text layout of generated slides.
+
+Lays out long, emoji-heavy texts with the width based wrap of text_layout,
+with a width based wrap measuring every candidate line with the font and with
+the character count based split the mastodon slides used before, and measures
+fitting a text into the content box of a mastodon slide. Uses the
+Symbola font of the mastodon extension:
+
+    python benchmarks/bench_text_layout.py --length 5000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "html"))
+
+from PIL import ImageFont  # pylint: disable=wrong-import-position
+
+from text_layout import wrap_text, fit_text  # pylint: disable=wrong-import-position
+
+FONT = os.path.join(os.path.dirname(__file__), "..", "html", "extensions", "mastodon", "assets",
+                    "Symbola.ttf")
+WORDS = ("hackerspace", "bielefeld", "🎉", "🔧🔩", "laser", "cutter", "👩‍💻", "tonight", "☕",
+         "soldering", "workshop", "🤖", "https://example.com/a/very/long/link/without/spaces")
+
+
+def split_string_into_chunks(text, chunk_size=35):
+    """ The recursive, character count based split used before """
+    chunks = []
+    tmp_text = text[0:chunk_size].strip()
+    if len(tmp_text) >= chunk_size and " " in tmp_text[0:chunk_size-5]:
+        splitted_text = tmp_text.rsplit(" ", 1)[0]
+        chunks.append(splitted_text)
+        chunks += split_string_into_chunks(text[len(splitted_text)+1:])
+    else:
+        chunks.append(tmp_text)
+        if len(text) > chunk_size:
+            chunks += split_string_into_chunks(text[chunk_size:])
+    return chunks
+
+
+def measure_wrap(text, font, max_width):
+    """ Width based wrap measuring every candidate line with the font, without caching """
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}" if line else word
+        if line and font.getlength(candidate) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return lines
+
+
+def make_text(length, rng):
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)[:length]
+
+
+def bench(function, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N2i slide text layout benchmark')
+    parser.add_argument('--length', type=int, default=5000, help='Characters of the long text')
+    parser.add_argument('--rounds', type=int, default=20, help='Rounds per measurement')
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.length))
+    fonts = {}
+    def get_font(size):
+        if size not in fonts:
+            fonts[size] = ImageFont.truetype(FONT, size)
+        return fonts[size]
+    font = get_font(104)
+
+    rng = random.Random(42)
+    for length in (250, args.length):
+        text = make_text(length, rng)
+        split_time, chunks = bench(lambda: split_string_into_chunks(text), args.rounds)
+        measure_time, _ = bench(lambda: measure_wrap(text, font, 1650), args.rounds)
+        wrap_time, lines = bench(lambda: wrap_text(text, font, 1650), args.rounds)
+        fit_time, block = bench(lambda: fit_text(text, get_font, (1650, 1040), 104, 64),
+                                args.rounds)
+        overflowing = sum(font.getlength(chunk) > 1650 for chunk in chunks)
+
+        print(f"{length} characters:")
+        print(f"  character split {split_time * 1000:8.2f} ms, {len(chunks)} lines, "
+              f"{overflowing} wider than the box")
+        print(f"  uncached wrap   {measure_time * 1000:8.2f} ms")
+        print(f"  width wrap      {wrap_time * 1000:8.2f} ms, {len(lines)} lines")
+        print(f"  fit into box    {fit_time * 1000:8.2f} ms, {len(block.lines)} lines "
+              f"at {block.font.size}pt")
+
+
+if __name__ == "__main__":
+    main()
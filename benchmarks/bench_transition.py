@@ -0,0 +1,78 @@
+"""
+Benchmark for the cpu based slide transitions of the displayer.
+
+Renders crossfade and slide transition frames between two prepared slides in
+the given resolution and checks that a frame fits into the frame budget of the
+target frame rate. Uses SDL's dummy video driver, so it runs headless and
+measures pure blitting cost. Run it on the player hardware (e.g. a Raspberry Pi)
+to verify that transitions can be enabled there:
+
+    python benchmarks/bench_transition.py --fps 20 --resolution 1920x1080
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "displayer"))
+
+import pygame  # pylint: disable=wrong-import-position
+
+from display import prepare_slide  # pylint: disable=wrong-import-position
+from transition import TransitionEngine  # pylint: disable=wrong-import-position
+
+
+def make_image(size, color):
+    image = pygame.Surface(size)
+    image.fill(color)
+    pygame.draw.circle(image, (255, 255, 255), (size[0] // 2, size[1] // 2), size[1] // 3)
+    return image
+
+
+def bench_mode(screen, mode, frames, previous, current):
+    engine = TransitionEngine(screen, pygame.time.Clock(), mode)
+    timings = []
+    for i in range(frames):
+        start = time.perf_counter()
+        engine.render_frame(previous, current, i / frames)
+        pygame.display.flip()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N2i displayer transition benchmark')
+    parser.add_argument('--resolution', default="1920x1080", help='Screen resolution WIDTHxHEIGHT')
+    parser.add_argument('--fps', type=int, default=20, help='Target frame rate of a transition')
+    parser.add_argument('--frames', type=int, default=200, help='Frames to render per transition')
+    args = parser.parse_args()
+
+    size = tuple(int(x) for x in args.resolution.split("x"))
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+
+    # Images with a different aspect ratio, like uploads, to include letterboxing
+    previous = prepare_slide(screen, make_image((1600, 1200), (200, 30, 30)))
+    current = prepare_slide(screen, make_image((1280, 720), (30, 30, 200)))
+
+    budget = 1 / args.fps
+    failed = False
+    print(f"Resolution {size[0]}x{size[1]}, target {args.fps} fps ({budget * 1000:.1f} ms per frame)")
+    for mode in ("crossfade", "slide"):
+        timings = bench_mode(screen, mode, args.frames, previous, current)
+        mean = statistics.mean(timings)
+        p95 = sorted(timings)[int(len(timings) * 0.95)]
+        sustained = p95 <= budget
+        failed |= not sustained
+        print(f"{mode:>9}: mean {mean * 1000:6.2f} ms, p95 {p95 * 1000:6.2f} ms, "
+              f"max {1 / mean:6.1f} fps -> {'ok' if sustained else 'falls back to cuts'}")
+
+    pygame.quit()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
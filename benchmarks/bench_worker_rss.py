@@ -0,0 +1,157 @@
+"""
+Benchmark of the memory of the uWSGI workers of the CMS.
+
+Starts uWSGI with the uwsgi.ini of a copy of the html folder on a local HTTP
+socket, sends some requests and reports the memory of every worker from
+/proc/<pid>/smaps_rollup (Linux only):
+
+- RSS: all resident pages of the worker, including the pages shared with the master
+- PSS: the resident pages with shared pages divided among the processes sharing them
+- USS: the pages only this worker uses, i.e. what a further worker would add
+
+    python benchmarks/bench_worker_rss.py
+    python benchmarks/bench_worker_rss.py --ref HEAD~1      # the config of a git revision
+    python benchmarks/bench_worker_rss.py --lazy-apps       # every worker loads the app itself
+"""
+
+import os
+import sys
+import time
+import shutil
+import socket
+import tarfile
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+
+REPO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HTML_PATH = os.path.join(REPO_PATH, "html")
+
+# Requests rendering templates and reading the uploads
+PATHS = ("/", "/favicon.ico")
+
+# The settings of dot_env_example needed to serve the requests
+APP_ENV = {"UPLOAD_FOLDER": "static/uploads", "QUEUE_FOLDER": "static/queue", "FLASK_SECRET_KEY": "bench"}
+
+
+def copy_html(destination:str, ref:str=None):
+    if ref is None:
+        shutil.copytree(HTML_PATH, destination, ignore=shutil.ignore_patterns("__pycache__", "instance"))
+        return
+
+    archive = subprocess.run(["git", "-C", REPO_PATH, "archive", "--format=tar", ref, "html"],
+                             check=True, capture_output=True).stdout
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        with tarfile.open(fileobj=f) as tar:
+            tar.extractall(os.path.dirname(destination))
+
+
+def write_config(html_path:str, port:int, lazy_apps:bool) -> str:
+    """
+    Copies the uwsgi.ini with an HTTP socket instead of the unix socket of nginx.
+    """
+    lines = []
+    with open(os.path.join(html_path, "uwsgi.ini"), encoding="utf-8") as f:
+        for line in f:
+            key = line.split("=", 1)[0].strip()
+            if key in ("socket", "chmod-socket", "lazy-apps"):
+                continue
+            lines.append(line.rstrip("\n"))
+    lines += [f"http-socket = 127.0.0.1:{port}", f"lazy-apps = {'true' if lazy_apps else 'false'}"]
+
+    config_path = os.path.join(html_path, "bench_uwsgi.ini")
+    with open(config_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return config_path
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_children(pid:int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def read_memory(pid:int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": values["Rss"], "pss": values["Pss"],
+            "uss": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def wait_for_server(port:int, timeout:float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("uWSGI didn't start")
+
+
+def send_requests(port:int, amount:int):
+    for i in range(amount):
+        url = f"http://127.0.0.1:{port}{PATHS[i % len(PATHS)]}"
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                response.read()
+        except urllib.error.HTTPError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ref", default=None, help="git revision to measure instead of the working tree")
+    parser.add_argument("--lazy-apps", action="store_true", help="load the app in every worker")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--uwsgi", default=shutil.which("uwsgi") or "uwsgi")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        html_path = os.path.join(tmp, "html")
+        copy_html(html_path, args.ref)
+        port = get_free_port()
+        config_path = write_config(html_path, port, args.lazy_apps)
+
+        path = os.path.dirname(sys.executable) + os.pathsep + os.environ.get("PATH", "")
+        env = dict(os.environ, **APP_ENV, PATH=path)
+        start_time = time.perf_counter()
+        server = subprocess.Popen([args.uwsgi, "--ini", config_path], cwd=html_path, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(port, timeout=60)
+            send_requests(port, 1)
+            ready_time = time.perf_counter() - start_time
+            send_requests(port, args.requests)
+
+            master = read_memory(server.pid)
+            workers = {pid: read_memory(pid) for pid in get_children(server.pid)}
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    print(f"revision: {args.ref or 'working tree'}, lazy-apps: {args.lazy_apps}, "
+          f"first response after {ready_time:.2f} s")
+    print(f"{'process':>10} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8}")
+    print(f"{'master':>10} {master['rss'] / 1024:8.1f} {master['pss'] / 1024:8.1f} {master['uss'] / 1024:8.1f}")
+    for pid, memory in sorted(workers.items()):
+        print(f"{pid:>10} {memory['rss'] / 1024:8.1f} {memory['pss'] / 1024:8.1f} {memory['uss'] / 1024:8.1f}")
+    total_pss = master['pss'] + sum(memory['pss'] for memory in workers.values())
+    print(f"{'total PSS':>10} {total_pss / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
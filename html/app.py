@@ -1,25 +1,33 @@
 # pylint: skip-file
 import os
 import sys
+import time
+import logging
 
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory
+startup_time = time.perf_counter()
+
+from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, jsonify
 from authlib.integrations.flask_client import OAuth
 
 from dotenv import load_dotenv
 from functools import wraps
 
-from filehandler import sanitize_file, safe_file, delete_file, get_all_images_for_all_users, get_uploads
+from filehandler import sanitize_file, safe_file, safe_files, delete_file, get_all_images_for_all_users, get_uploads
 from queuehandler import approve_file
-from db_models import db, create_roles, create_users, create_extensions
+from db_models import db, Uploads, Queue
 from db_user_helper import add_user_to_users, get_user_from_users, get_users_data_for_dashboard
 from db_extension_helper import db_get_extension
+from extension_registry import discover_extensions, register_extensions
+from init_db import init_databases, should_init_databases
 from helper import sanitize_string
+from upload_stream import receive_images, discard_uploads, UPLOAD_TMP_FOLDER
+from static_delivery import init_static_delivery
+from metrics import init_metrics
+from query_profiler import init_query_profiler
 
 from role_based_access import check_access, cms_active, check_admin
 
-import importlib.util
-
-from extensions.cms.CMSConfig import get_conn, get_setting_from_config
+from extensions.cms.CMSConfig import get_setting_from_config
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,40 +37,45 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///uploads.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = True
 
+# Ensure the extensions folder is in the PYTHONPATH
+extensions_folder = os.path.join(os.path.dirname(__file__), 'extensions')
+sys.path.insert(0, extensions_folder)
+extension_manifests = discover_extensions(extensions_folder)
+
 # initialize the app with Flask-SQLAlchemy
 db.init_app(app)
-# Create the database tables
-with app.app_context():
-    db.create_all()
-    create_roles()
-    create_users()
-    create_extensions()
-    get_conn()         # Initilize the cms extensions DB
+# Create the database tables, unless done by a separate init step (init_db.py)
+if should_init_databases():
+    init_databases(app, extension_manifests)
 
 # Configure flask app with parameters from .env file
 app.secret_key = os.environ.get('FLASK_SECRET_KEY')
 app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER')
 app.config['QUEUE_FOLDER'] = os.environ.get('QUEUE_FOLDER')
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB limit
+app.config['MAX_BATCH_FILES'] = 50
+app.config['MAX_BATCH_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB limit for batch uploads
+
+# Slides and other static files, see static_delivery.py
+init_static_delivery(app)
+
+# Request, query and upload metrics on /metrics, see metrics.py
+def get_metrics_gauges() -> dict:
+    return {
+        "n2i_queue_files": ("Files waiting for approval.", db.session.query(Queue).count()),
+        "n2i_upload_files": ("Approved files shown on the screens.", db.session.query(Uploads).count()),
+    }
+
+init_metrics(app, get_metrics_gauges)
+init_query_profiler(app)
 
 # Cookie flags
 app.config['SESSION_COOKIE_SECURE'] = True
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'lax'
 
-# Ensure the extensions folder is in the PYTHONPATH
-extensions_folder = os.path.join(os.path.dirname(__file__), 'extensions')
-sys.path.insert(0, extensions_folder)
-
 # Load extensions
-for extension_name in os.listdir(extensions_folder):
-    extension_path = os.path.join(extensions_folder, extension_name)
-    if os.path.isdir(extension_path):
-        spec = importlib.util.spec_from_file_location(extension_name, os.path.join(extension_path, 'routes.py'))
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-
-        app.register_blueprint(module.blueprint, url_prefix=f'/management/extensions/{extension_name}')
+register_extensions(app, extension_manifests)
 
 # create_folder
 os.makedirs("static/uploads/system", exist_ok=True)
@@ -78,6 +91,8 @@ github = oauth.register(
     client_kwargs={'scope': 'user:name'},
 )
 
+logging.getLogger().info(f"CMS initialized in {(time.perf_counter() - startup_time) * 1000:.0f} ms")
+
 def login_required(access_level_required=1):
     """
     Decorator function to protect routes that require authentication.
@@ -103,7 +118,7 @@ def login_required(access_level_required=1):
             session['user_role'] = user.role.id
 
             # Check access level
-            if not check_access(user.name, access_level_required):
+            if not check_access(user.name, access_level_required, user=user):
                 return render_template('errors/blocked.html', support_url=os.environ.get('SUPPORT_URL'))
 
             return view(*args, **kwargs)
@@ -214,6 +229,26 @@ def upload_file():
     else:
         return redirect(url_for('upload_result'))
 
+@app.route('/upload/batch', methods=['POST'])
+@login_required(access_level_required=1)
+def upload_batch():
+    uploads = receive_images(request.environ, UPLOAD_TMP_FOLDER,
+                             app.config['MAX_CONTENT_LENGTH'],
+                             max_content_length=app.config['MAX_BATCH_CONTENT_LENGTH'],
+                             max_files=app.config['MAX_BATCH_FILES'], parallel=True)
+    if not uploads:
+        return jsonify(error="No file selected"), 400
+
+    # Without approvals the files are uploaded directly
+    approve_setting = get_setting_from_config("approve")
+    folder = app.config['QUEUE_FOLDER'] if approve_setting.active else app.config['UPLOAD_FOLDER']
+    valid_uploads = [upload for upload in uploads if not upload.error]
+    stored = safe_files(valid_uploads, folder, session['user_name'], queue=approve_setting.active)
+    discard_uploads(uploads)
+
+    rejected = [{"file": upload.filename, "error": upload.error} for upload in uploads if upload.error]
+    return jsonify(stored=stored, rejected=rejected), 200 if stored else 400
+
 @app.route('/upload/result', methods=['GET'])
 @login_required(access_level_required=1)
 def upload_result():
@@ -15,6 +15,7 @@ SQLAlchemy is used for database interaction, and exceptions are handled with pro
 """
 
 import os
+import json
 import logging
 from typing import Union
 
@@ -53,6 +54,24 @@ def check_global_upload_limit() -> bool:
         return False
 
 
+def get_remaining_global_uploads() -> int:
+    """
+    @brief Returns how many files can still be uploaded before the global upload limit is reached.
+
+    @return The amount of remaining uploads, 0 if an error occurs.
+
+    @exception SQLAlchemyError Logs an error message if an exception occurs while querying the database.
+    """
+    try:
+        GLOBAL_UPLOAD_LIMIT = int(os.environ.get('GLOBAL_UPLOAD_LIMIT', '100'))  # Default to 100 if not set
+
+        num_files = db.session.query(Uploads).count()
+        return max(0, GLOBAL_UPLOAD_LIMIT - num_files)
+    except SQLAlchemyError as e:
+        logger.error(f"Error while retrieving number of uploaded files: {e}")
+        return 0
+
+
 def get_file_from_queue(file_name: str) -> Union[Queue, None, bool]:
     """
     @brief Retrieve a file from the Queue table by the file name.
@@ -246,6 +265,57 @@ def add_file_to_uploads(file_name: str, file_path: str, file_owner: str) -> bool
         return False
 
 
+def add_files_to_db(files: list[tuple[str, str, str]], file_owner: str, uploads: bool = False) -> bool:
+    """
+    @brief Add several files of one owner to the queue or uploads table in a single transaction.
+
+    Either all files are added or none. The files are added to the owner's file list
+    and checked against the owner's upload limit within the same transaction.
+
+    @param files Tuples of file name, file path and hashed file password. The password
+                 is ignored for the uploads table.
+    @param file_owner The username of the user who owns the files.
+    @param uploads Whether the files are added to the uploads instead of the queue table.
+
+    @return True if all files were committed to the database.
+            False if the file owner is not found, the upload limit would be exceeded
+            or a database error occurs during the commit.
+
+    @exception SQLAlchemyError Logs an error message if an exception occurs during the database operation.
+    """
+
+    user = get_user_from_users(file_owner)
+    if not user:
+        logger.warning(f"File owner '{file_owner}' could not be found.")
+        return False
+
+    if user.upload_amount + len(files) > user.upload_limit:
+        logger.info(f"Adding {len(files)} files would exceed the upload limit of user '{file_owner}'.")
+        return False
+
+    try:
+        file_names = [file_name for file_name, _, _ in files]
+        if uploads:
+            user.files_uploads = json.dumps(user.get_user_files_uploads() + file_names)
+            db.session.add_all([Uploads(file_name=file_name, file_path=file_path, file_owner=file_owner)
+                                for file_name, file_path, _ in files])
+        else:
+            user.files_queue = json.dumps(user.get_user_files_queue() + file_names)
+            db.session.add_all([Queue(file_name=file_name, file_path=file_path,
+                                      file_password=file_password, file_owner=file_owner)
+                                for file_name, file_path, file_password in files])
+        user.upload_amount = len(user.get_user_files_queue()) + len(user.get_user_files_uploads())
+        db.session.commit()
+
+        logger.info(f"{len(files)} files successfully added to the {'uploads' if uploads else 'queue'} "
+                    f"table by user '{file_owner}'.")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"An error occurred while adding {len(files)} files of '{file_owner}': {e}")
+        db.session.rollback()  # Rollback to undo any partial changes in case of error
+        return False
+
+
 def remove_file_from_uploads(file_name: str) -> Union[Uploads, bool]:
     """
     @brief Remove a file from the uploads table by file name.
@@ -193,13 +193,14 @@ class Users(db.Model):
 
 def create_users():
     # Check if the user already exist
-    existing_system = Role.query.filter_by(name='system').first()
+    existing_system = Users.query.filter_by(name='system').first()
 
-    # Create new roles only if they don't exist
+    # Create new users only if they don't exist
     if not existing_system:
         system = Users(user_name='system', user_upload_amount=0, \
                         user_upload_limit=10000000, user_files=[])
         db.session.add(system)
+        commit_db_changes()
 
 ### Extension ###
 class Extension(db.Model):
@@ -224,15 +225,19 @@ class Extension(db.Model):
         return True
 
 
-def create_extensions():
-    # Itterate over the extensions folder to add them to the extension table
-    for extension_name in os.listdir("extensions"):
-        extension_elem = Extension.query.filter_by(name=extension_name).first()
+def create_extensions(manifests):
+    # Add the extensions without a row in the extension table, all in one transaction
+    existing = {extension.name: extension for extension in Extension.query.all()}
 
+    changed = False
+    for manifest in manifests:
+        extension_elem = existing.get(manifest.name)
         if not extension_elem:
-            if "templates" in os.listdir(os.path.join("extensions", extension_name)):
-                extension_elem = Extension(name=extension_name, managable=True, active=False)
-            else:
-                extension_elem = Extension(name=extension_name, managable=False, active=False)
-            db.session.add(extension_elem)
-            db.session.commit()
+            db.session.add(Extension(name=manifest.name, managable=manifest.managable, active=False))
+            changed = True
+        elif extension_elem.managable != manifest.managable:
+            extension_elem.managable = manifest.managable
+            changed = True
+
+    if changed:
+        commit_db_changes()
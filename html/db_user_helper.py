@@ -22,6 +22,7 @@ from typing import List, Dict, Union
 
 from db_models import Users, db
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 
 logger = logging.getLogger()
 
@@ -39,7 +40,8 @@ def get_user_from_users(user_name: str) -> Union[Users, bool]:
     @exception SQLAlchemyError If there is an error while querying the database.
     """
     try:
-        user = db.session.query(Users).filter(Users.name == user_name).first()
+        # The role is needed for every access check, load it with the user
+        user = db.session.query(Users).options(joinedload(Users.role)).filter(Users.name == user_name).first()
         if user:
             logger.debug(f"User '{user_name}' found in the users table.")
             return user
@@ -61,7 +63,7 @@ def get_users_data_for_dashboard() -> List[Dict[str, Union[int, str]]]:
             role, upload limit, and upload amount.
     """
     try:
-        users = db.session.query(Users).all()
+        users = db.session.query(Users).options(joinedload(Users.role)).all()
         users_data = [{
             'id': user.id,
             'user_name': user.name,
@@ -20,6 +20,7 @@
 
 import os
 import ssl
+import time
 import smtplib
 import logging
 
@@ -29,10 +30,12 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from smtplib import SMTPException, SMTPHeloError, SMTPAuthenticationError, SMTPNotSupportedError, SMTPRecipientsRefused, SMTPSenderRefused, SMTPDataError
 
+from metrics import observe
+
 logger = logging.getLogger()
 
 
-def sent_mail(subject, body, file_path=False):
+def send_mail(subject, body, file_path=False):
     """
     Send an email with the specified subject and body.
 
@@ -88,11 +91,14 @@ def sent_mail(subject, body, file_path=False):
 
     # Log in to server using secure context and send email
     context = ssl.create_default_context()
+    start_time = time.perf_counter()
+    sent = False
     try:
         with smtplib.SMTP_SSL(smtp_server, 465, context=context) as server:
             server.login(sender_email, password)
             server.sendmail(sender_email, receiver_email, text)
             logger.info(f"Email sent successfully to {receiver_email}.")
+            sent = True
     except SMTPHeloError:
         logger.error("The server didn't reply properly to the HELO greeting.")
         return False
@@ -114,6 +120,9 @@ def sent_mail(subject, body, file_path=False):
     except Exception as e:
         logger.error(f"An unexpected error occurred while sending email: {e}")
         return False
+    finally:
+        observe("n2i_email_send_duration_seconds", time.perf_counter() - start_time,
+                result="sent" if sent else "failed")
 
     return True
 
@@ -0,0 +1,147 @@
+"""
+@file extension_registry.py
+@brief Discovery and registration of the CMS extensions.
+
+Every folder in the extensions folder is an extension. Its manifest.json
+describes it, so the CMS doesn't have to inspect the folder contents:
+
+    {
+        "description": "Shows toots of selected hashtags",
+        "managable": true,
+        "blueprint": "routes.py"
+    }
+
+- managable: Whether the extension has a management page, i.e. an `index` endpoint.
+- blueprint: The module defining `blueprint`, null for extensions without routes.
+
+Extensions without a manifest.json are described like before: they are managable
+if they have a templates folder and their blueprint is routes.py.
+
+@details
+Usage in the app:
+
+    manifests = discover_extensions(extensions_folder)
+    with app.app_context():
+        create_extensions(manifests)
+    register_extensions(app, manifests)
+
+@note
+- Blueprints are registered for inactive extensions too. The management page
+    links to their index pages and an extension activated at runtime has to be
+    reachable in every worker without a restart.
+"""
+
+import os
+import json
+import time
+import logging
+import importlib.util
+
+logger = logging.getLogger()
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_BLUEPRINT = "routes.py"
+
+
+class ExtensionManifest:
+    """
+    @brief The description of an extension read from its manifest.json.
+    """
+    def __init__(self, name: str, path: str, description: str = "", managable: bool = False,
+                 blueprint: str = None):
+        self.name = name
+        self.path = path
+        self.description = description
+        self.managable = managable
+        self.blueprint = blueprint
+
+    @property
+    def url_prefix(self) -> str:
+        return f'/management/extensions/{self.name}'
+
+    @classmethod
+    def load(cls, name: str, path: str):
+        """
+        @brief Reads the manifest of an extension, or derives it from the folder contents if there is none.
+
+        @param name The name of the extension, i.e. its folder name.
+        @param path The path of the extension folder.
+
+        @return The ExtensionManifest, None if the manifest is invalid.
+        """
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+                data = json.load(manifest_file)
+        except FileNotFoundError:
+            entries = os.listdir(path)
+            return cls(name, path, managable="templates" in entries,
+                       blueprint=DEFAULT_BLUEPRINT if DEFAULT_BLUEPRINT in entries else None)
+        except (OSError, ValueError) as e:
+            logger.error(f"Invalid manifest of extension '{name}': {e}")
+            return None
+
+        return cls(name, path, description=data.get("description", ""),
+                   managable=bool(data.get("managable", False)), blueprint=data.get("blueprint"))
+
+
+def discover_extensions(extensions_folder: str) -> list[ExtensionManifest]:
+    """
+    @brief Reads the manifests of all extensions.
+
+    @param extensions_folder The folder containing the extensions.
+
+    @return The manifests sorted by extension name.
+    """
+    manifests = []
+    with os.scandir(extensions_folder) as entries:
+        for entry in entries:
+            if not entry.is_dir() or entry.name.startswith(('.', '__')):
+                continue
+            manifest = ExtensionManifest.load(entry.name, entry.path)
+            if manifest is not None:
+                manifests.append(manifest)
+    return sorted(manifests, key=lambda manifest: manifest.name)
+
+
+def load_blueprint(manifest: ExtensionManifest):
+    """
+    @brief Imports the blueprint module of an extension.
+
+    @return The blueprint, None if the extension has none or its module couldn't be imported.
+    """
+    if not manifest.blueprint:
+        return None
+
+    module_path = os.path.join(manifest.path, manifest.blueprint)
+    try:
+        spec = importlib.util.spec_from_file_location(manifest.name, module_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.blueprint
+    except (OSError, ImportError, SyntaxError, AttributeError) as e:
+        logger.error(f"Blueprint of extension '{manifest.name}' couldn't be loaded: {e}")
+        return None
+
+
+def register_extensions(app, manifests: list[ExtensionManifest]) -> list[str]:
+    """
+    @brief Registers the blueprints of the extensions with the app.
+
+    @param app The Flask app.
+    @param manifests The manifests of the extensions.
+
+    @return The names of the extensions whose blueprint was registered.
+    """
+    registered = []
+    for manifest in manifests:
+        start_time = time.perf_counter()
+        blueprint = load_blueprint(manifest)
+        if blueprint is None:
+            continue
+
+        app.register_blueprint(blueprint, url_prefix=manifest.url_prefix)
+        registered.append(manifest.name)
+        logger.debug(f"Extension '{manifest.name}' registered in "
+                     f"{(time.perf_counter() - start_time) * 1000:.1f} ms")
+    return registered
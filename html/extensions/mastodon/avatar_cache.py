@@ -0,0 +1,181 @@
+import os
+import json
+import hashlib
+import threading
+from io import BytesIO
+from datetime import datetime, timezone, timedelta
+
+import requests
+from PIL import Image
+
+AVATAR_SIZE = (400, 400)
+
+class AvatarCache:
+    """
+    On-disk cache of resized avatars keyed by account and avatar URL.
+
+    Every entry stores the avatar already resized to AVATAR_SIZE as RGB image
+    and the ETag/Last-Modified headers of the download. Entries are revalidated
+    with a conditional request once they are older than max_age, so a popular
+    account posting many toots costs one download. The least recently used
+    entries are evicted once the cache exceeds max_bytes. A failed download is
+    not retried for failure_ttl, so an unreachable avatar doesn't cost the
+    retries of the HTTP client for every toot.
+    """
+    def __init__(self, cache_dir:str, client, max_bytes:int=50*1024*1024,
+                 max_age:timedelta=timedelta(hours=6), timeout:float=10,
+                 failure_ttl:timedelta=timedelta(minutes=10)):
+        self.cache_dir = cache_dir
+        self.client = client
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        # Expiry times of failed downloads by key
+        self.failures = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.downloads = 0
+
+    def get_key(self, account:dict, url:str):
+        account_id = account.get('id') or account.get('username', '')
+        return hashlib.sha256(f"{account_id}\n{url}".encode()).hexdigest()
+
+    def get_paths(self, key:str):
+        path = os.path.join(self.cache_dir, key)
+        return path + ".png", path + ".json"
+
+    def load_entry(self, key:str):
+        image_path, meta_path = self.get_paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            image = Image.open(image_path)
+            image.load()
+            # Mark the entry as recently used for the eviction
+            os.utime(image_path)
+        except (OSError, ValueError):
+            return None, None
+        return image, meta
+
+    def store_entry(self, key:str, image, meta:dict):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        image_path, meta_path = self.get_paths(key)
+
+        # Write to temporary files first, so readers never see a partial entry
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        image.save(image_path + suffix, format="PNG")
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(image_path + suffix, image_path)
+        os.replace(meta_path + suffix, meta_path)
+
+    def touch_entry(self, key:str, meta:dict):
+        meta['checked'] = datetime.now(timezone.utc).isoformat()
+        _, meta_path = self.get_paths(key)
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def is_fresh(self, meta:dict):
+        try:
+            checked = datetime.fromisoformat(meta['checked'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return datetime.now(timezone.utc) - checked < self.max_age
+
+    def download(self, url:str, meta:dict):
+        """
+        Download and resize an avatar. Returns (None, None) if the cached
+        version is still valid and raises on network or decode errors.
+        """
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        # The cache validates the avatars itself, keep them out of the response cache
+        response = self.client.get(url, headers=headers, timeout=self.timeout, cache=False)
+        if response.status_code == 304 and meta:
+            return None, None
+        response.raise_for_status()
+
+        image = Image.open(BytesIO(response.content))
+        image = image.convert("RGB").resize(AVATAR_SIZE)
+        meta = {'url': url, 'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'checked': datetime.now(timezone.utc).isoformat()}
+        return image, meta
+
+    def get(self, account:dict, url:str):
+        """
+        Return the resized avatar of an account. Falls back to a stale cached
+        avatar or a placeholder if it can't be downloaded.
+        """
+        key = self.get_key(account, url)
+        with self.lock:
+            image, meta = self.load_entry(key)
+            if image is not None and self.is_fresh(meta):
+                self.hits += 1
+                return image
+
+            fallback = image if image is not None else Image.new("RGB", AVATAR_SIZE, "gray")
+            now = datetime.now(timezone.utc)
+            if self.failures.get(key, now) > now:
+                return fallback
+
+            try:
+                new_image, new_meta = self.download(url, meta)
+            except (requests.RequestException, OSError, Image.DecompressionBombError) as e:
+                print(f"Error fetching avatar {url}: {e}")
+                self.failures = {k: expiry for k, expiry in self.failures.items() if expiry > now}
+                self.failures[key] = now + self.failure_ttl
+                return fallback
+            self.failures.pop(key, None)
+
+            if new_image is None:
+                self.revalidations += 1
+                self.touch_entry(key, meta)
+                return image
+
+            self.downloads += 1
+            self.store_entry(key, new_image, new_meta)
+            self.evict()
+            return new_image
+
+    def get_path(self, account:dict, url:str):
+        """
+        Return the path of the cached avatar file of an account, downloading it
+        if needed. None if there is neither a download nor a cached avatar.
+        """
+        self.get(account, url)
+        image_path, _ = self.get_paths(self.get_key(account, url))
+        return image_path if os.path.exists(image_path) else None
+
+    def evict(self):
+        """ Remove the least recently used entries until the cache fits into max_bytes """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".png"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Evicted by another process rendering slides
+                continue
+            total += stat.st_size
+            entries.append((stat.st_mtime, stat.st_size, entry.name[:-len(".png")]))
+
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in self.get_paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
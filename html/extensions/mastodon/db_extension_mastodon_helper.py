@@ -1,5 +1,9 @@
 import sqlite3
 import os
+from datetime import datetime
+
+# The sync tables are checked once per process
+sync_tables_ready = {"ready": False}
 
 class Tag:
     def __init__(self, _id:int, _name:str, _limit:int):
@@ -17,6 +21,13 @@ class Tag:
         conn.commit()
         conn.close()
 
+class Slide:
+    def __init__(self, _toot_id:str, _tag:str, _created_at:datetime, _file_name:str):
+        self.toot_id = _toot_id
+        self.tag = _tag
+        self.created_at = _created_at
+        self.file_name = _file_name
+
 def init_table(conn):
     """ Create a database connection to a SQLite database """
 
@@ -35,6 +46,29 @@ def init_table(conn):
 
     return conn
 
+def init_sync_tables(conn):
+    """ Create the tables storing the sync state, they may be missing in older databases """
+
+    sql_create_cursors_table = """ CREATE TABLE IF NOT EXISTS Cursors (
+                                    tag TEXT PRIMARY KEY,
+                                    since_id TEXT NOT NULL
+                                ); """
+
+    sql_create_slides_table = """ CREATE TABLE IF NOT EXISTS Slides (
+                                    toot_id TEXT PRIMARY KEY,
+                                    tag TEXT NOT NULL,
+                                    created_at TEXT NOT NULL,
+                                    file_name TEXT NOT NULL
+                                ); """
+
+    try:
+        c = conn.cursor()
+        c.execute(sql_create_cursors_table)
+        c.execute(sql_create_slides_table)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(e)
+
 def get_conn():
     db_path = "./extensions/mastodon/instance"
 
@@ -52,6 +86,9 @@ def get_conn():
 
     if create_table:
         init_table(conn)
+    if not sync_tables_ready["ready"]:
+        init_sync_tables(conn)
+        sync_tables_ready["ready"] = True
 
     return conn
 
@@ -104,6 +141,7 @@ def remove_mastodon_tag(tag_name: str):
     try:
         if tag:
             cur.execute("DELETE FROM Tags WHERE name=?", (tag_name,))
+            cur.execute("DELETE FROM Cursors WHERE tag=?", (tag_name,))
             conn.commit()
             return tag
     except sqlite3.Error:
@@ -121,3 +159,65 @@ def update_mastodon_tag(tag_name: str, tag_limit: int):
     elif not tag.set_limit(tag_limit):
         return False
     return True
+
+def get_tag_cursors():
+    """ Query the ID of the newest fetched toot of every tag """
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT tag, since_id FROM Cursors")
+    cursors = dict(cur.fetchall())
+    conn.close()
+    return cursors
+
+def set_tag_cursors(cursors: dict):
+    """ Store the ID of the newest fetched toot of the given tags """
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.executemany("INSERT OR REPLACE INTO Cursors (tag, since_id) VALUES (?, ?)",
+                        cursors.items())
+        conn.commit()
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return True
+
+def get_all_slides():
+    """ Query all slides created from toots """
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT toot_id, tag, created_at, file_name FROM Slides")
+    rows = cur.fetchall()
+    conn.close()
+
+    return [Slide(row[0], row[1], datetime.fromisoformat(row[2]), row[3]) for row in rows]
+
+def add_slides(slides: list):
+    """ Add slides created from toots to the Slides table """
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.executemany("INSERT OR REPLACE INTO Slides (toot_id, tag, created_at, file_name) "
+                        "VALUES (?, ?, ?, ?)",
+                        [(slide.toot_id, slide.tag, slide.created_at.isoformat(), slide.file_name)
+                         for slide in slides])
+        conn.commit()
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return True
+
+def remove_slides(toot_ids: list):
+    """ Remove slides from the Slides table by the ID of their toot """
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.executemany("DELETE FROM Slides WHERE toot_id=?", [(toot_id,) for toot_id in toot_ids])
+        conn.commit()
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return True
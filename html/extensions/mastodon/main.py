@@ -1,45 +1,172 @@
 import os
+import sys
 import json
+import threading
+from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import pandas as pd
 
-from post_filter import post_filter
-from slide_creator import slide_creator
-from db_extension_mastodon_helper import get_all_mastodon_tags
+# The CMS modules are in the html folder the job is started from
+sys.path.append(os.getcwd())
+
+from http_client import get_client  # pylint: disable=wrong-import-position
+from post_filter import post_filter  # pylint: disable=wrong-import-position
+from toot import parse_toots  # pylint: disable=wrong-import-position
+from slide_creator import create_all_slides  # pylint: disable=wrong-import-position
+from db_extension_mastodon_helper import get_all_mastodon_tags  # pylint: disable=wrong-import-position
+from db_extension_mastodon_helper import get_tag_cursors, set_tag_cursors  # pylint: disable=wrong-import-position
+from db_extension_mastodon_helper import Slide, get_all_slides, add_slides, remove_slides  # pylint: disable=wrong-import-position
+
+MASTODON_URL = 'https://mastodon.social'
+FETCH_WORKERS = 8
+SLIDE_FOLDER = "static/uploads/"
+MAX_TOOT_AGE = timedelta(hours=3)
+
+# Time until which the API rate limit is exhausted
+rate_limit = {"reset": None}
+rate_limit_lock = threading.Lock()
+
+def rate_limited():
+    with rate_limit_lock:
+        reset = rate_limit["reset"]
+        if reset and reset > datetime.now(timezone.utc):
+            return True
+        rate_limit["reset"] = None
+        return False
+
+def update_rate_limit(response):
+    """ Block further requests until the reset time if the rate limit is exhausted """
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    if response.status_code != 429 and (remaining is None or int(remaining) > 0):
+        return
+
+    try:
+        reset = datetime.fromisoformat(response.headers['X-RateLimit-Reset'])
+    except (KeyError, ValueError):
+        reset = datetime.now(timezone.utc) + timedelta(minutes=5)
+    print(f"Mastodon rate limit reached, pausing requests until {reset}")
+    with rate_limit_lock:
+        rate_limit["reset"] = reset
+
+def fetch_toots(hashtag:str, limit:int, since_id:str=None):
+    if rate_limited():
+        print(f"Skipped fetching #{hashtag} because of the rate limit")
+        return []
+
+    URL = f'{MASTODON_URL}/api/v1/timelines/tag/{hashtag}'
+    params = {'limit': limit}
+    if since_id:
+        params['since_id'] = since_id
+
+    try:
+        r = get_client().get(URL, params=params)
+        update_rate_limit(r)
+        r.raise_for_status()
+        return json.loads(r.text)
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching toots of #{hashtag}: {e}")
+        return []
+
+def fetch_all_toots(tags, cursors:dict):
+    """
+    Fetch the toots newer than the cursor of each tag concurrently and merge them
+    without duplicates. Returns the toots with the tag they were found under by
+    toot ID and the new cursors.
+    """
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        timelines = pool.map(lambda tag: (tag.name, fetch_toots(tag.name, tag.limit,
+                                                                cursors.get(tag.name))), tags)
+
+        toots = {}
+        new_cursors = {}
+        for tag_name, timeline in timelines:
+            if timeline:
+                new_cursors[tag_name] = max((toot['id'] for toot in timeline), key=int)
+            for toot in timeline:
+                toots.setdefault(toot['id'], (toot, tag_name))
+    return toots, new_cursors
+
+def create_slides(toots:dict, not_older_then):
+    """
+    Filter the toots and render a slide for each remaining one. Returns the
+    slides and the tags of toots whose slide couldn't be rendered.
+    """
+    if not toots:
+        return [], set()
+
+    # Stream the toots from JSON through the filters, only the remaining ones are kept
+    filtered_toots = list(post_filter(parse_toots(toots.values()), not_older_then))
+    file_names = create_all_slides(filtered_toots, SLIDE_FOLDER)
+
+    slides = [Slide(toot.id, toot.n2i_tag, toot.created_at, file_name)
+              for toot, file_name in zip(filtered_toots, file_names) if file_name is not None]
+    failed_tags = {toot.n2i_tag for toot, file_name in zip(filtered_toots, file_names)
+                   if file_name is None}
+    return slides, failed_tags
+
+def delete_slide_files(file_names):
+    for file_name in file_names:
+        try:
+            os.remove(os.path.join(SLIDE_FOLDER, file_name))
+        except FileNotFoundError:
+            pass
+
+def remove_expired_slides(slides:list, not_older_then):
+    """ Remove slides of toots outside the time window and return the remaining ones """
+    expired = [slide for slide in slides if slide.created_at < not_older_then or
+               not os.path.exists(os.path.join(SLIDE_FOLDER, slide.file_name))]
+    delete_slide_files(slide.file_name for slide in expired)
+    remove_slides([slide.toot_id for slide in expired])
 
-def create_slides(hashtag:str, limit:int):
+    kept = [slide for slide in slides if slide not in expired]
 
-    URL = f'https://mastodon.social/api/v1/timelines/tag/{hashtag}'
+    # Remove slides which aren't tracked, e.g. created by older versions
+    kept_files = {slide.file_name for slide in kept}
+    delete_slide_files(image for image in os.listdir(SLIDE_FOLDER)
+                       if image.split("_", 1)[0] == "mastodon" and image not in kept_files)
+    return kept
 
-    r = requests.get(URL, params={'limit': limit}, timeout=10)
-    toots = json.loads(r.text)
+def trim_slides(slides:list, tags):
+    """ Remove the oldest slides of every tag exceeding its limit """
+    limits = {tag.name: tag.limit for tag in tags}
+    slides = sorted(slides, key=lambda slide: slide.created_at, reverse=True)
 
-    # Create pandas data frames from toots
-    toots_df = pd.DataFrame(toots)
+    count = {}
+    trimmed = []
+    for slide in slides:
+        count[slide.tag] = count.get(slide.tag, 0) + 1
+        if count[slide.tag] > limits.get(slide.tag, 0):
+            trimmed.append(slide)
+    delete_slide_files(slide.file_name for slide in trimmed)
+    remove_slides([slide.toot_id for slide in trimmed])
 
-    # Convert "created_at" timestamps to pandas Timestamp objects
-    toots_df['created_at'] = pd.to_datetime(toots_df['created_at']).dt.tz_convert('Europe/Berlin')
 
-    # Filter toots
-    one_hour_ago = pd.Timestamp.now(tz='Europe/Berlin') - pd.Timedelta(hours=3)
-    filtered_toots_df = post_filter(toots_df, one_hour_ago)
+def run(_context=None):
+    """
+    Job entry point called by the extension scheduler. The HTTP client, the
+    profanity scorer, the avatar cache and the slide renderer are module level
+    objects, so they stay warm in the persistent worker without the context.
+    """
+    tags = get_all_mastodon_tags()
+    not_older_then = datetime.now(timezone.utc) - MAX_TOOT_AGE
 
-    for _, row in filtered_toots_df.iterrows():
-        if isinstance(row['account'], float): continue
-        slide_creator(row, "static/uploads/")
+    # Keep slides of toots which are still within the time window
+    slides = remove_expired_slides(get_all_slides(), not_older_then)
+    known_toot_ids = {slide.toot_id for slide in slides}
 
-def remove_old_images():
-    for image in os.listdir("static/uploads/"):
-        if image.split("_", 1)[0] == "mastodon":
-            os.remove(os.path.join("static/uploads/", image))
+    # Only fetch and render toots newer than the last run
+    toots, cursors = fetch_all_toots(tags, get_tag_cursors())
+    new_toots = {toot_id: toot for toot_id, toot in toots.items() if toot_id not in known_toot_ids}
+    new_slides, failed_tags = create_slides(new_toots, not_older_then)
 
+    add_slides(new_slides)
+    trim_slides(slides + new_slides, tags)
+    # Tags with failed slides keep their cursor, so the next run tries their toots again
+    set_tag_cursors({tag: cursor for tag, cursor in cursors.items() if tag not in failed_tags})
 
 def main():
-    remove_old_images()
-    for tag in get_all_mastodon_tags():
-        hashtag = tag.name
-        limit = tag.limit
-        create_slides(hashtag, limit)
+    run()
 
 if __name__ == '__main__':
     main()
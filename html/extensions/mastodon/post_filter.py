@@ -1,59 +1,87 @@
 import re
-from profanity_check import predict
 from bs4 import BeautifulSoup
 import emoji
 
+from profanity_scorer import get_scorer
+
+SUPPORTED_LANGUAGES = ['de', 'en', "null", None]
+PATTERN_ANCHOR = r'<a\s.*?</a>'
+
 def html_to_text(content):
     soup = BeautifulSoup(content, 'html.parser')
     text = soup.get_text(separator=' ')
 
     return text.strip(" ")
 
-def adjust_content(content: str):
-    pattern_anchor = r'<a\s.*?</a>'
-    content = re.sub(pattern_anchor, "", content)
-
-    content = html_to_text(content)
-
-    content.strip(" ")
-    if len(content) >= 250:
-        content = content[:247] + "..."
-
+def finish_content(content: str):
     content = emoji.emojize(content, language='alias')
 
     content = content.encode('unicode-escape').decode('unicode-escape')
     return content
 
+def adjust_content(content: str):
+    content = re.sub(PATTERN_ANCHOR, "", content)
 
-def post_filter(toots_df, not_older_then):
-    # Filter toots that are not older than one hour
-    toots_df = toots_df[toots_df['created_at'] >= not_older_then]
-
-    for index, row in toots_df.iterrows():
-        # Filter sensitive
-        if row['sensitive']:
-            print("Removed toot because it contains sensitive content")
-            toots_df.drop(index, inplace=True)
-
-        # Filter for in_reply_to_id
-        if row['in_reply_to_id'] or row['in_reply_to_account_id']:
-            print("Removed toot because it's a reply")
-            toots_df.drop(index, inplace=True)
-
-        # Filter for polls
-        if row['poll']:
-            print("Removed toot because it contains a poll")
-            toots_df.drop(index, inplace=True)
-
-        # Filter supported languages
-        if row['language'] not in ['de', 'en', "null", None]:
-            print(f"Removed toot because it's content is in language: {row['language']}")
-            toots_df.drop(index, inplace=True)
-
-        if predict([row['content']]) or predict([row['account']['username']]):
-            print("Removed toot because it contains bad content")
-            toots_df.drop(index, inplace=True)
+    content = html_to_text(content)
 
-        toots_df.at[index, 'content'] = adjust_content(row['content'])
+    if len(content) >= 250:
+        content = content[:247] + "..."
 
-    return toots_df
+    return finish_content(content)
+
+def get_removal_reason(toot, not_older_then):
+    if toot.created_at < not_older_then:
+        return "it's too old"
+    if not isinstance(toot.account, dict):
+        return "it has no account"
+    if toot.sensitive:
+        return "it contains sensitive content"
+    if toot.in_reply_to_id or toot.in_reply_to_account_id:
+        return "it's a reply"
+    if toot.poll:
+        return "it contains a poll"
+    if toot.language not in SUPPORTED_LANGUAGES:
+        return "its content is in an unsupported language"
+    return None
+
+def filter_toots(toots, not_older_then):
+    """ Yield the toots which pass the metadata filters """
+    removed = {}
+    for toot in toots:
+        reason = get_removal_reason(toot, not_older_then)
+        if reason is None:
+            yield toot
+        else:
+            removed[reason] = removed.get(reason, 0) + 1
+
+    for reason, count in removed.items():
+        if reason != "it's too old":
+            print(f"Removed {count} toots because {reason}")
+
+def remove_bad_content(toots):
+    """ Yield the toots without bad content, scoring all contents and usernames at once """
+    toots = list(toots)
+    if not toots:
+        return
+
+    contents = [toot.content for toot in toots]
+    usernames = [toot.account.get('username', '') for toot in toots]
+    profane = get_scorer().is_profane(contents + usernames)
+
+    removed = 0
+    for toot, bad_content, bad_username in zip(toots, profane[:len(toots)], profane[len(toots):]):
+        if bad_content or bad_username:
+            removed += 1
+        else:
+            yield toot
+    if removed:
+        print(f"Removed {removed} toots because they contain bad content")
+
+def adjust_toots(toots):
+    for toot in toots:
+        toot.content = adjust_content(toot.content)
+        yield toot
+
+def post_filter(toots, not_older_then):
+    """ Filter and adjust toots lazily, returns a generator """
+    return adjust_toots(remove_bad_content(filter_toots(toots, not_older_then)))
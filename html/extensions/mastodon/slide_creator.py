@@ -1,69 +1,91 @@
-import os
-from io import BytesIO
-
-import requests
-from PIL import Image, ImageDraw, ImageFont
-
-def split_string_into_chunks(text, chunk_size=35):
-    chunks = []
-    tmp_text = text[0:chunk_size].strip()
-    if len(tmp_text) >= chunk_size and " " in tmp_text[0:chunk_size-5]:
-        splitted_text = tmp_text.rsplit(" ", 1)[0]
-        chunks.append(splitted_text)
-        chunks_tmp = split_string_into_chunks(text[len(splitted_text)+1:])
-        for chunk in chunks_tmp: chunks.append(chunk)
-    else:
-        chunks.append(tmp_text)
-        if len(text) > chunk_size:
-            chunks_tmp = split_string_into_chunks(text[chunk_size:])
-            for chunk in chunks_tmp: chunks.append(chunk)
-    return chunks
-
-def fetch_and_resize_image(url, target_size):
-    response = requests.get(url, timeout=10)
-    image = Image.open(BytesIO(response.content))
-
-    image = image.convert("RGB")
-    resized_image = image.resize(target_size)
-
-    return resized_image
+from PIL import Image
+
+from avatar_cache import AvatarCache, AVATAR_SIZE
+from slide_renderer import SlideRenderer, load_font
+from text_layout import fit_text, wrap_text
+from http_client import get_client
+
+TEMPLATE = "extensions/mastodon/assets/slide.png"
+FONT = "extensions/mastodon/assets/Symbola.ttf"
+CONTENT_BOX = (1650, 1040)
+MIN_CONTENT_SIZE = 64
+AVATAR_CACHE_FOLDER = "instance/mastodon_avatars/"
+
+# Kept between runs when the extension runs in a persistent worker
+avatar_cache = AvatarCache(AVATAR_CACHE_FOLDER, get_client())
+renderer = SlideRenderer(TEMPLATE, {'title': (FONT, 128), 'content': (FONT, 104)})
 
 def place_pp(slide, pp, position):
     slide.paste(pp, position)
     return slide
 
-def slide_creator(toot, destination_path:str):
-    image = Image.open("extensions/mastodon/assets/slide.png")
-    draw = ImageDraw.Draw(image)
+def get_content_font(size:int):
+    return load_font(FONT, size)
+
+def load_avatar(avatar_path):
+    """ Open an avatar resolved by the avatar cache, a placeholder if there is none """
+    if avatar_path:
+        try:
+            avatar = Image.open(avatar_path)
+            avatar.load()
+            return avatar
+        except OSError as e:
+            print(f"Error opening avatar {avatar_path}: {e}")
+    return Image.new("RGB", AVATAR_SIZE, "gray")
+
+def resolve_avatars(toots:list):
+    """
+    Download the avatars in the calling process, once per account, so the
+    render workers only open files. Returns the avatar paths in the order of the toots.
+    """
+    paths = {}
+    keys = [avatar_cache.get_key(toot.account, toot.account['avatar']) for toot in toots]
+    for toot, key in zip(toots, keys):
+        if key not in paths:
+            paths[key] = avatar_cache.get_path(toot.account, toot.account['avatar'])
+    return [paths[key] for key in keys]
 
-    username = toot['account']['username']
-    date = toot['created_at'].strftime('%d.%m.%y-%H:%M')
-    content_chunks = split_string_into_chunks(toot['content'])
-    tags = " ".join(["#" + tag['name'] for tag in toot['tags']])
-    tag_chunks = split_string_into_chunks(tags)
+def draw_toot(canvas, item):
+    toot, avatar_path = item
+    draw = canvas.draw
 
-    font = ImageFont.truetype("extensions/mastodon/assets/Symbola.ttf", 128)
-    content_font = ImageFont.truetype("extensions/mastodon/assets/Symbola.ttf", 104)
+    username = toot.account['username']
+    date = toot.created_at.strftime('%d.%m.%y-%H:%M')
+    tags = " ".join(["#" + tag['name'] for tag in toot.tags])
+
+    font = canvas.fonts['title']
+    content_font = canvas.fonts['content']
 
     username_position = (800,300)
     date_position = (800, 435)
     content_position = (800, 635)
-    tag_position = (800, 739)
 
     draw.text(username_position, username, fill="white", font=font)
     draw.text(date_position, date, fill="white", font=font)
 
-    for content in content_chunks:
-        draw.text(content_position, content, fill="white", font=content_font)
-        content_position = (content_position[0], content_position[1] + 104)
-        tag_position = (tag_position[0], tag_position[1] + 104)
+    # Shrink long toots to fit, the tags follow after an empty line
+    content = fit_text(toot.content, get_content_font, CONTENT_BOX, content_font.size,
+                       MIN_CONTENT_SIZE)
+    content.draw(draw, content_position)
+    tag_position = (800, content_position[1] + content.height + 104)
 
-    for i, tag in enumerate(tag_chunks):
+    # Limit the tags to two lines to not flood the slide
+    for tag in wrap_text(tags, content_font, CONTENT_BOX[0], max_lines=2):
         draw.text(tag_position, tag, fill="white", font=content_font)
         tag_position = (tag_position[0], tag_position[1] + 104)
-        if i == 1: break # Check to not flood the slide with tags
 
-    pp = fetch_and_resize_image(toot['account']['avatar'], (400,400))
-    image = place_pp(image, pp, (300, 300))
+    pp = load_avatar(avatar_path)
+    place_pp(canvas.image, pp, (300, 300))
+
+def get_file_name(toot):
+    return f"mastodon_{toot.id}.png"
+
+def slide_creator(toot, destination_path:str):
+    item = (toot, resolve_avatars([toot])[0])
+    return renderer.render(draw_toot, item, destination_path, get_file_name(toot))
 
-    image.save(os.path.join(destination_path,f"mastodon_{toot['id']}.png"))
+def create_all_slides(toots:list, destination_path:str):
+    """ Render the slides of several toots in parallel, None for slides which failed """
+    items = list(zip(toots, resolve_avatars(toots)))
+    return renderer.render_all(draw_toot, items, destination_path,
+                               [get_file_name(toot) for toot in toots])
@@ -0,0 +1,45 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+TIMEZONE = ZoneInfo('Europe/Berlin')
+
+class Toot:
+    """ The fields of a toot used by the extension, parsed from the Mastodon API """
+    __slots__ = ('id', 'created_at', 'sensitive', 'in_reply_to_id', 'in_reply_to_account_id',
+                 'poll', 'language', 'content', 'account', 'tags', 'n2i_tag')
+
+    def __init__(self, _id:str, _created_at:datetime, _sensitive:bool, _in_reply_to_id:str,
+                 _in_reply_to_account_id:str, _poll, _language:str, _content:str, _account:dict,
+                 _tags:list, _n2i_tag:str):
+        self.id = _id
+        self.created_at = _created_at
+        self.sensitive = _sensitive
+        self.in_reply_to_id = _in_reply_to_id
+        self.in_reply_to_account_id = _in_reply_to_account_id
+        self.poll = _poll
+        self.language = _language
+        self.content = _content
+        self.account = _account
+        self.tags = _tags
+        self.n2i_tag = _n2i_tag
+
+    @classmethod
+    def from_json(cls, data:dict, n2i_tag:str):
+        """ Create a toot from its JSON representation and the tag it was found under """
+        # Python < 3.11 doesn't parse the "Z" suffix
+        created_at = datetime.fromisoformat(data['created_at'].replace('Z', '+00:00'))
+        return cls(data['id'], created_at.astimezone(TIMEZONE), bool(data.get('sensitive')),
+                   data.get('in_reply_to_id'), data.get('in_reply_to_account_id'),
+                   data.get('poll'), data.get('language'), data.get('content') or "",
+                   data.get('account'), data.get('tags') or [], n2i_tag)
+
+    def __repr__(self):
+        return f"Toot({self.id!r}, #{self.n2i_tag})"
+
+def parse_toots(toots):
+    """ Parse (JSON, tag) pairs lazily, skipping malformed toots """
+    for data, n2i_tag in toots:
+        try:
+            yield Toot.from_json(data, n2i_tag)
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipped malformed toot: {e}")
@@ -1,38 +1,74 @@
 
 import os
 import json
+import logging
 import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Blueprint, session, render_template, request, redirect, url_for
+from flask import Blueprint, session, render_template, request, redirect, url_for, jsonify
 
 from helper import sanitize_string
 from role_based_access import check_access
 from filehandler import sanitize_filename
+from rate_limiter import RateLimiter
+from upload_stream import receive_images, create_rendition, discard_uploads, UPLOAD_TMP_FOLDER
 
+logger = logging.getLogger()
 
 blueprint = Blueprint('pibooth', __name__, template_folder='extensions/pibooth/templates')
 
+CONFIG_PATH = "extensions/pibooth/config.json"
+UPLOAD_FOLDER = "static/uploads/"
+TMP_FOLDER = UPLOAD_TMP_FOLDER
+MAX_FILE_SIZE = 5 * 1024 * 1024
+MAX_BATCH_FILES = 50
+MAX_BATCH_SIZE = 100 * 1024 * 1024
+
+# The token is cached until the config file changes, e.g. renewed by another worker
+token_cache = {"mtime": None, "token": None}
+token_lock = threading.Lock()
+
+# Bursts of 10 photos, afterwards one photo every 2 seconds
+upload_limiter = RateLimiter(rate=0.5, capacity=10)
+# Batches sync the backlog of a booth, 5 at once, afterwards one every 20 seconds
+batch_limiter = RateLimiter(rate=0.05, capacity=5)
+
+# Renditions are created in the background, so the upload request returns right away
+rendition_pool = ThreadPoolExecutor(max_workers=2)
+
 def load_config():
     # In case the config file do not exist, create it
-    if not os.path.exists("extensions/pibooth/config.json"):
-        with open("extensions/pibooth/config.json", "+w") as f:
+    if not os.path.exists(CONFIG_PATH):
+        with open(CONFIG_PATH, "+w") as f:
             f.write('{"token": "' + secrets.token_urlsafe(64) + '"}')
 
-    with open('extensions/pibooth/config.json', 'r') as config_file:
+    with open(CONFIG_PATH, 'r') as config_file:
         return json.load(config_file)
 
 def save_config(config:json):
-    with open('extensions/pibooth/config.json', 'w') as config_file:
+    with open(CONFIG_PATH, 'w') as config_file:
         json.dump(config, config_file)
 
 def get_token():
-    config = load_config()
-    return config.get("token")
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+
+    with token_lock:
+        if mtime is None or mtime != token_cache["mtime"]:
+            token_cache["token"] = load_config().get("token")
+            token_cache["mtime"] = os.stat(CONFIG_PATH).st_mtime_ns
+        return token_cache["token"]
 
 def renew_token():
-    config = load_config()
-    config['token'] = secrets.token_urlsafe(64)
-    save_config(config)
+    with token_lock:
+        config = load_config()
+        config['token'] = secrets.token_urlsafe(64)
+        save_config(config)
+        token_cache["token"] = config['token']
+        token_cache["mtime"] = os.stat(CONFIG_PATH).st_mtime_ns
 
 @blueprint.route('/',  methods=['GET','POST'])
 #@login_required
@@ -54,17 +90,76 @@ def index():
 #@login_required
 def upload_extension_pibooth():
     req_pibooth_token = request.headers.get('token')
-    req_pibooth_file = request.files.get('file')
-    if not req_pibooth_token == get_token():
+    if not secrets.compare_digest(req_pibooth_token or "", get_token() or ""):
         return "Token not valid", 400
-    elif not req_pibooth_file:
+
+    allowed, retry_after = upload_limiter.consume(request.remote_addr)
+    if not allowed:
+        return "Too many uploads", 429, {"Retry-After": str(retry_after)}
+
+    # The file is validated while it is received, before the body was read
+    uploads = receive_images(request.environ, TMP_FOLDER, MAX_FILE_SIZE, field='file')
+    if not uploads:
         return "No file received", 400
+    upload = uploads[0]
+    if upload.error:
+        return "File isn't a valid image", 400
 
-    file_name = sanitize_filename(req_pibooth_file.filename)
-    file_path = os.path.join("static/uploads/", file_name)
-    req_pibooth_file.save(file_path)
+    schedule_rendition(upload)
+    discard_uploads(uploads[1:])
     return "success", 200
 
+@blueprint.route('/upload/batch', methods=['POST'])
+def upload_batch_extension_pibooth():
+    req_pibooth_token = request.headers.get('token')
+    if not secrets.compare_digest(req_pibooth_token or "", get_token() or ""):
+        return "Token not valid", 400
+
+    allowed, retry_after = batch_limiter.consume(request.remote_addr)
+    if not allowed:
+        return "Too many uploads", 429, {"Retry-After": str(retry_after)}
+
+    uploads = receive_images(request.environ, TMP_FOLDER, MAX_FILE_SIZE, max_content_length=MAX_BATCH_SIZE,
+                             max_files=MAX_BATCH_FILES, parallel=True)
+    if not uploads:
+        return "No file received", 400
+
+    stored = []
+    for upload in uploads:
+        if not upload.error:
+            stored.append(upload.filename)
+            schedule_rendition(upload)
+
+    rejected = [{"file": upload.filename, "error": upload.error} for upload in uploads if upload.error]
+    return jsonify(stored=stored, rejected=rejected), 200 if stored else 400
+
+def get_rendition_name(file_name:str, image_format:str):
+    # GIFs are kept to preserve animations, everything else is shown as JPEG.
+    # The detected format decides, not the extension sent by the client.
+    name = os.path.splitext(sanitize_filename(file_name))[0]
+    if image_format == "GIF":
+        return name + ".gif"
+    return name + ".jpg"
+
+def schedule_rendition(upload):
+    """ Move the validated upload out of the request and re-encode it in the background """
+    rendition_path = os.path.join(UPLOAD_FOLDER, get_rendition_name(upload.filename, upload.format))
+    source_path = upload.path
+    upload.path = None
+    future = rendition_pool.submit(create_rendition, source_path, rendition_path)
+    future.add_done_callback(lambda future: check_rendition(future, source_path))
+
+def check_rendition(future, source_path:str):
+    """ Log unexpected errors of a rendition job and remove its upload """
+    error = future.exception()
+    if error is None:
+        return
+    logger.error(f"Error creating the rendition of '{source_path}': {error!r}")
+    try:
+        os.remove(source_path)
+    except FileNotFoundError:
+        pass
+
 def error_page(error_message: str):
     error_message = sanitize_string(error_message, extend_allowed_chars=True)
     return render_template('errors/error.html', error_message=error_message)
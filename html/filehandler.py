@@ -34,8 +34,10 @@ from helper import (generate_random,
 from db_file_helper import check_global_upload_limit
 from db_file_helper import remove_file_from_queue, remove_file_from_db
 from db_file_helper import add_file_to_queue
+from db_file_helper import add_files_to_db, get_remaining_global_uploads
 from db_file_helper import check_file_exist_in_db
 from db_models import Users
+from db_user_helper import get_user_from_users
 from emailhandler import send_email_approval_request
 
 from extensions.cms.CMSConfig import get_setting_from_config
@@ -210,6 +212,71 @@ def safe_file(file, QUEUE_FOLDER:str, user_name:str) -> bool:
     return False
 
 
+def safe_files(uploads:list, folder:str, user_name:str, queue:bool=True) -> list[str]:
+    """
+    @brief Stores the validated files of a batch upload and adds them to the database at once.
+
+    The files are moved from their temporary location to the folder and committed to the
+    database in a single transaction. Files exceeding the global or the user's upload
+    limit are rejected. For queued files an approval email is sent if enabled.
+
+    @param uploads The validated upload_stream.ImageUpload objects, rejected ones get an error set.
+    @param folder The queue or upload folder the files are moved to.
+    @param user_name The name of the user performing the upload.
+    @param queue Whether the files are queued for approval, otherwise they are uploaded directly.
+
+    @return The names of the stored files.
+    """
+
+    user = get_user_from_users(user_name)
+    if not user:
+        logger.warning(f"User '{user_name}' of a batch upload could not be found")
+        for upload in uploads:
+            upload.error = "Unknown user"
+        return []
+
+    slots = min(get_remaining_global_uploads(), user.upload_limit - user.upload_amount)
+
+    stored = []
+    for upload in uploads:
+        if len(stored) >= slots:
+            upload.error = "Upload limit reached"
+            continue
+
+        file_name = sanitize_filename(upload.filename)
+        file_path = get_file_path(folder, file_name)
+        if not file_path:
+            upload.error = "Invalid file name"
+            continue
+
+        if not move_file(upload.path, file_path):
+            upload.error = "File couldn't be stored"
+            continue
+        upload.path = None
+
+        file_password = generate_random()
+        stored.append((upload, file_name, file_path, file_password))
+
+    files = [(file_name, file_path, hash_sha_512(file_password))
+             for _, file_name, file_path, file_password in stored]
+    if not files:
+        return []
+
+    if not add_files_to_db(files, user_name, uploads=not queue):
+        logger.warning("Files of a batch upload weren't saved because no db entries could be created")
+        for upload, _, file_path, _ in stored:
+            upload.error = "File couldn't be stored"
+            os.remove(file_path)
+        return []
+
+    if queue and get_setting_from_config("email_approve").active:
+        for _, file_name, file_path, file_password in stored:
+            if not send_email_approval_request(file_name, file_password, file_path):
+                logger.warning(f"Failed to sent a file approval email for '{file_name}'")
+
+    return [file_name for _, file_name, _, _ in stored]
+
+
 def delete_file(file_name:str) -> bool:
     """
     @brief Deletes a file from the filesystem and its entry from the database.
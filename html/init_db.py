@@ -0,0 +1,64 @@
+"""
+@file init_db.py
+@brief One-time initialization of the CMS databases.
+
+Creates the tables, seeds the roles, the system user and the extension rows,
+creates the CMS config database and resets the metrics of the last run. This only has to happen once per start
+of the CMS, not in every worker.
+
+@details
+Run from the html folder before the app is started:
+
+    python init_db.py
+
+uWSGI runs it before the master loads the app (see uwsgi.ini) and sets
+N2I_INIT_DB=0, so importing app.py skips the initialization. Without that
+variable app.py initializes the databases itself, e.g. for `python app.py`.
+
+@note
+- The connections opened for the initialization are closed afterwards, so
+    workers forked from a process which initialized the databases don't share
+    an SQLite connection.
+"""
+
+import os
+import logging
+
+from db_models import db, create_roles, create_users, create_extensions
+from extensions.cms.CMSConfig import get_conn
+from metrics import clear_metrics
+
+logger = logging.getLogger()
+
+
+def init_databases(app, extension_manifests: list):
+    """
+    @brief Creates and seeds the databases of the CMS.
+
+    @param app The Flask app, configured with Flask-SQLAlchemy.
+    @param extension_manifests The manifests of the discovered extensions.
+    """
+    with app.app_context():
+        db.create_all()
+        create_roles()
+        create_users()
+        create_extensions(extension_manifests)
+        db.session.remove()
+        db.engine.dispose()
+
+    get_conn().close()         # Initilize the cms extensions DB
+    clear_metrics(os.path.join(app.instance_path, "metrics"))
+    logger.info("Databases initialized")
+
+
+def should_init_databases() -> bool:
+    """
+    @brief Returns whether the app has to initialize the databases while it is imported.
+    """
+    return os.environ.get('N2I_INIT_DB', '1') != '0'
+
+
+if __name__ == "__main__":
+    os.environ['N2I_INIT_DB'] = '0'
+    import app  # pylint: disable=import-outside-toplevel
+    init_databases(app.app, app.extension_manifests)
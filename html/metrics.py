@@ -0,0 +1,303 @@
+"""
+@file metrics.py
+@brief Prometheus metrics of the CMS, aggregated across the uWSGI workers.
+
+Every process records its counters and histograms in memory. A background
+thread writes them every FLUSH_INTERVAL seconds to its own JSON file in the
+metrics folder. The /metrics endpoint sums the files of all workers and
+renders them in the Prometheus text format, together with gauges queried
+at scrape time.
+
+Recorded by the app:
+- n2i_http_requests_total, n2i_http_request_duration_seconds: per route, method and status
+- n2i_db_queries_per_request, n2i_db_query_duration_seconds_total: SQLAlchemy queries per route
+- n2i_upload_bytes_total: the size of multipart requests per route
+- n2i_email_send_duration_seconds: the duration of sending an email, by result
+- n2i_approval_wait_seconds: the time from storing a file in the queue until its approval
+- n2i_queue_files, n2i_upload_files: the amount of queued and uploaded files
+
+@details
+Recording from other modules:
+
+    from metrics import observe, increment
+
+    observe("n2i_email_send_duration_seconds", duration, result="sent")
+
+@note
+- The queue table has no timestamp, the approval wait uses the modification
+    time of the queued file.
+- /metrics exposes the traffic of every route. Without METRICS_TOKEN only
+    clients on the same host may scrape it.
+- The metrics folder is cleared by init_db.py, so counters start at zero with
+    every start of uWSGI. Files of respawned workers are kept until then.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import bisect
+import secrets
+
+from flask import g, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger()
+
+FLUSH_INTERVAL = 2.0
+
+# Clients allowed to scrape /metrics without METRICS_TOKEN
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+EMAIL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+APPROVAL_BUCKETS = (60, 300, 900, 3600, 4 * 3600, 12 * 3600, 24 * 3600, 3 * 24 * 3600, 7 * 24 * 3600)
+
+# Name: (type, help, buckets)
+METRICS = {
+    "n2i_http_requests_total": ("counter", "HTTP requests by route, method and status.", None),
+    "n2i_http_request_duration_seconds": ("histogram", "Duration of HTTP requests.", LATENCY_BUCKETS),
+    "n2i_db_queries_per_request": ("histogram", "SQLAlchemy queries per HTTP request.", QUERY_BUCKETS),
+    "n2i_db_query_duration_seconds_total": ("counter", "Time spent in SQLAlchemy queries.", None),
+    "n2i_upload_bytes_total": ("counter", "Bytes received in multipart requests.", None),
+    "n2i_email_send_duration_seconds": ("histogram", "Duration of sending an email.", EMAIL_BUCKETS),
+    "n2i_approval_wait_seconds": ("histogram", "Time files waited in the queue until approved.", APPROVAL_BUCKETS),
+}
+
+
+def format_labels(labels: dict) -> str:
+    return ",".join(f'{name}="{str(value)}"'.replace("\n", " ") for name, value in sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+    @brief The metrics of one process, written to a JSON file of its own.
+    """
+    def __init__(self):
+        self.folder = None
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.flusher_pid = None
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = format_labels(labels)
+        with self.lock:
+            values = self.counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+            self.dirty = True
+        self.ensure_flusher()
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = format_labels(labels)
+        with self.lock:
+            values = self.histograms.setdefault(name, {})
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            self.dirty = True
+        self.ensure_flusher()
+
+    def ensure_flusher(self):
+        # Workers are forked after the import, every process needs its own thread
+        if self.folder is None or self.flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self.flusher_pid == os.getpid():
+                return
+            self.flusher_pid = os.getpid()
+        threading.Thread(target=self.flush_forever, name="metrics-flush", daemon=True).start()
+
+    def flush_forever(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """
+        @brief Writes the metrics of this process to its file, if they changed.
+        """
+        with self.lock:
+            if not self.dirty or self.folder is None:
+                return
+            data = json.dumps({"counters": self.counters, "histograms": self.histograms})
+            self.dirty = False
+
+        path = os.path.join(self.folder, f"{os.getpid()}.json")
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.error(f"Metrics couldn't be written: {e}")
+
+    def collect(self) -> tuple[dict, dict]:
+        """
+        @brief Sums the metrics of all processes.
+
+        @return The counters and histograms by name and labels.
+        """
+        self.flush()
+        counters, histograms = {}, {}
+        for file_name in os.listdir(self.folder):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.folder, file_name), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for name, values in data["counters"].items():
+                total = counters.setdefault(name, {})
+                for key, value in values.items():
+                    total[key] = total.get(key, 0) + value
+
+            for name, values in data["histograms"].items():
+                total = histograms.setdefault(name, {})
+                for key, histogram in values.items():
+                    if key not in total:
+                        total[key] = {"buckets": list(histogram["buckets"]), "sum": histogram["sum"],
+                                      "count": histogram["count"]}
+                        continue
+                    merged = total[key]
+                    merged["buckets"] = [a + b for a, b in zip(merged["buckets"], histogram["buckets"])]
+                    merged["sum"] += histogram["sum"]
+                    merged["count"] += histogram["count"]
+        return counters, histograms
+
+
+registry = MetricsRegistry()
+
+
+def increment(name: str, value: float = 1, **labels):
+    registry.increment(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    registry.observe(name, value, **labels)
+
+
+def render(counters: dict, histograms: dict, gauges: dict) -> str:
+    """
+    @brief Renders metrics in the Prometheus text format.
+    """
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        if metric_type == "counter":
+            for key, value in sorted(counters.get(name, {}).items()):
+                lines.append(f"{name}{{{key}}} {value}" if key else f"{name} {value}")
+            continue
+
+        for key, histogram in sorted(histograms.get(name, {}).items()):
+            prefix = key + "," if key else ""
+            cumulative = 0
+            for bound, count in zip(buckets, histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram["count"]}')
+            labels = f"{{{key}}}" if key else ""
+            lines.append(f"{name}_sum{labels} {histogram['sum']}")
+            lines.append(f"{name}_count{labels} {histogram['count']}")
+
+    for name, (help_text, value) in gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def get_route() -> str:
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+    # Kept on the execution context, which is discarded with failed statements
+    context.n2i_query_start_time = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+    duration = time.perf_counter() - context.n2i_query_start_time
+    if g:
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + duration
+        # Set by the query profiler, see query_profiler.py
+        statements = g.get("db_statements")
+        if statements is not None:
+            statements.append(statement)
+
+
+def before_request():
+    g.request_start_time = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+
+
+def after_request(response):
+    if "request_start_time" not in g:
+        return response
+
+    route = get_route()
+    increment("n2i_http_requests_total", route=route, method=request.method, status=response.status_code)
+    observe("n2i_http_request_duration_seconds", time.perf_counter() - g.request_start_time,
+            route=route, method=request.method)
+    observe("n2i_db_queries_per_request", g.db_queries, route=route)
+    if g.db_time:
+        increment("n2i_db_query_duration_seconds_total", g.db_time, route=route)
+    if request.mimetype == "multipart/form-data" and request.content_length:
+        increment("n2i_upload_bytes_total", request.content_length, route=route)
+    return response
+
+
+def clear_metrics(folder: str):
+    """
+    @brief Removes the metrics files of previous processes.
+    """
+    if not os.path.isdir(folder):
+        return
+    for file_name in os.listdir(folder):
+        if file_name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(folder, file_name))
+
+
+def init_metrics(app, get_gauges=None):
+    """
+    @brief Registers the request hooks, the query listeners and the /metrics endpoint.
+
+    The endpoint requires the bearer token METRICS_TOKEN if it is set,
+    otherwise it only answers requests from the same host.
+
+    @param app The Flask app.
+    @param get_gauges A function returning the gauges as dict of name to (help, value).
+    """
+    registry.folder = os.path.join(app.instance_path, "metrics")
+    os.makedirs(registry.folder, exist_ok=True)
+
+    app.before_request(before_request)
+    app.after_request(after_request)
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+
+    def metrics_endpoint():
+        token = os.environ.get("METRICS_TOKEN")
+        if token:
+            if not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+                return Response("Unauthorized", status=401)
+        elif request.remote_addr not in LOOPBACK_ADDRESSES:
+            return Response("Forbidden, set METRICS_TOKEN to scrape remotely", status=403)
+
+        counters, histograms = registry.collect()
+        gauges = get_gauges() if get_gauges else {}
+        return Response(render(counters, histograms, gauges), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_endpoint)
@@ -0,0 +1,121 @@
+"""
+@file profanity_scorer.py
+@brief Shared profanity scoring for extensions moderating text.
+
+The model of profanity_check is loaded lazily on the first use and kept for
+the lifetime of the process, so an extension running in a persistent worker
+loads it only once. Texts are scored in batches with a single model call and
+the scores of already seen texts are cached by their hash, so toots which are
+fetched again in a later run aren't scored again.
+
+@details
+Usage from an extension:
+
+    from profanity_scorer import get_scorer
+
+    profane = get_scorer().is_profane([toot_content, username])
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+THRESHOLD = 0.5
+
+
+class ProfanityScorer:
+    """
+    @brief Scores texts with the profanity_check model, caching the scores by content hash.
+    """
+    def __init__(self, cache_size: int = 50000):
+        """
+        @param cache_size The maximum amount of cached scores.
+        """
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.predict_prob = None
+        self.scored = 0
+        self.cache_hits = 0
+
+    def load(self):
+        """
+        @brief Loads the model and its vectorizer, if not loaded yet.
+        """
+        with self.lock:
+            if self.predict_prob is None:
+                # Importing profanity_check loads the model from disk
+                from profanity_check import predict_prob  # pylint: disable=import-outside-toplevel
+                self.predict_prob = predict_prob
+                logger.info("Profanity model loaded")
+
+    @staticmethod
+    def get_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def score(self, texts: list[str]) -> list[float]:
+        """
+        @brief Returns the probability of each text being profane.
+
+        All texts which aren't cached are scored with a single model call.
+
+        @param texts The texts to score.
+        @return The scores between 0 and 1 in the order of the texts.
+        """
+        keys = [self.get_key(text) for text in texts]
+        scores = [None] * len(texts)
+        missing = {}
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                score = self.cache.get(key)
+                if score is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self.cache.move_to_end(key)
+                    scores[i] = score
+            self.cache_hits += len(texts) - sum(len(indices) for indices in missing.values())
+
+        if missing:
+            self.load()
+            missing_texts = [texts[indices[0]] for indices in missing.values()]
+            probabilities = self.predict_prob(missing_texts)
+
+            with self.lock:
+                self.scored += len(missing_texts)
+                for (key, indices), probability in zip(missing.items(), probabilities):
+                    probability = float(probability)
+                    for i in indices:
+                        scores[i] = probability
+                    self.cache[key] = probability
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return scores
+
+    def is_profane(self, texts: list[str], threshold: float = THRESHOLD) -> list[bool]:
+        """
+        @brief Returns whether each text is profane, like profanity_check.predict.
+
+        @param texts The texts to check.
+        @param threshold The score above which a text counts as profane.
+        @return A bool per text.
+        """
+        return [score > threshold for score in self.score(texts)]
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_scorer() -> ProfanityScorer:
+    """
+    @brief Returns the scorer shared by all modules of the process.
+    """
+    global _scorer  # pylint: disable=global-statement
+    with _scorer_lock:
+        if _scorer is None:
+            _scorer = ProfanityScorer()
+        return _scorer
@@ -0,0 +1,154 @@
+"""
+@file query_profiler.py
+@brief Profiling of the SQL queries of every request, for development.
+
+With SQL_PROFILING=1 the app logs after every request how many queries it
+issued, how long they took and which statements were repeated. Repeated
+statements are usually an N+1 pattern, e.g. a lazy loaded relationship in a
+loop. Requests above SQL_QUERY_BUDGET queries are logged as a warning. The
+response carries a Server-Timing header, shown by the network tab of the
+browser's developer tools.
+
+The queries are counted by the SQLAlchemy listeners of metrics.py.
+
+@details
+Tests can fail when code exceeds a query budget:
+
+    from query_profiler import query_budget
+
+    with query_budget(2):
+        client.get("/management/users")
+
+@note
+- Only SQLAlchemy queries are counted, not the sqlite3 connection of CMSConfig.
+"""
+
+import os
+import time
+import logging
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger()
+
+REPEATED_STATEMENT_THRESHOLD = 2
+
+
+def get_repeated_statements(statements: list[str]) -> list[tuple[str, int]]:
+    """
+    @brief Returns the statements executed more than once, most frequent first.
+
+    The statements are parameterized, so the same query with other values counts as repeated.
+    """
+    counts = Counter(" ".join(statement.split()) for statement in statements)
+    return [(statement, count) for statement, count in counts.most_common()
+            if count >= REPEATED_STATEMENT_THRESHOLD]
+
+
+def format_report(statements: list[str], db_time: float) -> str:
+    lines = [f"{len(statements)} queries in {db_time * 1000:.1f} ms"]
+    for statement, count in get_repeated_statements(statements):
+        lines.append(f"  {count}x {statement[:200]}")
+    return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """
+    @brief Records the statements executed by all engines while it is active.
+    """
+    def __init__(self):
+        self.statements = []
+        self.db_time = 0.0
+        # Start times by execution context, failed statements are never finished
+        self.start_times = {}
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+        self.start_times[id(context)] = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):  # pylint: disable=unused-argument,too-many-arguments
+        self.db_time += time.perf_counter() - self.start_times.pop(id(context))
+        self.statements.append(statement)
+
+    def report(self) -> str:
+        return format_report(self.statements, self.db_time)
+
+
+@contextmanager
+def count_queries():
+    """
+    @brief Counts the queries executed inside the with block.
+
+    @return A QueryCounter with the statements and the time spent in the database.
+    """
+    counter = QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter.before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", counter.after_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, "before_cursor_execute", counter.before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", counter.after_cursor_execute)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    @brief Fails if the with block executes more than max_queries queries.
+
+    @exception QueryBudgetExceeded An AssertionError listing the queries and the repeated statements.
+    """
+    with count_queries() as counter:
+        yield counter
+    if counter.count > max_queries:
+        raise QueryBudgetExceeded(f"Query budget of {max_queries} exceeded: {counter.report()}")
+
+
+def before_request():
+    g.db_statements = []
+
+
+def after_request(response):
+    statements = g.get("db_statements")
+    if statements is None:
+        return response
+
+    db_time = g.get("db_time", 0.0)
+    report = format_report(statements, db_time)
+    route = request.url_rule.rule if request.url_rule is not None else request.path
+    budget = current_app.config['SQL_QUERY_BUDGET']
+    if len(statements) > budget or get_repeated_statements(statements):
+        logger.warning(f"{request.method} {route}: {report} (budget {budget})")
+    else:
+        logger.info(f"{request.method} {route}: {report}")
+
+    response.headers.add("Server-Timing", f'db;dur={db_time * 1000:.1f};desc="{len(statements)} queries"')
+    return response
+
+
+def init_query_profiler(app):
+    """
+    @brief Enables the query profiling of requests if SQL_PROFILING is set.
+
+    Has to be called after init_metrics, whose listeners record the statements.
+
+    @param app The Flask app.
+    """
+    if os.environ.get("SQL_PROFILING", "0") in ("0", ""):
+        return
+
+    app.config['SQL_QUERY_BUDGET'] = int(os.environ.get("SQL_QUERY_BUDGET", "10"))
+    app.before_request(before_request)
+    app.after_request(after_request)
+    logger.info("SQL query profiling enabled")
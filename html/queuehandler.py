@@ -40,6 +40,7 @@ If a failure occurs during file approval, database consistency is handled, and a
 """
 
 import os
+import time
 import logging
 from typing import Union
 
@@ -50,6 +51,7 @@ from db_file_helper import (get_file_from_queue,
 from filehandler import move_file
 from emailhandler import send_email_error_message
 from helper import hash_sha_512
+from metrics import observe
 
 logger = logging.getLogger()
 
@@ -96,6 +98,9 @@ def approve_file(file_name: str, uploads_path: str, file_password: str, admin: b
             logger.info("The files password wasn't correct")
             return False
 
+    # The queue table has no timestamp, the file was written when it was queued
+    queued_since = os.path.getmtime(file_path)
+
     # Move the file to uploads and update the database.
     destination_path = os.path.join(uploads_path, file_name)
     if not add_file_to_uploads(file_name, destination_path, file_owner):
@@ -123,4 +128,6 @@ def approve_file(file_name: str, uploads_path: str, file_password: str, admin: b
             "this does not happen again.")
         sent_email_error_message("Database inconsistency", error_message)
         return False
+
+    observe("n2i_approval_wait_seconds", max(time.time() - queued_since, 0), admin=admin)
     return True
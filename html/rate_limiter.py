@@ -0,0 +1,97 @@
+"""
+@file rate_limiter.py
+@brief Token bucket rate limiting for endpoints of the CMS and its extensions.
+
+A bucket holds up to `capacity` tokens and is refilled with `rate` tokens per
+second. Every request consumes a token, requests finding an empty bucket are
+rejected immediately instead of occupying a worker. Bursts up to the capacity
+pass, the sustained request rate is limited to `rate`.
+
+@details
+Usage in a route:
+
+    limiter = RateLimiter(rate=0.5, capacity=10)
+
+    allowed, retry_after = limiter.consume(request.remote_addr)
+    if not allowed:
+        return "Too many requests", 429, {"Retry-After": str(retry_after)}
+
+@note
+- The buckets live in the memory of a process, every uWSGI worker limits on its own.
+"""
+
+import math
+import time
+import threading
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    @brief A single token bucket.
+    """
+    def __init__(self, rate: float, capacity: float):
+        """
+        @param rate The tokens added per second.
+        @param capacity The maximum amount of tokens, i.e. the allowed burst.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, tokens: float = 1) -> tuple[bool, int]:
+        """
+        @brief Takes tokens from the bucket if there are enough.
+
+        @param tokens The amount of tokens the request costs.
+        @return A tuple of whether the request is allowed and the seconds after
+                which it would be allowed.
+        """
+        self.refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0
+        if self.rate <= 0:
+            return False, 3600
+        return False, max(1, math.ceil((tokens - self.tokens) / self.rate))
+
+
+class RateLimiter:
+    """
+    @brief Token buckets by key, e.g. by client address or token.
+    """
+    def __init__(self, rate: float, capacity: float, max_keys: int = 1024):
+        """
+        @param rate The tokens added per second to each bucket.
+        @param capacity The maximum amount of tokens of each bucket.
+        @param max_keys The maximum amount of buckets, the least recently used are dropped.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key: str, tokens: float = 1) -> tuple[bool, int]:
+        """
+        @brief Takes tokens from the bucket of a key.
+
+        @param key The key whose bucket is used.
+        @param tokens The amount of tokens the request costs.
+        @return A tuple of whether the request is allowed and the seconds after
+                which it would be allowed.
+        """
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity)
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.consume(tokens)
@@ -19,9 +19,11 @@
 import os
 import logging
 
+from db_models import Users
 from db_user_helper import get_user_from_users
 from db_extension_helper import db_get_extension
 
+logger = logging.getLogger()
 
 
 def check_admin(user_name: str) -> bool:
@@ -75,15 +77,17 @@ def cms_active() -> bool:
     return False
 
 
-def check_access(user_name: str, min_req_role_id: int) -> bool:
+def check_access(user_name: str, min_req_role_id: int, user: Users = None) -> bool:
     """
     Check if the user has the required access based on their role.
 
     @param user_name The username to check.
     @param min_req_role_id The minimum required role ID for access.
+    @param user The already loaded user, saves querying it again.
     @return True if the user has the required access, False otherwise.
     """
-    user = get_user_from_users(user_name)
+    if user is None:
+        user = get_user_from_users(user_name)
     if not user:
         logger.warning(f"User '{user_name}' couldn't be found.")
         return False
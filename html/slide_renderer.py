@@ -0,0 +1,194 @@
+"""
+@file slide_renderer.py
+@brief Rendering engine for slides generated by extensions.
+
+Extensions which generate slides (e.g. the mastodon extension) describe their
+slides by a template image, the fonts they need and a draw function. The
+template and the fonts are loaded once per process and the template is copied
+for every slide. Slides are rendered in parallel by a pool of processes which
+is kept between runs and are written atomically, so the CMS never serves a
+half-written image.
+
+@details
+Usage from an extension:
+
+    renderer = SlideRenderer("extensions/example/assets/slide.png",
+                             {"title": ("extensions/example/assets/font.ttf", 128)})
+    file_names = renderer.render_all(draw_item, items, "static/uploads/",
+                                     [f"example_{item['id']}.png" for item in items])
+
+The draw function `draw_item(canvas, item)` receives a SlideCanvas and one item.
+It must be defined at module level and the items must be picklable, as both are
+sent to the worker processes.
+
+@note
+- Temporary files are written to a hidden folder inside the destination folder,
+    so they are never listed as uploads.
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger()
+
+TMP_FOLDER = ".tmp"
+
+
+@lru_cache(maxsize=None)
+def load_template(template_path: str):
+    """
+    @brief Loads a template image once per process.
+
+    @param template_path The path of the template image.
+    @return The loaded image, it must be copied before drawing on it.
+    """
+    template = Image.open(template_path)
+    template.load()
+    return template
+
+
+@lru_cache(maxsize=None)
+def load_font(font_path: str, size: int):
+    """
+    @brief Loads a TrueType font in a size once per process.
+    """
+    return ImageFont.truetype(font_path, size)
+
+
+class SlideCanvas:
+    """
+    @brief A copy of the template with the loaded fonts, passed to draw functions.
+    """
+    def __init__(self, template_path: str, fonts: dict):
+        self.image = load_template(template_path).copy()
+        self.draw = ImageDraw.Draw(self.image)
+        self.fonts = {name: load_font(path, size) for name, (path, size) in fonts.items()}
+
+
+def save_atomic(image, path: str):
+    """
+    @brief Saves an image by writing a temporary file and renaming it.
+
+    @param image The PIL image to save.
+    @param path The destination path, its file extension determines the format.
+    """
+    directory, file_name = os.path.split(path)
+    tmp_folder = os.path.join(directory, TMP_FOLDER)
+    os.makedirs(tmp_folder, exist_ok=True)
+
+    tmp_path = os.path.join(tmp_folder, f"{file_name}.{os.getpid()}.{threading.get_ident()}")
+    image_format = Image.registered_extensions().get(os.path.splitext(file_name)[1].lower())
+    try:
+        image.save(tmp_path, format=image_format)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def render_slide(template_path: str, fonts: dict, draw_function, item,
+                 destination_path: str, file_name: str):
+    """
+    @brief Renders one slide and saves it atomically.
+
+    @return The file name of the slide.
+    """
+    canvas = SlideCanvas(template_path, fonts)
+    draw_function(canvas, item)
+    save_atomic(canvas.image, os.path.join(destination_path, file_name))
+    return file_name
+
+
+class SlideRenderer:
+    """
+    @brief Renders slides from a template, in parallel by a pool of processes.
+
+    The pool is started on the first batch of slides and kept until close(), so
+    a renderer which lives as long as the extension job keeps its workers warm.
+    """
+    def __init__(self, template_path: str, fonts: dict, workers: int = None):
+        """
+        @param template_path The path of the template image.
+        @param fonts The fonts by name as (path, size) tuples.
+        @param workers The amount of worker processes, 0 renders in the calling process.
+        """
+        self.template_path = template_path
+        self.fonts = fonts
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self.pool = None
+
+    def get_pool(self):
+        if self.pool is None and self.workers > 1:
+            try:
+                # Spawned workers don't inherit threads or connections of the extension
+                self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, AssertionError) as e:
+                logger.warning(f"Rendering slides in-process, no worker pool: {e}")
+                self.workers = 0
+        return self.pool
+
+    def render(self, draw_function, item, destination_path: str, file_name: str):
+        """
+        @brief Renders a single slide in the calling process.
+
+        @return The file name of the slide.
+        """
+        return render_slide(self.template_path, self.fonts, draw_function, item,
+                            destination_path, file_name)
+
+    def render_all(self, draw_function, items: list, destination_path: str,
+                   file_names: list[str]) -> list:
+        """
+        @brief Renders several slides, in parallel if there are worker processes.
+
+        @param draw_function The module level function drawing an item onto a SlideCanvas.
+        @param items The items to render.
+        @param destination_path The folder the slides are saved to.
+        @param file_names The file names of the slides, one per item.
+
+        @return The file names in the order of the items, None for slides which failed.
+        """
+        pool = self.get_pool() if len(items) > 1 else None
+        if pool is None:
+            futures = None
+        else:
+            try:
+                futures = [pool.submit(render_slide, self.template_path, self.fonts, draw_function,
+                                       item, destination_path, file_name)
+                           for item, file_name in zip(items, file_names)]
+            except BrokenProcessPool as e:
+                logger.error(f"Slide worker pool broke, restarting it: {e}")
+                self.close()
+                futures = None
+
+        results = []
+        for i, (item, file_name) in enumerate(zip(items, file_names)):
+            try:
+                if futures is None:
+                    results.append(self.render(draw_function, item, destination_path, file_name))
+                else:
+                    results.append(futures[i].result())
+            except BrokenProcessPool as e:
+                logger.error(f"Slide worker pool broke while rendering {file_name}: {e}")
+                self.close()
+                results.append(None)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Error rendering slide {file_name}: {e}")
+                results.append(None)
+        return results
+
+    def close(self):
+        """
+        @brief Stops the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        self.pool = None
@@ -0,0 +1,116 @@
+"""
+@file static_delivery.py
+@brief Delivery of the static files, i.e. the slides, with cache headers and web server offloading.
+
+Every URL built with url_for('static', ...) carries a version `v` derived from
+the modification time and size of the file. A request whose version matches
+the current file is answered with an immutable cache header for a year, a
+changed file gets a new URL. Requests without a matching version may only be
+cached for STATIC_MAX_AGE seconds and are revalidated with ETag/Last-Modified.
+
+How the file content is transferred is configured with STATIC_DELIVERY:
+
+- app (default): The app sends the file, with range requests. uWSGI hands
+    the transfer to its offload threads (offload-threads in uwsgi.ini), so the
+    worker is free for the next request while a slow screen downloads.
+- x-accel-redirect: nginx sends the file. The app only answers with the
+    headers and an X-Accel-Redirect to STATIC_ACCEL_LOCATION.
+- x-sendfile: Apache (mod_xsendfile) or lighttpd sends the file, the app
+    answers with an X-Sendfile header containing the absolute path.
+
+@details
+nginx configuration for x-accel-redirect with the default location:
+
+    location /static-internal/ {
+        internal;
+        alias /path/to/html/static/;
+    }
+
+@note
+- nginx and Apache answer range requests of redirected files themselves.
+"""
+
+import os
+import hashlib
+import logging
+import mimetypes
+from urllib.parse import quote
+
+from flask import request, abort, send_file, current_app
+from werkzeug.security import safe_join
+
+logger = logging.getLogger()
+
+DELIVERY_MODES = ('app', 'x-accel-redirect', 'x-sendfile')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+def get_file_version(path: str) -> str:
+    """
+    @brief Returns a short hash of the modification time and size of a file, None if it doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return hashlib.blake2b(f"{stat.st_mtime_ns}-{stat.st_size}".encode(), digest_size=6).hexdigest()
+
+
+def add_static_version(endpoint: str, values: dict):
+    """
+    @brief Adds the version of the file to URLs of static files, registered as url_defaults.
+    """
+    if endpoint != 'static' or 'filename' not in values or 'v' in values:
+        return
+
+    path = safe_join(current_app.static_folder, values['filename'])
+    version = get_file_version(path) if path else None
+    if version:
+        values['v'] = version
+
+
+def send_static(filename: str):
+    """
+    @brief Serves a static file, replaces the static view of Flask.
+    """
+    path = safe_join(current_app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    # Versioned URLs change with the file, so their responses never change
+    version = request.args.get('v')
+    immutable = bool(version) and version == get_file_version(path)
+    max_age = IMMUTABLE_MAX_AGE if immutable else current_app.config['STATIC_MAX_AGE']
+
+    if current_app.config['STATIC_DELIVERY'] == 'x-accel-redirect':
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config['STATIC_ACCEL_LOCATION'] + quote(filename)
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        # Range and conditional requests are handled by send_file, X-Sendfile by USE_X_SENDFILE
+        response = send_file(path, conditional=True, etag=True, max_age=max_age)
+
+    response.cache_control.immutable = immutable
+    return response
+
+
+def init_static_delivery(app):
+    """
+    @brief Configures the delivery of static files from the environment.
+
+    @param app The Flask app.
+    """
+    mode = os.environ.get('STATIC_DELIVERY', 'app').lower()
+    if mode not in DELIVERY_MODES:
+        logger.warning(f"Unknown STATIC_DELIVERY '{mode}', the app delivers static files")
+        mode = 'app'
+
+    app.config['STATIC_DELIVERY'] = mode
+    app.config['STATIC_ACCEL_LOCATION'] = os.environ.get('STATIC_ACCEL_LOCATION', '/static-internal/')
+    app.config['STATIC_MAX_AGE'] = int(os.environ.get('STATIC_MAX_AGE', '60'))
+    app.config['USE_X_SENDFILE'] = mode == 'x-sendfile'
+
+    app.url_defaults(add_static_version)
+    app.view_functions['static'] = send_static
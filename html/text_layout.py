@@ -0,0 +1,201 @@
+"""
+@file text_layout.py
+@brief Text layout for slides generated by extensions.
+
+Wraps text by its rendered width instead of the amount of characters and
+shrinks the font size until a text fits into a box. The advance widths of the
+characters are measured once per font and cached, so laying out a text only
+sums up cached widths. All functions work iteratively in linear time.
+
+@details
+Usage from an extension, together with slide_renderer:
+
+    block = fit_text(text, lambda size: load_font(font_path, size), (2800, 1040), 104, 64)
+    block.draw(canvas.draw, (800, 635), fill="white")
+
+@note
+- Kerning is ignored, the measured width of a line can differ by a few pixels
+    from the rendered one.
+"""
+
+import weakref
+
+ELLIPSIS = "..."
+
+_advance_widths = weakref.WeakKeyDictionary()
+
+
+class AdvanceWidths:
+    """
+    @brief The cached advance widths of the characters of a font.
+    """
+    def __init__(self, font):
+        self.font = font
+        self.widths = {}
+
+    def char(self, char: str) -> float:
+        width = self.widths.get(char)
+        if width is None:
+            width = self.widths[char] = self.font.getlength(char)
+        return width
+
+    def text(self, text: str) -> float:
+        return sum(map(self.char, text))
+
+
+def get_advance_widths(font) -> AdvanceWidths:
+    """
+    @brief Returns the advance width cache of a font, it lives as long as the font.
+    """
+    widths = _advance_widths.get(font)
+    if widths is None:
+        widths = _advance_widths[font] = AdvanceWidths(font)
+    return widths
+
+
+def split_word(word: str, widths: AdvanceWidths, max_width: float) -> list[str]:
+    """
+    @brief Splits a word which is wider than a line into pieces fitting on a line.
+    """
+    pieces = []
+    start = 0
+    piece_width = 0.0
+    for i, char in enumerate(word):
+        char_width = widths.char(char)
+        if i > start and piece_width + char_width > max_width:
+            pieces.append(word[start:i])
+            start = i
+            piece_width = 0.0
+        piece_width += char_width
+    pieces.append(word[start:])
+    return pieces
+
+
+def ellipsize(line: str, widths: AdvanceWidths, max_width: float) -> str:
+    """
+    @brief Shortens a line so it fits into max_width including the ellipsis.
+    """
+    available = max_width - widths.text(ELLIPSIS)
+    width = 0.0
+    for i, char in enumerate(line):
+        width += widths.char(char)
+        if width > available:
+            return line[:i].rstrip() + ELLIPSIS
+    return line.rstrip() + ELLIPSIS
+
+
+def wrap_text(text: str, font, max_width: float, max_lines: int = None) -> list[str]:
+    """
+    @brief Wraps a text into lines which fit into max_width when rendered with the font.
+
+    Lines are broken at whitespace, words wider than a line are broken between
+    characters. Line breaks in the text are kept.
+
+    @param text The text to wrap.
+    @param font The PIL font the text is rendered with.
+    @param max_width The maximum width of a line in pixels.
+    @param max_lines Optional maximum amount of lines, the last line is ellipsized.
+
+    @return The lines of the text.
+    """
+    widths = get_advance_widths(font)
+    space_width = widths.char(" ")
+
+    lines = []
+    for paragraph in text.split("\n"):
+        line = []
+        line_width = 0.0
+        for word in paragraph.split():
+            word_width = widths.text(word)
+            if word_width > max_width:
+                pieces = split_word(word, widths, max_width)
+                if line:
+                    lines.append(" ".join(line))
+                lines.extend(pieces[:-1])
+                line = [pieces[-1]]
+                line_width = widths.text(pieces[-1])
+            elif line and line_width + space_width + word_width > max_width:
+                lines.append(" ".join(line))
+                line = [word]
+                line_width = word_width
+            else:
+                line_width += word_width + (space_width if line else 0.0)
+                line.append(word)
+        lines.append(" ".join(line))
+
+    if max_lines is not None and len(lines) > max_lines:
+        lines = lines[:max_lines]
+        if lines:
+            lines[-1] = ellipsize(lines[-1], widths, max_width)
+    return lines
+
+
+class TextBlock:
+    """
+    @brief Wrapped lines of text in a font, ready to be drawn.
+    """
+    def __init__(self, font, lines: list[str], line_height: int):
+        self.font = font
+        self.lines = lines
+        self.line_height = line_height
+
+    @property
+    def height(self) -> int:
+        return len(self.lines) * self.line_height
+
+    def draw(self, draw, position: tuple, fill="white"):
+        """
+        @brief Draws the lines with an ImageDraw starting at position.
+        """
+        x, y = position
+        for line in self.lines:
+            draw.text((x, y), line, fill=fill, font=self.font)
+            y += self.line_height
+
+
+def fit_text(text: str, get_font, box: tuple, max_size: int, min_size: int,
+             line_spacing: float = 1.0) -> TextBlock:
+    """
+    @brief Finds the largest font size between min_size and max_size at which a text fits into a box.
+
+    If the text doesn't even fit at min_size, it is cut off with an ellipsis.
+
+    @param text The text to lay out.
+    @param get_font A function returning the font in a size, it should cache the fonts.
+    @param box The (width, height) of the box in pixels.
+    @param max_size The preferred font size.
+    @param min_size The smallest acceptable font size.
+    @param line_spacing The line height relative to the font size.
+
+    @return The laid out text.
+    """
+    width, height = box
+
+    def layout(size):
+        line_height = int(size * line_spacing)
+        max_lines = max(1, height // line_height)
+        lines = wrap_text(text, get_font(size), width)
+        return TextBlock(get_font(size), lines, line_height), len(lines) <= max_lines
+
+    block, fits = layout(max_size)
+    if fits:
+        return block
+
+    # Binary search for the largest fitting size
+    low, high = min_size, max_size - 1
+    best = None
+    while low <= high:
+        size = (low + high) // 2
+        block, fits = layout(size)
+        if fits:
+            best = block
+            low = size + 1
+        else:
+            high = size - 1
+    if best is not None:
+        return best
+
+    font = get_font(min_size)
+    line_height = int(min_size * line_spacing)
+    lines = wrap_text(text, font, width, max(1, height // line_height))
+    return TextBlock(font, lines, line_height)
@@ -0,0 +1,315 @@
+"""
+@file upload_stream.py
+@brief Streaming receipt and validation of uploaded images.
+
+Multipart uploads are parsed directly from the request stream. Every file is
+written chunk by chunk to a temporary file and at the same time fed to an
+incremental PIL parser. A file which isn't an image is detected after its
+first kilobytes and the rest of it is discarded instead of being written to
+disk or kept in memory.
+
+Batch uploads can leave the decoding to a shared, bounded thread pool: while
+receiving, the files are only identified by their header and afterwards all
+of them are decoded in parallel.
+
+@details
+Usage in a route:
+
+    uploads = receive_images(request.environ, UPLOAD_TMP_FOLDER, 5 * 1024 * 1024)
+    for upload in uploads:
+        if upload.error:
+            ...
+        else:
+            ... upload.path, upload.format, upload.size ...
+    discard_uploads(uploads)  # removes the temporary files which weren't used
+
+    # Many files in one request, decoded in parallel after receiving them
+    uploads = receive_images(request.environ, UPLOAD_TMP_FOLDER, 5 * 1024 * 1024,
+                             max_content_length=100 * 1024 * 1024, max_files=50, parallel=True)
+"""
+
+import os
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageFile, ImageOps
+from werkzeug.formparser import parse_form_data
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger()
+
+ALLOWED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif']
+ALLOWED_FORMATS = ['JPEG', 'PNG', 'GIF']
+
+# Unvalidated files are kept outside the served static folder, but on the
+# same file system as the uploads, so moving them there is an atomic rename
+UPLOAD_TMP_FOLDER = "instance/upload_tmp"
+
+# Amount of bytes after which a file has to be identified as image
+IDENTIFY_LIMIT = 64 * 1024
+
+# Size of the slides shown on the screens, larger images are scaled down to it
+SCREEN_SIZE = (3840, 2160)
+
+# Threads decoding the files of batch uploads, shared by all requests of a process
+VALIDATION_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ImageUpload:
+    """
+    @brief A file of a multipart upload, written to a temporary file while it is validated.
+
+    Werkzeug writes the file content to it as it parses the request stream.
+    """
+    def __init__(self, tmp_folder: str, filename: str, max_file_size: int, incremental: bool = True,
+                 error: str = None):
+        """
+        @param tmp_folder The folder of the temporary file.
+        @param filename The file name sent by the client.
+        @param max_file_size The maximum size of the file in bytes.
+        @param incremental Whether the image is decoded while it is received, otherwise finish() decodes it.
+        @param error An error rejecting the file before it is received.
+        """
+        self.filename = filename or ""
+        self.field = None
+        self.max_file_size = max_file_size
+        self.incremental = incremental
+        self.size = 0
+        self.format = None
+        self.error = error
+        self.parser = ImageFile.Parser()
+
+        if self.error or not self.check_extension():
+            self.parser = None
+            self.file = None
+            self.path = None
+            return
+
+        os.makedirs(tmp_folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=tmp_folder, suffix=".upload")
+        self.file = os.fdopen(fd, "wb")
+
+    def check_extension(self) -> bool:
+        if '.' not in self.filename:
+            self.error = "File extension not present"
+        elif self.filename.rsplit('.', 1)[1].lower() not in ALLOWED_EXTENSIONS:
+            self.error = "File extension not accepted"
+        return self.error is None
+
+    def fail(self, error: str):
+        self.error = error
+        self.parser = None
+        self.discard()
+
+    def write(self, data) -> int:
+        if self.error:
+            # Drain the rest of the file without storing it
+            return len(data)
+
+        self.size += len(data)
+        if self.size > self.max_file_size:
+            self.fail(f"File is larger than {self.max_file_size} bytes")
+            return len(data)
+        self.file.write(data)
+
+        if self.parser is not None:
+            try:
+                self.parser.feed(bytes(data))
+            except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+                self.fail(f"File isn't a valid image: {e}")
+                return len(data)
+
+            if self.parser.image is None:
+                if self.size > IDENTIFY_LIMIT:
+                    self.fail("File isn't an image")
+            elif self.parser.image.format not in ALLOWED_FORMATS:
+                self.fail(f"Image format {self.parser.image.format} not accepted")
+            elif self.parser.decoder is None or not self.incremental:
+                # Not decoded incrementally, the file is checked once it is complete
+                self.format = self.parser.image.format
+                self.parser = None
+        return len(data)
+
+    def finish(self) -> bool:
+        """
+        @brief Completes the validation after the whole file was received.
+
+        @return True if the file is a valid image.
+        """
+        if self.error:
+            return False
+        self.file.close()
+
+        try:
+            if self.parser is not None:
+                image = self.parser.close()
+                self.format = image.format
+                self.parser = None
+            else:
+                with Image.open(self.path) as image:
+                    if self.incremental:
+                        image.verify()
+                    else:
+                        image.load()
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+            self.fail(f"File isn't a valid image: {e}")
+            return False
+
+        if self.format not in ALLOWED_FORMATS:
+            self.fail(f"Image format {self.format} not accepted")
+            return False
+        return True
+
+    def discard(self):
+        """
+        @brief Removes the temporary file.
+        """
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    # Werkzeug wraps the written file in a FileStorage and rewinds it
+    def seek(self, *args):
+        return 0
+
+    def tell(self) -> int:
+        return self.size
+
+    def flush(self):
+        pass
+
+    def read(self, *args):
+        return b""
+
+
+_validation_pool = None
+_validation_pool_lock = threading.Lock()
+
+
+def get_validation_pool() -> ThreadPoolExecutor:
+    """
+    @brief Returns the thread pool decoding the files of batch uploads.
+
+    PIL releases the GIL while decoding, so the files are decoded in parallel.
+    The pool is shared, so concurrent batch uploads don't start more threads.
+    """
+    global _validation_pool  # pylint: disable=global-statement
+    with _validation_pool_lock:
+        if _validation_pool is None:
+            _validation_pool = ThreadPoolExecutor(max_workers=VALIDATION_WORKERS,
+                                                  thread_name_prefix="upload-validation")
+        return _validation_pool
+
+
+def receive_images(environ, tmp_folder: str, max_file_size: int, max_content_length: int = None,
+                   field: str = None, max_files: int = 1, parallel: bool = False) -> list[ImageUpload]:
+    """
+    @brief Parses a multipart request and validates its files while they are received.
+
+    @param environ The WSGI environ of the request, its body must not have been read yet.
+    @param tmp_folder The folder for the temporary files, it should be on the file system of the uploads
+                      and must not be served, e.g. UPLOAD_TMP_FOLDER.
+    @param max_file_size The maximum size of a single file in bytes.
+    @param max_content_length The maximum size of the request, defaults to max_file_size plus 64 KiB.
+    @param field Only files of this form field are returned, others are discarded.
+    @param max_files The maximum amount of files, further files are rejected without storing them.
+    @param parallel Whether the files are decoded in the validation pool after receiving them.
+
+    @return The received files, the ones with an error attribute were rejected.
+
+    @exception RequestEntityTooLarge If the request is larger than max_content_length.
+    """
+    uploads = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):  # pylint: disable=unused-argument
+        error = f"More than {max_files} files" if len(uploads) >= max_files else None
+        upload = ImageUpload(tmp_folder, filename, max_file_size, incremental=not parallel, error=error)
+        uploads.append(upload)
+        return upload
+
+    if max_content_length is None:
+        max_content_length = max_file_size + 64 * 1024
+
+    try:
+        _, _, files = parse_form_data(environ, stream_factory=stream_factory,
+                                      max_content_length=max_content_length, silent=False)
+    except RequestEntityTooLarge:
+        discard_uploads(uploads)
+        raise
+    except ValueError as e:
+        logger.info(f"Malformed upload request: {e}")
+        discard_uploads(uploads)
+        return []
+
+    # Map the uploads to their form fields
+    fields = {id(storage.stream): name for name, storage in files.items(multi=True)}
+    received = []
+    for upload in uploads:
+        upload.field = fields.get(id(upload))
+        if field is not None and upload.field != field:
+            upload.discard()
+            continue
+        received.append(upload)
+
+    if parallel and len(received) > 1:
+        list(get_validation_pool().map(ImageUpload.finish, received))
+    else:
+        for upload in received:
+            upload.finish()
+
+    for upload in received:
+        if upload.error:
+            logger.info(f"Rejected upload '{upload.filename}': {upload.error}")
+    return received
+
+
+def discard_uploads(uploads: list[ImageUpload]):
+    """
+    @brief Removes the temporary files of uploads which weren't moved elsewhere.
+    """
+    for upload in uploads:
+        upload.discard()
+
+
+def create_rendition(source_path: str, destination_path: str, size: tuple = SCREEN_SIZE) -> bool:
+    """
+    @brief Re-encodes an uploaded image into the format shown on the screens.
+
+    The image is rotated according to its EXIF orientation, scaled down to fit
+    into size and saved in the format of the destination's extension. Animated
+    GIFs with a .gif destination are moved unchanged. The rendition is written
+    atomically and the source file is removed.
+
+    @param source_path The path of the validated upload.
+    @param destination_path The path of the rendition.
+    @param size The maximum size of the rendition.
+
+    @return True if the rendition was created.
+    """
+    # Imported here, so the module doesn't depend on the slide renderer for receiving uploads
+    from slide_renderer import save_atomic  # pylint: disable=import-outside-toplevel
+
+    try:
+        with Image.open(source_path) as image:
+            # Other animated formats, e.g. APNG, are shown by their first frame
+            if (image.format == "GIF" and getattr(image, "is_animated", False)
+                    and destination_path.lower().endswith(".gif")):
+                os.replace(source_path, destination_path)
+                return True
+
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(size)
+            save_atomic(image.convert("RGB"), destination_path)
+        os.remove(source_path)
+        return True
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.error(f"Error creating the rendition of '{source_path}': {e}")
+    try:
+        os.remove(source_path)
+    except FileNotFoundError:
+        pass
+    return False
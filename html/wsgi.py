@@ -5,11 +5,33 @@
 @details This module sets up the WSGI application to be served by a WSGI server
             like Gunicorn or uWSGI. It allows running the app in production.
 
+            uWSGI imports it once in the master and forks the workers afterwards
+            (lazy-apps = false). Everything prepared here is shared by all
+            workers as copy-on-write memory, so it is prepared completely:
+            the image plugins are loaded, the templates are compiled and the
+            objects of the app are frozen, so the garbage collector of a
+            worker doesn't write to the shared pages.
+
 @author Inflac
 @date 2024-10-04
 """
 
+import gc
+
+from PIL import Image
+
 from app import app
 
+# Load the image plugins now instead of on the first upload in every worker
+Image.init()
+
+# Compile the templates of the app and its extensions
+for template_name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(template_name)
+
+# Move the objects of the preloaded app out of the garbage collected generations
+gc.collect()
+gc.freeze()
+
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()
@@ -11,58 +11,86 @@ def init_pygame():
     return screen, clock
 
 
-# Function to display an image using pygame and handle exit on ESC key
-def display_image(screen, clock, image_surface, duration):
-    if image_surface:
-        screen_width, screen_height = screen.get_size()
-        image_width, image_height = image_surface.get_size()
+def prepare_slide(screen, image_surface):
+    """
+    Scale an image to fit the screen and center it on a black, screen sized surface.
+
+    Prepared slides can be reused for every further display of the image and are
+    the input for transitions.
+    """
+    screen_width, screen_height = screen.get_size()
+    image_width, image_height = image_surface.get_size()
 
-        # Calculate aspect ratios
-        screen_aspect_ratio = screen_width / screen_height
-        image_aspect_ratio = image_width / image_height
+    # Calculate aspect ratios
+    screen_aspect_ratio = screen_width / screen_height
+    image_aspect_ratio = image_width / image_height
 
-        if image_aspect_ratio > screen_aspect_ratio:
-            # Image is wider than screen
-            new_width = screen_width
-            new_height = int(screen_width / image_aspect_ratio)
-        else:
-            # Image is taller than screen or same aspect ratio
-            new_height = screen_height
-            new_width = int(screen_height * image_aspect_ratio)
+    if image_aspect_ratio > screen_aspect_ratio:
+        # Image is wider than screen
+        new_width = screen_width
+        new_height = int(screen_width / image_aspect_ratio)
+    else:
+        # Image is taller than screen or same aspect ratio
+        new_height = screen_height
+        new_width = int(screen_height * image_aspect_ratio)
 
-        # Scale the image
-        image_surface = pygame.transform.scale(image_surface, (new_width, new_height))
+    # Scale the image
+    image_surface = pygame.transform.scale(image_surface, (new_width, new_height))
 
-        # Fill screen with black background
-        screen.fill((0, 0, 0))
+    # Fill slide with black background, converted to the display format for fast blits
+    slide = pygame.Surface((screen_width, screen_height)).convert()
+    slide.fill((0, 0, 0))
 
-        # Calculate position to center the image
-        x_offset = (screen_width - new_width) // 2
-        y_offset = (screen_height - new_height) // 2
+    # Calculate position to center the image
+    x_offset = (screen_width - new_width) // 2
+    y_offset = (screen_height - new_height) // 2
 
-        # Blit the image at the centered position
-        screen.blit(image_surface, (x_offset, y_offset))
+    # Blit the image at the centered position
+    slide.blit(image_surface, (x_offset, y_offset))
+    return slide
 
+
+# Function to display an image using pygame and handle exit on ESC key
+def display_image(screen, clock, image_surface, duration, transition=None, previous_slide=None):
+    """
+    Display an image for the given duration.
+
+    If a TransitionEngine is passed, the change from the previous slide is animated.
+    Returns the prepared slide, so it can be passed as previous_slide of the next call.
+    """
+    if not image_surface:
+        return previous_slide
+
+    slide = image_surface
+    if slide.get_size() != screen.get_size():
+        slide = prepare_slide(screen, image_surface)
+
+    if transition:
+        transition.run(previous_slide, slide)
+    else:
+        screen.blit(slide, (0, 0))
         # Update the display
         pygame.display.flip()
 
-        start_time = time.time()
+    start_time = time.time()
 
-        # Event loop to check for ESC key to exit
-        running = True
-        while running:
-            clock.tick(20)  # Cap the frame rate at 20 FPS
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+    # Event loop to check for ESC key to exit
+    running = True
+    while running:
+        clock.tick(20)  # Cap the frame rate at 20 FPS
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+                pygame.quit()
+                exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
                     running = False
                     pygame.quit()
                     exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        running = False
-                        pygame.quit()
-                        exit()
-
-            # Stop displaying after the duration
-            if time.time() - start_time >= duration:
-                break
\ No newline at end of file
+
+        # Stop displaying after the duration
+        if time.time() - start_time >= duration:
+            break
+
+    return slide
@@ -0,0 +1,267 @@
+"""
+@file http_client.py
+@brief Shared HTTP client of the N2i services and extensions.
+
+Keeps one pooled requests.Session per process, so repeated requests to the
+same host reuse a few keep-alive connections instead of opening a new TCP (and
+TLS) connection per request. Failed connections and 5xx responses of GET
+requests are retried with exponential backoff.
+
+GET responses are kept in a size bounded in-memory cache following their
+Cache-Control header: fresh responses are served without a request, stale ones
+are revalidated with If-None-Match/If-Modified-Since and a 304 answer reuses
+the cached body. The client records the latency of every request per host.
+
+@details
+Usage:
+
+    from http_client import get_client
+
+    response = get_client().get(url)
+    response.raise_for_status()
+
+@note
+- The runner and the displayer are deployed without the CMS, each of them
+    ships an identical copy of this module (services/*/http_client.py).
+    Changes have to be copied, testing/http_client checks they are in sync.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 10
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+def parse_cache_control(value: str) -> dict:
+    """
+    @brief Parses a Cache-Control header into a dict of lower case directives.
+    """
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+class CacheEntry:
+    """
+    @brief A cached response with its validators and freshness.
+    """
+    def __init__(self, response, expires: float):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.content = response.content
+        self.encoding = response.encoding
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.expires = expires
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    def to_response(self, url: str):
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers.update(self.headers)
+        response._content = self.content  # pylint: disable=protected-access
+        response.encoding = self.encoding
+        response.url = url
+        return response
+
+
+class HostMetrics:
+    """
+    @brief Request counters and latencies of one host.
+    """
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def to_dict(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors, "cache_hits": self.cache_hits,
+                "revalidated": self.revalidated,
+                "mean_ms": self.total_time / self.requests * 1000 if self.requests else 0.0,
+                "max_ms": self.max_time * 1000}
+
+
+class HttpClient:
+    """
+    @brief A pooled HTTP session with retries, a response cache and per-host metrics.
+    """
+    def __init__(self, retries: int = 3, backoff: float = 0.5, pool_maxsize: int = 10,
+                 cache_bytes: int = 64 * 1024 * 1024, timeout: float = DEFAULT_TIMEOUT):
+        """
+        @param retries How often failed connections and 5xx responses of GET requests are retried.
+        @param backoff The backoff factor of the retries in seconds.
+        @param pool_maxsize The maximum amount of kept connections per host.
+        @param cache_bytes The maximum size of all cached response bodies, 0 disables the cache.
+        @param timeout The default timeout of a request in seconds.
+        """
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(500, 502, 503, 504),
+                      allowed_methods=("GET", "HEAD"), raise_on_status=False)
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_maxsize,
+                              pool_maxsize=pool_maxsize)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.timeout = timeout
+        self.cache_bytes = cache_bytes
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def record(self, url: str, duration: float = None, error: bool = False, cache_hit: bool = False,
+               revalidated: bool = False):
+        with self.lock:
+            metrics = self.hosts.setdefault(urlsplit(url).netloc, HostMetrics())
+            if cache_hit:
+                metrics.cache_hits += 1
+                return
+            metrics.requests += 1
+            metrics.total_time += duration
+            metrics.max_time = max(metrics.max_time, duration)
+            metrics.errors += error
+            metrics.revalidated += revalidated
+
+    def get_cached(self, url: str):
+        with self.lock:
+            entry = self.cache.get(url)
+            if entry is not None:
+                self.cache.move_to_end(url)
+            return entry
+
+    def store(self, url: str, response):
+        """
+        @brief Caches a successful response if its Cache-Control header allows it.
+        """
+        directives = parse_cache_control(response.headers.get('Cache-Control'))
+        if 'no-store' in directives or response.status_code != 200:
+            return
+
+        expires = 0.0
+        if 'no-cache' not in directives and directives.get('max-age'):
+            try:
+                expires = time.monotonic() + int(directives['max-age'])
+            except ValueError:
+                pass
+
+        entry = CacheEntry(response, expires)
+        # Responses which can't be revalidated are only useful while fresh
+        if not expires and not (entry.etag or entry.last_modified):
+            return
+        if entry.size > self.cache_bytes:
+            return
+
+        with self.lock:
+            previous = self.cache.pop(url, None)
+            if previous is not None:
+                self.cached_bytes -= previous.size
+            self.cache[url] = entry
+            self.cached_bytes += entry.size
+            while self.cached_bytes > self.cache_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= evicted.size
+
+    def get(self, url: str, params: dict = None, headers: dict = None, cache: bool = True,
+            **kwargs):
+        """
+        @brief Sends a GET request, answered from the cache where possible.
+
+        Requests with own conditional headers bypass the cache, the caller
+        handles 304 answers itself then.
+
+        @param url The URL to request.
+        @param params The query parameters.
+        @param headers Additional request headers.
+        @param cache Whether the response cache is used.
+
+        @return The requests.Response.
+
+        @exception requests.RequestException If the request fails after all retries.
+        """
+        headers = dict(headers or {})
+        kwargs.setdefault('timeout', self.timeout)
+        if params:
+            url = requests.Request('GET', url, params=params).prepare().url
+        use_cache = cache and self.cache_bytes > 0 and \
+            not any(header in headers for header in CONDITIONAL_HEADERS)
+
+        entry = self.get_cached(url) if use_cache else None
+        if entry is not None:
+            if entry.expires > time.monotonic():
+                self.record(url, cache_hit=True)
+                return entry.to_response(url)
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        start_time = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, **kwargs)
+        except requests.RequestException:
+            self.record(url, time.perf_counter() - start_time, error=True)
+            raise
+        duration = time.perf_counter() - start_time
+
+        if entry is not None and response.status_code == 304:
+            self.record(url, duration, revalidated=True)
+            # Refresh the freshness of the cached entry from the 304 headers
+            directives = parse_cache_control(response.headers.get('Cache-Control'))
+            if directives.get('max-age', '').isdigit() and 'no-cache' not in directives:
+                entry.expires = time.monotonic() + int(directives['max-age'])
+            return entry.to_response(url)
+
+        self.record(url, duration, error=response.status_code >= 500)
+        if use_cache:
+            self.store(url, response)
+        return response
+
+    def metrics(self) -> dict:
+        """
+        @brief Returns the request metrics by host.
+        """
+        with self.lock:
+            return {host: metrics.to_dict() for host, metrics in self.hosts.items()}
+
+    def format_metrics(self) -> list[str]:
+        """
+        @brief Returns one line per host describing its requests.
+        """
+        return [f"{host}: {m['requests']} requests, {m['cache_hits']} cache hits, "
+                f"{m['revalidated']} revalidated, {m['errors']} errors, "
+                f"mean {m['mean_ms']:.1f} ms, max {m['max_ms']:.1f} ms"
+                for host, m in self.metrics().items()]
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """
+    @brief Returns the client shared by all modules of the process.
+    """
+    global _client  # pylint: disable=global-statement
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
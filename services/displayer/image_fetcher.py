@@ -1,28 +1,44 @@
 import requests
 import pygame
 from bs4 import BeautifulSoup
-from io import BytesIO
 
-# Function to fetch the image from a URL
-def fetch_image_from_url(url):
+from http_client import get_client
+
+# Function to revalidate a cached image, returns None on errors and
+# (content, etag, last_modified) with content None if the image is unchanged
+def revalidate_image(url, etag=None, last_modified=None):
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Ensure no errors in response
-        image_stream = BytesIO(response.content)
-        image = pygame.image.load(image_stream)
-        return image
+        response = get_client().get(url, headers=headers, cache=False)
+        if response.status_code == 304:
+            return None, etag, last_modified
+        response.raise_for_status()
     except requests.RequestException as e:
-        print(f"Error fetching the image: {e}")
+        print(f"Error revalidating the image: {e}")
+        return None
+    return response.content, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+# Function to load an image from a file or file-like object
+def load_image(source):
+    try:
+        return pygame.image.load(source)
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Error loading the image: {e}")
         return None
 
-# Function to get image URLs from a page
+# Function to get image URLs from a page, returns None if the page is unreachable
 def get_image_urls(url):
     try:
-        response = requests.get(url, timeout=10)
+        response = get_client().get(url)
         response.raise_for_status()  # Check for request errors
     except requests.RequestException as e:
         print(f"Error fetching the URL: {e}")
-        return []
+        return None
 
     soup = BeautifulSoup(response.text, 'html.parser')
     images = soup.find_all('img')
@@ -36,4 +52,4 @@ def get_image_urls(url):
                 img_url = requests.compat.urljoin(url, img_url)
             img_urls.append(img_url)
 
-    return img_urls
\ No newline at end of file
+    return img_urls
@@ -1,11 +1,15 @@
 import os
+import time
 import argparse
+import threading
 import pygame
 
 
-from display import display_image
-from image_fetcher import fetch_image_from_url
+from display import display_image, prepare_slide
+from image_fetcher import revalidate_image, load_image
 from image_fetcher import get_image_urls
+from slide_cache import SlideCache
+from transition import TransitionEngine, TRANSITIONS
 
 # Initialize pygame
 def init_pygame():
@@ -13,48 +17,121 @@ def init_pygame():
     screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
     return screen, pygame.time.Clock()
 
-# Cache image surfaces to avoid redundant downloads
+# Cache prepared, screen sized slides to avoid redundant loading and scaling
 image_cache = {}
 
+# The playlist currently played as tuple of image URLs and system image URLs.
+# It is replaced as a whole by the revalidation thread.
+playlist = {"current": ([], [])}
+
+
+def get_slide(screen, slide_cache, image_url):
+    slide = image_cache.get(image_url)
+    if slide is None:
+        path = slide_cache.get_path(image_url)
+        if not path:
+            result = revalidate_image(image_url)
+            if result is None:
+                return None
+            path = slide_cache.store(image_url, *result)
+
+        image = load_image(path)
+        if not image:
+            return None
+        slide = prepare_slide(screen, image)
+        image_cache[image_url] = slide
+    return slide
+
+
+# Download a slide or revalidate the cached one with a conditional request
+def refresh_slide(slide_cache, image_url):
+    path = slide_cache.get_path(image_url)
+    etag, last_modified = slide_cache.get_validators(image_url) if path else (None, None)
+    result = revalidate_image(image_url, etag, last_modified)
+    if result is None or result[0] is None:
+        return
+
+    # Changed content under the same URL has to be prepared again
+    if slide_cache.store(image_url, *result) != path:
+        image_cache.pop(image_url, None)
+
+
+# Fetch the playlist from the CMS and refresh its slides
+def revalidate(cms_url, slide_cache):
+    image_urls = get_image_urls(cms_url)
+    system_image_urls = get_image_urls(cms_url + "/system")
+    if image_urls is None or system_image_urls is None:
+        print("CMS unreachable, keep playing the cached playlist")
+        return False
+
+    for image_url in system_image_urls + image_urls:
+        refresh_slide(slide_cache, image_url)
+
+    slide_cache.save_playlist(image_urls, system_image_urls)
+    playlist["current"] = (image_urls, system_image_urls)
+    return True
+
+def revalidate_loop(cms_url, slide_cache, interval):
+    while True:
+        # Keep revalidating after unexpected errors, e.g. a full disk
+        try:
+            revalidate(cms_url, slide_cache)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Error revalidating the playlist: {e!r}")
+        time.sleep(interval)
+
 
 # Main loop to fetch and display images
-def main(cms_url):
+def main(cms_url, cache_dir, transition_mode="cut", transition_duration=0.5):
     os.environ['DISPLAY'] = ':0'
 
     duration = 5  # Image display duration
     screen, clock = init_pygame()  # Initialize pygame once
+    transition = TransitionEngine(screen, clock, transition_mode, transition_duration)
+    slide = None
+
+    # Start playback from the cached playlist and revalidate it in the background
+    slide_cache = SlideCache(cache_dir)
+    playlist["current"] = slide_cache.load_playlist()
+    threading.Thread(target=revalidate_loop, args=(cms_url, slide_cache, duration * 6),
+                     daemon=True).start()
 
     while True:
-        # Get image URLs from CMS
-        image_urls = get_image_urls(cms_url)
-        system_image_urls = get_image_urls(cms_url + "/system")
-
-        # Display system images first
-        for system_image_url in system_image_urls:
-            if system_image_url not in image_cache:
-                image = fetch_image_from_url(system_image_url)
-                if image:
-                    image_cache[system_image_url] = image
-            display_image(screen, clock, image_cache[system_image_url], duration)
-
-        # Display CMS images and intersperse with system images
+        image_urls, system_image_urls = playlist["current"]
+        if not image_urls and not system_image_urls:
+            time.sleep(duration)
+            continue
+
+        # Drop prepared slides which aren't part of the playlist anymore
+        for cached_url in set(image_cache) - set(image_urls) - set(system_image_urls):
+            image_cache.pop(cached_url, None)
+
+        # System images first, then the CMS images interspersed with system images
+        slide_urls = list(system_image_urls)
         for i, image_url in enumerate(image_urls):
             if i % 6 == 5:
-                for system_image_url in system_image_urls:
-                    if system_image_url not in image_cache:
-                        image = fetch_image_from_url(system_image_url)
-                        if image:
-                            image_cache[system_image_url] = image
-                    display_image(screen, clock, image_cache[system_image_url], duration)
-            if image_url not in image_cache:
-                image = fetch_image_from_url(image_url)
-                if image:
-                    image_cache[image_url] = image
-            display_image(screen, clock, image_cache[image_url], duration)
+                slide_urls += system_image_urls
+            slide_urls.append(image_url)
+
+        shown = False
+        for slide_url in slide_urls:
+            image = get_slide(screen, slide_cache, slide_url)
+            shown = shown or image is not None
+            slide = display_image(screen, clock, image, duration, transition, slide)
+
+        # No slide could be loaded, don't spin until the revalidation fetched them
+        if not shown:
+            time.sleep(1)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='N2i runner')
     parser.add_argument('-c', '--cms', required=True, \
                         help='URL of the CMS whose content to display')
+    parser.add_argument('--cache-dir', default=os.path.expanduser("~/.cache/n2i-displayer"), \
+                        help='Directory of the on-disk slide cache')
+    parser.add_argument('-t', '--transition', default="cut", choices=TRANSITIONS, \
+                        help='Transition between two slides')
+    parser.add_argument('--transition-duration', type=float, default=0.5, \
+                        help='Duration of a transition in seconds')
     args = parser.parse_args()
-    main(args.cms)
+    main(args.cms, args.cache_dir, args.transition, args.transition_duration)
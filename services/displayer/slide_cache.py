@@ -0,0 +1,130 @@
+"""
+Module for the persistent on-disk slide cache of the displayer.
+
+Slides are stored as plain files named by the SHA-256 hash of their content,
+an index maps the slide URLs to these hashes and the ETag/Last-Modified
+headers of their download, used to revalidate them with conditional requests.
+Together with the last known playlist this allows the displayer to start
+playback right after boot, even if the CMS is unreachable, and avoids
+downloading unchanged slides again after a restart.
+"""
+
+import os
+import json
+import hashlib
+import threading
+
+
+class SlideCache:
+    """
+    A content-hash keyed on-disk cache for slides and the last known playlist.
+    """
+    def __init__(self, cache_dir:str):
+        """
+        Args:
+            cache_dir (str): Directory to store the cache in. It is created if it doesn't exist.
+        """
+        self.cache_dir = cache_dir
+        self.slides_dir = os.path.join(cache_dir, "slides")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.playlist_path = os.path.join(cache_dir, "playlist.json")
+        self.lock = threading.Lock()
+
+        os.makedirs(self.slides_dir, exist_ok=True)
+        self.index = self._read_json(self.index_path, {})
+
+    @staticmethod
+    def _read_json(path:str, default):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring corrupt cache file {path}: {e}")
+            return default
+
+    @staticmethod
+    def _write_atomic(path:str, data:bytes):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _write_index(self):
+        self._write_atomic(self.index_path, json.dumps(self.index).encode("utf-8"))
+
+    def _get_entry(self, url:str) -> dict:
+        entry = self.index.get(url)
+        # Indexes of older versions only stored the content hash
+        if isinstance(entry, str):
+            return {"hash": entry}
+        return entry or {}
+
+    def get_path(self, url:str):
+        """
+        Returns the path of the cached slide for a URL or None if it isn't cached.
+        """
+        with self.lock:
+            content_hash = self._get_entry(url).get("hash")
+        if not content_hash:
+            return None
+
+        path = os.path.join(self.slides_dir, content_hash)
+        if not os.path.exists(path):
+            return None
+        return path
+
+    def get_validators(self, url:str) -> tuple:
+        """
+        Returns the ETag and Last-Modified header of the cached slide for a URL, None if unknown.
+        """
+        with self.lock:
+            entry = self._get_entry(url)
+        return entry.get("etag"), entry.get("last_modified")
+
+    def store(self, url:str, content:bytes, etag:str=None, last_modified:str=None) -> str:
+        """
+        Stores the content of a slide and returns the path of the cached file.
+
+        Identical content downloaded from different URLs is only stored once.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.slides_dir, content_hash)
+        if not os.path.exists(path):
+            self._write_atomic(path, content)
+
+        with self.lock:
+            self.index[url] = {"hash": content_hash, "etag": etag, "last_modified": last_modified}
+            self._write_index()
+        return path
+
+    def load_playlist(self) -> tuple[list[str], list[str]]:
+        """
+        Returns the last known playlist as tuple of image URLs and system image URLs.
+        """
+        playlist = self._read_json(self.playlist_path, {})
+        return playlist.get("images", []), playlist.get("system", [])
+
+    def save_playlist(self, image_urls:list[str], system_image_urls:list[str]):
+        """
+        Persists the playlist and removes slides which aren't part of it anymore.
+        """
+        playlist = {"images": image_urls, "system": system_image_urls}
+        self._write_atomic(self.playlist_path, json.dumps(playlist).encode("utf-8"))
+        self.prune(set(image_urls) | set(system_image_urls))
+
+    def prune(self, keep_urls:set[str]):
+        """
+        Removes all cached slides whose URL isn't in keep_urls.
+        """
+        with self.lock:
+            self.index = {url: entry for url, entry in self.index.items() if url in keep_urls}
+            self._write_index()
+            referenced = {self._get_entry(url)["hash"] for url in self.index}
+
+        for file_name in os.listdir(self.slides_dir):
+            if file_name not in referenced and not file_name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(self.slides_dir, file_name))
+                except OSError as e:
+                    print(f"Error removing cached slide {file_name}: {e}")
@@ -0,0 +1,133 @@
+"""
+Module for cpu based transitions between slides of the displayer.
+
+Transitions are rendered from slides which were already scaled to the screen
+size (see display.prepare_slide), so a frame only costs one or two full screen
+blits. Every frame has to fit into the frame budget given by the target frame
+rate. If the hardware can't keep up, the transition is aborted and the slide
+is shown with a hard cut instead.
+"""
+
+import time
+
+import pygame
+
+TRANSITIONS = ("cut", "crossfade", "slide")
+
+
+class TransitionEngine:
+    """
+    Renders transitions between two prepared, screen sized slides.
+    """
+    def __init__(self, screen, clock, mode:str="crossfade", duration:float=0.5, fps:int=20,
+                 max_missed_frames:int=2, max_failed_transitions:int=3):
+        """
+        Args:
+            screen (pygame.Surface): The display surface.
+            clock (pygame.time.Clock): Clock used to cap the frame rate.
+            mode (str): One of TRANSITIONS.
+            duration (float): The time in seconds a transition takes.
+            fps (int): The target frame rate of a transition.
+            max_missed_frames (int): Frames allowed to exceed the frame budget before
+                the running transition is replaced by a cut.
+            max_failed_transitions (int): Consecutive aborted transitions after which
+                all further slide changes are cuts.
+        """
+        if mode not in TRANSITIONS:
+            raise ValueError(f"Unknown transition '{mode}', choose one of {TRANSITIONS}")
+
+        self.screen = screen
+        self.clock = clock
+        self.mode = mode
+        self.duration = duration
+        self.fps = fps
+        self.frame_budget = 1 / fps
+        self.max_missed_frames = max_missed_frames
+        self.max_failed_transitions = max_failed_transitions
+        self.failed_transitions = 0
+
+    @property
+    def degraded(self) -> bool:
+        """
+        True if transitions were disabled because the frame budget was missed repeatedly.
+        """
+        return self.failed_transitions >= self.max_failed_transitions
+
+    def render_frame(self, previous, current, progress:float):
+        """
+        Renders a single transition frame into the screen surface without flipping it.
+
+        Args:
+            previous (pygame.Surface): The prepared slide which is currently displayed.
+            current (pygame.Surface): The prepared slide to display next.
+            progress (float): Progress of the transition between 0 and 1.
+        """
+        if self.mode == "crossfade":
+            self.screen.blit(previous, (0, 0))
+            current.set_alpha(int(255 * progress))
+            self.screen.blit(current, (0, 0))
+            current.set_alpha(None)
+        elif self.mode == "slide":
+            # Ease out, so the new slide settles softly
+            offset = int(self.screen.get_width() * (1 - (1 - progress) ** 2))
+            self.screen.blit(previous, (-offset, 0))
+            self.screen.blit(current, (self.screen.get_width() - offset, 0))
+        else:
+            self.screen.blit(current, (0, 0))
+
+    def cut(self, current):
+        """
+        Displays a slide without any transition.
+        """
+        self.screen.blit(current, (0, 0))
+        pygame.display.flip()
+
+    def run(self, previous, current) -> bool:
+        """
+        Transitions from the previous to the current slide.
+
+        The progress of the transition is based on the elapsed time, so frames which
+        take too long are skipped instead of stretching the transition. Once more
+        than max_missed_frames frames exceeded the frame budget, the transition is
+        finished with a cut.
+
+        Args:
+            previous (pygame.Surface): The prepared slide which is currently displayed or None.
+            current (pygame.Surface): The prepared slide to display next.
+
+        Returns:
+            bool: True if the transition was rendered completely, False if a cut was used.
+        """
+        if self.mode == "cut" or previous is None or self.degraded:
+            self.cut(current)
+            return self.mode == "cut"
+
+        missed_frames = 0
+        start_time = time.perf_counter()
+        while True:
+            frame_start = time.perf_counter()
+            progress = (frame_start - start_time) / self.duration
+            if progress >= 1:
+                break
+
+            self.render_frame(previous, current, progress)
+            pygame.display.flip()
+
+            if time.perf_counter() - frame_start > self.frame_budget:
+                missed_frames += 1
+                if missed_frames > self.max_missed_frames:
+                    break
+            self.clock.tick(self.fps)
+
+        self.cut(current)
+
+        if missed_frames > self.max_missed_frames:
+            self.failed_transitions += 1
+            print(f"Transition exceeded the frame budget of {self.frame_budget:.3f}s, "
+                  "falling back to a cut")
+            if self.degraded:
+                print("Transitions disabled, the frame budget was missed repeatedly")
+            return False
+
+        self.failed_transitions = 0
+        return True
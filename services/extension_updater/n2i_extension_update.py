@@ -1,11 +1,44 @@
-import subprocess
-import time
+"""
+Scheduler running the jobs (main.py) of the active N2i extensions.
+
+Every extension job runs on its own interval in a child process with a
+timeout. A bounded pool supervises the child processes, so a slow extension
+doesn't delay the others. Durations and failures of all jobs are printed and
+written to a status file.
+
+Extensions whose main.py defines a job entry point
+
+    def run(context):
+        ...
+
+are run in a persistent worker process instead: main.py is imported once and
+run(context) is called on every interval, so imports, models, fonts and HTTP
+sessions stay warm between runs. The context is an ExtensionContext. Other
+extensions are started as a fresh interpreter per run.
+
+The scheduler has to be started from the html folder of the CMS.
+"""
+
 import os
+import sys
+import json
+import time
+import signal
+import argparse
+import traceback
+import subprocess
+import importlib.util
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 
-from sqlalchemy import create_engine, Column, Integer, String, Boolean
+from sqlalchemy import create_engine, select, Column, Integer, String, Boolean
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 
+# Seconds a stopped worker gets to terminate before it is killed
+STOP_GRACE = 5.0
+
 Base = declarative_base()
 
 class Extension(Base):
@@ -15,46 +48,329 @@ class Extension(Base):
     managable = Column(Boolean, nullable=False)
     active = Column(Boolean, nullable=False)
 
-def check_extensions_active(extension_name: str):
-    # Replace 'sqlite:///path/to/your_database.db' with your actual database URL
-    DATABASE_URL = 'sqlite:///instance/uploads.sqlite'
-    # Create an engine
-    engine = create_engine(DATABASE_URL)
-    # Create a configured "Session" class
-    Session = sessionmaker(bind=engine)
-    session = Session()
 
-    extension = session.query(Extension).filter(Extension.name == extension_name).first()
+class ExtensionContext:
+    """
+    The context passed to the run(context) entry point of an extension.
+
+    Attributes:
+        name (str): The name of the extension.
+        runs (int): The amount of previous runs in this worker process.
+        state (dict): Objects the extension wants to keep between runs.
+    """
+    def __init__(self, name:str):
+        self.name = name
+        self.runs = 0
+        self.state = {}
+
+
+def worker_loop(conn, name:str, main_path:str):
+    """
+    Entry point of a persistent worker process: imports the main.py of an extension
+    once and calls its run(context) whenever the scheduler requests a run.
+    """
+    # Own process group, so stopping the worker also stops the processes it started,
+    # e.g. the slide rendering pool
+    os.setpgrp()
+
+    # Allow the flat imports of extensions and the imports of the CMS modules
+    sys.path.insert(0, os.path.dirname(os.path.abspath(main_path)))
+    sys.path.insert(1, os.getcwd())
+
+    try:
+        spec = importlib.util.spec_from_file_location(f"n2i_extension_{name}", main_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except SystemExit:
+        # A script which exits on import, it is run as a fresh interpreter
+        conn.send(("unsupported", None))
+        return
+    except Exception:  # pylint: disable=broad-exception-caught
+        conn.send(("error", traceback.format_exc()))
+        return
+
+    if not callable(getattr(module, "run", None)):
+        conn.send(("unsupported", None))
+        return
+    conn.send(("ready", None))
+
+    context = ExtensionContext(name)
+    while conn.recv():
+        start_time = time.monotonic()
+        try:
+            module.run(context)
+            result = (True, time.monotonic() - start_time, None)
+        except Exception:  # pylint: disable=broad-exception-caught
+            result = (False, time.monotonic() - start_time, traceback.format_exc().strip())
+        context.runs += 1
+        conn.send(result)
+
+
+class ExtensionWorker:
+    """
+    A persistent process running the run(context) entry point of an extension.
+    """
+    mp_context = multiprocessing.get_context("spawn")
+
+    def __init__(self, name:str, main_path:str):
+        self.name = name
+        self.main_path = main_path
+        self.process = None
+        self.conn = None
+
+    def start(self, timeout:float) -> str:
+        """
+        Starts the worker and waits until the extension was imported.
+
+        Returns:
+            str: "ready", "unsupported" if the extension has no run(context) or "error".
+        """
+        self.conn, child_conn = self.mp_context.Pipe()
+        # Not daemonic, so extensions can start worker pools of their own.
+        # The scheduler stops its workers before exiting.
+        self.process = self.mp_context.Process(target=worker_loop,
+                                               args=(child_conn, self.name, self.main_path))
+        self.process.start()
+        child_conn.close()
+
+        try:
+            if not self.conn.poll(timeout):
+                self.stop()
+                return "error"
+            state, error = self.conn.recv()
+        except (EOFError, OSError) as e:
+            print(f"[{self.name}] Worker died while importing the extension: {e}")
+            self.stop()
+            return "error"
+        if state != "ready":
+            if error:
+                print(f"[{self.name}] Worker couldn't import the extension: {error}")
+            self.stop()
+        return state
+
+    def run(self, timeout:float) -> tuple[bool, float, str]:
+        """
+        Runs the job in the worker, the worker is killed if the job times out.
+        """
+        start_time = time.monotonic()
+        try:
+            self.conn.send(True)
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.stop()
+            return False, time.monotonic() - start_time, f"worker died: {e}"
+
+        self.stop()
+        return False, time.monotonic() - start_time, f"timed out after {timeout}s"
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def signal_group(self, signum:int):
+        try:
+            os.killpg(self.process.pid, signum)
+        except (ProcessLookupError, PermissionError):
+            # The worker and all processes it started already exited
+            pass
+
+    def stop(self, grace:float=STOP_GRACE):
+        """
+        Stops the worker and the processes it started: asks them to terminate
+        and kills them if they are still running after the grace period.
+        """
+        if self.process is not None:
+            self.signal_group(signal.SIGTERM)
+            self.process.join(grace)
+            self.signal_group(signal.SIGKILL)
+            self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+class ExtensionJob:
+    """
+    The job of an extension and the statistics of its runs.
+    """
+    def __init__(self, name:str, main_path:str, interval:float, timeout:float):
+        self.name = name
+        self.main_path = main_path
+        self.interval = interval
+        self.timeout = timeout
+        self.next_run = 0.0
+        self.future = None
+        self.runs = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.last_duration = None
+        self.total_duration = 0.0
+        self.last_error = None
+        self.worker = ExtensionWorker(name, main_path)
+        self.in_process = True
+
+    def run(self) -> tuple[bool, float, str]:
+        """
+        Runs the job in the persistent worker or, if the extension has no
+        run(context) entry point, in a fresh interpreter.
+
+        Returns:
+            tuple[bool, float, str]: Success, duration in seconds and the error if any.
+        """
+        if self.in_process and not self.worker.alive:
+            state = self.worker.start(self.timeout)
+            if state == "unsupported":
+                self.in_process = False
+            elif state == "error":
+                return False, 0.0, "worker couldn't import the extension"
+
+        if self.in_process:
+            return self.worker.run(self.timeout)
+        return self.run_subprocess()
+
+    def run_subprocess(self) -> tuple[bool, float, str]:
+        """
+        Runs the job in a child process using the interpreter of the scheduler.
+
+        Returns:
+            tuple[bool, float, str]: Success, duration in seconds and the error if any.
+        """
+        start_time = time.monotonic()
+        try:
+            process = subprocess.run([sys.executable, self.main_path], capture_output=True,
+                                     text=True, timeout=self.timeout, check=False)
+        except subprocess.TimeoutExpired:
+            return False, time.monotonic() - start_time, f"timed out after {self.timeout}s"
+        except OSError as e:
+            return False, time.monotonic() - start_time, str(e)
+
+        duration = time.monotonic() - start_time
+        if process.stdout:
+            print(f"[{self.name}] {process.stdout.strip()}")
+        if process.returncode != 0:
+            return False, duration, process.stderr.strip() or f"exit code {process.returncode}"
+        return True, duration, None
+
+    def record(self, success:bool, duration:float, error:str):
+        self.runs += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        self.last_error = error
+        if not success:
+            self.failures += 1
+            if error and error.startswith("timed out"):
+                self.timeouts += 1
+            print(f"[{self.name}] Job failed after {duration:.1f}s: {error}")
+        else:
+            print(f"[{self.name}] Job finished in {duration:.1f}s")
+
+    def status(self) -> dict:
+        return {"runs": self.runs, "failures": self.failures, "timeouts": self.timeouts,
+                "last_duration": self.last_duration,
+                "mean_duration": self.total_duration / self.runs if self.runs else None,
+                "last_error": self.last_error, "running": self.future is not None,
+                "in_process": self.in_process}
+
+
+def get_extension_states(session_factory) -> dict[str, bool]:
+    """
+    Returns the active state of all extensions by name, read in one query.
+    """
+    try:
+        with session_factory() as session:
+            return dict(session.execute(select(Extension.name, Extension.active)).all())
+    except SQLAlchemyError as e:
+        print(f"Error reading the extension states: {e}")
+        return {}
+
+
+def discover_jobs(extensions_path:str, interval:float, intervals:dict,
+                  timeout:float) -> list[ExtensionJob]:
+    """
+    Creates a job for every extension which has a main.py.
+    """
+    jobs = []
+    for extension in sorted(os.listdir(extensions_path)):
+        main_path = os.path.join(extensions_path, extension, "main.py")
+        if os.path.isfile(main_path):
+            jobs.append(ExtensionJob(extension, main_path, intervals.get(extension, interval),
+                                     timeout))
+    return jobs
+
+
+def write_status(status_path:str, jobs:list[ExtensionJob]):
+    tmp_path = status_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({job.name: job.status() for job in jobs}, f, indent=4)
+    os.replace(tmp_path, status_path)
+
+
+def schedule(jobs:list[ExtensionJob], session_factory, workers:int, status_path:str,
+             tick:float=1.0):
+    """
+    Runs the jobs of the active extensions forever.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            now = time.monotonic()
+            states = None
+            changed = False
+
+            for job in jobs:
+                if job.future is not None and job.future.done():
+                    job.record(*job.future.result())
+                    job.future = None
+                    changed = True
+
+                if job.future is not None or job.next_run > now:
+                    continue
 
-    session.close()
+                if states is None:
+                    states = get_extension_states(session_factory)
+                job.next_run = now + job.interval
+                if states.get(job.name):
+                    job.future = pool.submit(job.run)
 
-    # Check if the extension was found and print it
-    if extension.active:
-        return True
-    return False
+            if changed and status_path:
+                write_status(status_path, jobs)
+            time.sleep(tick)
 
 
-def main():
-    extensions_path = "extensions"
-    extensions = os.listdir(extensions_path)
+def parse_intervals(values:list[str]) -> dict[str, float]:
+    intervals = {}
+    for value in values:
+        name, _, seconds = value.partition("=")
+        intervals[name] = float(seconds)
+    return intervals
 
-    for extension in extensions:
-        if not check_extensions_active(extension):
-            continue
 
-        extension_main_path = os.path.join(extensions_path, extension, "main.py")
-        commands = f'''
-        source ../.venv/bin/activate
-        python3 {extension_main_path}
-        '''
-        with subprocess.Popen('/bin/bash', stdin=subprocess.PIPE, \
-                                    stdout=subprocess.PIPE, text=True) as process:
-            out, err = process.communicate(commands)
-            print(out)
-            print(err)
+def main(args):
+    engine = create_engine(args.database)
+    session_factory = sessionmaker(bind=engine)
 
-    time.sleep(600) #update the extensions every 10 min
+    jobs = discover_jobs("extensions", args.interval, parse_intervals(args.extension_interval),
+                         args.timeout)
+    print(f"Scheduling jobs of the extensions: {', '.join(job.name for job in jobs)}")
+    try:
+        schedule(jobs, session_factory, args.workers, args.status_file)
+    finally:
+        for job in jobs:
+            job.worker.stop()
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='N2i extension job scheduler')
+    parser.add_argument('-d', '--database', default='sqlite:///instance/uploads.db', \
+                        help='URL of the CMS database')
+    parser.add_argument('-i', '--interval', type=float, default=600, \
+                        help='Default seconds between two runs of an extension job')
+    parser.add_argument('-e', '--extension-interval', action='append', default=[], \
+                        metavar='NAME=SECONDS', help='Interval of a single extension')
+    parser.add_argument('-t', '--timeout', type=float, default=300, \
+                        help='Seconds after which a job is killed')
+    parser.add_argument('-w', '--workers', type=int, default=4, \
+                        help='Maximum amount of jobs running at the same time')
+    parser.add_argument('-s', '--status-file', default='instance/extension_jobs.json', \
+                        help='File to write the job statistics to')
+    main(parser.parse_args())
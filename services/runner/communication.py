@@ -1,28 +1,313 @@
 """
 Module for communication with nextride2(screens).
+
+A nextride2 packet has a fixed size of 257 bytes:
+
+    byte 0      display duration in seconds (0-255)
+    byte 1      length n of the URI (0-255)
+    byte 2..n+1 the ASCII encoded URI
+    rest        zero padding
 """
 
+import time
 import socket
+import struct
+import asyncio
+from collections import OrderedDict
+
+NEXTRIDE2_PORT = 31337
+PACKET_SIZE = 257
+HEADER = struct.Struct("BB")
+MAX_DURATION = 255
+MAX_URI_LENGTH = PACKET_SIZE - HEADER.size
+
+
+class ProtocolError(ValueError):
+    """
+    Raised if a packet can't be encoded or decoded.
+    """
+
+
+def validate_packet(sec:int, uri:str) -> bytes:
+    """
+    Validates the content of a packet and returns the encoded URI.
+
+    Raises:
+        ProtocolError: If the duration or the URI don't fit into a packet.
+    """
+    if not isinstance(sec, int) or not 0 <= sec <= MAX_DURATION:
+        raise ProtocolError(f"Duration must be an integer between 0 and {MAX_DURATION}, got {sec!r}")
+    try:
+        uri_bytes = uri.encode('ascii')
+    except UnicodeEncodeError as e:
+        raise ProtocolError(f"URI must be ASCII: {uri!r}") from e
+    if len(uri_bytes) > MAX_URI_LENGTH:
+        raise ProtocolError(f"URI is {len(uri_bytes)} bytes long, the maximum is {MAX_URI_LENGTH}")
+    return uri_bytes
+
+
+def encode_packet_into(buffer, sec:int, uri:str) -> int:
+    """
+    Encodes a packet into a preallocated, writable buffer of at least PACKET_SIZE bytes.
+
+    Returns:
+        int: The size of the packet.
+
+    Raises:
+        ProtocolError: If the duration or the URI don't fit into a packet.
+    """
+    uri_bytes = validate_packet(sec, uri)
+    end = HEADER.size + len(uri_bytes)
+    view = memoryview(buffer)
+    HEADER.pack_into(view, 0, sec, len(uri_bytes))
+    view[HEADER.size:end] = uri_bytes
+    view[end:PACKET_SIZE] = bytes(PACKET_SIZE - end)
+    return PACKET_SIZE
+
+
+def encode_packet(sec:int, uri:str) -> bytes:
+    """
+    Encodes a packet.
+
+    Raises:
+        ProtocolError: If the duration or the URI don't fit into a packet.
+    """
+    buffer = bytearray(PACKET_SIZE)
+    encode_packet_into(buffer, sec, uri)
+    return bytes(buffer)
+
+
+def decode_packet(data) -> tuple[int, str]:
+    """
+    Decodes a packet.
+
+    Returns:
+        tuple[int, str]: The display duration in seconds and the URI.
+
+    Raises:
+        ProtocolError: If the data isn't a valid packet.
+    """
+    view = memoryview(data)
+    if len(view) != PACKET_SIZE:
+        raise ProtocolError(f"Packet must be {PACKET_SIZE} bytes long, got {len(view)}")
+    sec, urilen = HEADER.unpack_from(view)
+    try:
+        uri = str(view[HEADER.size:HEADER.size + urilen], 'ascii')
+    except UnicodeDecodeError as e:
+        raise ProtocolError("URI isn't ASCII") from e
+    return sec, uri
+
+
+def parse_destination(dest:str, default_port:int=NEXTRIDE2_PORT) -> tuple[str, int]:
+    """
+    Parses a destination of the form "ip" or "ip:port".
+
+    Args:
+        dest (str): The destination to parse.
+        default_port (int): The port used if the destination doesn't specify one.
+
+    Returns:
+        tuple[str, int]: The address tuple as expected by socket.sendto.
+    """
+    host, _, port = dest.partition(":")
+    return host, int(port) if port else default_port
+
 
 class Nextride2PacketSender:
     """
     A class for sending packets to a destination using the Nextride2 interface.
+
+    A sender is meant to be long-lived: the socket is created once and encoded
+    packets are cached, so sending the same slide again in a later cycle
+    doesn't encode it again.
     """
-    def __init__(self):
+    def __init__(self, redundancy:int=3, spacing:float=0.0, port:int=NEXTRIDE2_PORT,
+                 cache_size:int=256):
+        """
+        Args:
+            redundancy (int): How often each packet is sent, as UDP may drop packets.
+            spacing (float): Seconds to wait between two redundant sends of a packet.
+            port (int): The default port of the nextride screens.
+            cache_size (int): The maximum amount of encoded packets kept for reuse.
+        """
+        self.redundancy = redundancy
+        self.spacing = spacing
+        self.port = port
+        self.cache_size = cache_size
+        self.packets = OrderedDict()
+        self.addresses = {}
+
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Closes the socket of the sender.
+        """
+        self.sock.close()
+
+    def get_address(self, dest:str) -> tuple[str, int]:
+        """
+        Returns the address tuple for a destination of the form "ip" or "ip:port".
+        """
+        address = self.addresses.get(dest)
+        if address is None:
+            address = self.addresses[dest] = parse_destination(dest, self.port)
+        return address
+
+    def encode_packet(self, sec:int, uri:str) -> bytes:
+        """
+        Returns the encoded packet for a slide, reusing previously encoded packets.
+
+        Args:
+            sec (int): The time in seconds the file should be displayed on the nextride screens.
+            uri (str): The URI of the media to display.
+
+        Raises:
+            ProtocolError: If the duration or the URI don't fit into a packet.
+        """
+        key = (sec, uri)
+        packet = self.packets.get(key)
+        if packet is not None:
+            self.packets.move_to_end(key)
+            return packet
+
+        packet = self.packets[key] = encode_packet(sec, uri)
+        if len(self.packets) > self.cache_size:
+            self.packets.popitem(last=False)
+        return packet
+
     def send_packet(self, dest:str, sec:int, uri:str):
         """
         Sends a packet to the specified destination.
 
         Args:
-            dest (str): The destination ip-address to send the packet to.
+            dest (str): The destination ip-address to send the packet to, optionally with ":port".
             sec (int): The time in seconds the file should be displayed on the nextride screens.
             uri (str): The URI of the media to display.
         """
-        urilen = len(uri)
-        r = bytearray([sec, urilen]) + uri.encode('ascii')
-        r += bytearray(257 - len(r))
-        for _ in range(3):
-            self.sock.sendto(r, (dest, 31337))
+        self.send_batch([dest], sec, uri)
+
+    def send_batch(self, dests:list[str], sec:int, uri:str):
+        """
+        Sends a packet to several destinations.
+
+        Each round sends the packet once to every destination, so the spacing between
+        redundant sends is shared by all destinations instead of adding up per screen.
+
+        Args:
+            dests (list[str]): The destination ip-addresses, optionally with ":port".
+            sec (int): The time in seconds the file should be displayed on the nextride screens.
+            uri (str): The URI of the media to display.
+        """
+        packet = self.encode_packet(sec, uri)
+        addresses = [self.get_address(dest) for dest in dests]
+        for i in range(self.redundancy):
+            if i and self.spacing:
+                time.sleep(self.spacing)
+            for address in addresses:
+                self.sock.sendto(packet, address)
+
+    async def send_batch_async(self, dests:list[str], sec:int, uri:str):
+        """
+        Like send_batch, but waits for the spacing between redundant sends without
+        blocking the event loop.
+
+        Args:
+            dests (list[str]): The destination ip-addresses, optionally with ":port".
+            sec (int): The time in seconds the file should be displayed on the nextride screens.
+            uri (str): The URI of the media to display.
+        """
+        packet = self.encode_packet(sec, uri)
+        addresses = [self.get_address(dest) for dest in dests]
+        for i in range(self.redundancy):
+            if i and self.spacing:
+                await asyncio.sleep(self.spacing)
+            for address in addresses:
+                self.sock.sendto(packet, address)
+
+
+class ReceivedPacket:
+    """
+    A packet received by a Nextride2PacketReceiver.
+    """
+    def __init__(self, sec:int, uri:str, received_at:float, source:tuple):
+        self.sec = sec
+        self.uri = uri
+        self.received_at = received_at
+        self.source = source
+
+
+class Nextride2PacketReceiver:
+    """
+    A local stand-in for a nextride2 screen, used to test and measure the delivery
+    of packets. Received packets are decoded from a preallocated buffer.
+    """
+    def __init__(self, host:str="127.0.0.1", port:int=0):
+        """
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on, 0 picks a free port.
+        """
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.buffer = bytearray(PACKET_SIZE + 1)
+        self.view = memoryview(self.buffer)
+        self.invalid_packets = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    @property
+    def destination(self) -> str:
+        """
+        The destination string of the receiver as accepted by Nextride2PacketSender.
+        """
+        return f"{self.address[0]}:{self.address[1]}"
+
+    def receive(self, timeout:float=1.0):
+        """
+        Waits for the next valid packet.
+
+        Returns:
+            ReceivedPacket: The packet or None if no valid packet arrived within the timeout.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                size, source = self.sock.recvfrom_into(self.buffer)
+            except socket.timeout:
+                return None
+            received_at = time.perf_counter()
+            try:
+                sec, uri = decode_packet(self.view[:size])
+            except ProtocolError:
+                self.invalid_packets += 1
+                continue
+            return ReceivedPacket(sec, uri, received_at, source)
+
+    def receive_all(self, timeout:float=0.2) -> list[ReceivedPacket]:
+        """
+        Receives packets until none arrived for the given timeout.
+        """
+        packets = []
+        while (packet := self.receive(timeout)) is not None:
+            packets.append(packet)
+        return packets
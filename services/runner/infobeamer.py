@@ -4,19 +4,21 @@ Module for infobeamer functionality.
 
 from communication import Nextride2PacketSender
 
+_sender = None
 
-def infobeamer_main(dest:str, seconds:int, uri:str):
+
+def get_sender(redundancy:int=3, spacing:float=0.0) -> Nextride2PacketSender:
     """
-    Sends content to infobeamer screens.
+    Returns the sender shared by the whole runner.
 
-    If the schedule list, containing content urls is empty, the uri is displayed,
-    otherwise the urls from the schedule are sent to the infobeamer screens. 
+    The sender is created on the first call, the arguments of later calls are ignored.
 
     Args:
-        dest (str): The destination IP address.
-        seconds (int): The time in seconds the content should be displayed.
-        uri (str): The URI of the content to be displayed.
-        schedule (list): List of scheduled content URIs.
+        redundancy (int): How often each packet is sent.
+        spacing (float): Seconds to wait between two redundant sends of a packet.
     """
-    sender = Nextride2PacketSender()
-    sender.send_packet(dest, seconds, uri)
+    global _sender  # pylint: disable=global-statement
+    if _sender is None:
+        _sender = Nextride2PacketSender(redundancy=redundancy, spacing=spacing)
+    return _sender
+
@@ -0,0 +1,287 @@
+"""
+Load test for the runner against many simulated nextride2 screens.
+
+Every simulated screen listens on its own local UDP port and records the
+packets it receives. The runner scheduler drives the screens with a synthetic
+playlist (or the playlist of a real CMS) for a given time, afterwards the
+arrivals are matched with the sends to report delivery latency, slide change
+jitter, duplicate and lost packets.
+
+The screens run on their own event loop in a separate thread, so the numbers
+include the time the runner needs to serve all screens.
+
+Examples:
+    python3 loadtest.py --screens 60 --group-count 12 --time 30
+    python3 loadtest.py --groups groups_example.json --time 60 --report report.json
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+
+from communication import Nextride2PacketSender, decode_packet, ProtocolError
+from scheduler import Scheduler, ScreenGroup, load_groups
+
+
+class SimulatedScreen(asyncio.DatagramProtocol):
+    """
+    A simulated nextride2 screen recording every valid packet it receives.
+    """
+    def __init__(self):
+        self.transport = None
+        self.arrivals = []
+        self.invalid_packets = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        received_at = time.perf_counter()
+        try:
+            sec, uri = decode_packet(data)
+        except ProtocolError:
+            self.invalid_packets += 1
+            return
+        self.arrivals.append((received_at, sec, uri))
+
+    @property
+    def destination(self) -> str:
+        host, port = self.transport.get_extra_info("sockname")[:2]
+        return f"{host}:{port}"
+
+
+class ScreenSimulator:
+    """
+    Runs simulated screens on an event loop in a background thread.
+    """
+    def __init__(self, count:int, host:str="127.0.0.1"):
+        self.count = count
+        self.host = host
+        self.screens = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def _create_screens(self):
+        for _ in range(self.count):
+            _, screen = await self.loop.create_datagram_endpoint(SimulatedScreen,
+                                                                 local_addr=(self.host, 0))
+            self.screens.append(screen)
+
+    def start(self) -> list[SimulatedScreen]:
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._create_screens(), self.loop).result()
+        return self.screens
+
+    def stop(self):
+        for screen in self.screens:
+            self.loop.call_soon_threadsafe(screen.transport.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class RecordingSender(Nextride2PacketSender):
+    """
+    A sender which records when it sent which slide to which destination.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sends = {}
+
+    async def send_batch_async(self, dests:list[str], sec:int, uri:str):
+        sent_at = time.perf_counter()
+        await super().send_batch_async(dests, sec, uri)
+        for dest in dests:
+            self.sends.setdefault(dest, []).append((sent_at, sec, uri))
+
+
+def percentile(values:list[float], p:float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(values:list[float]) -> dict:
+    """
+    Returns mean, p95 and max of a list of seconds in milliseconds.
+    """
+    if not values:
+        return {"mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    return {"mean_ms": statistics.mean(values) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "max_ms": max(values) * 1000}
+
+
+def analyze_screen(sends:list[tuple], arrivals:list[tuple], redundancy:int) -> dict:
+    """
+    Matches the arrivals of a screen with the slides sent to it.
+
+    All packets of a slide arriving before the next slide was sent belong to it.
+    The first packet of a slide is its delivery, further packets are duplicates.
+
+    Returns:
+        dict: Counters and the raw latencies and jitters in seconds of the screen.
+    """
+    result = {"slides": len(sends), "lost_slides": 0, "packets_expected": len(sends) * redundancy,
+              "packets_received": 0, "duplicates": 0, "latencies": [], "jitters": []}
+
+    arrival_index = 0
+    previous_delivery = None
+    for i, (sent_at, sec, uri) in enumerate(sends):
+        window_end = sends[i + 1][0] if i + 1 < len(sends) else float("inf")
+        received = []
+        while arrival_index < len(arrivals) and arrivals[arrival_index][0] < window_end:
+            if arrivals[arrival_index][2] == uri:
+                received.append(arrivals[arrival_index][0])
+            arrival_index += 1
+
+        result["packets_received"] += len(received)
+        if not received:
+            result["lost_slides"] += 1
+            previous_delivery = None
+            continue
+
+        result["duplicates"] += len(received) - 1
+        result["latencies"].append(received[0] - sent_at)
+        if previous_delivery is not None:
+            interval, expected = received[0] - previous_delivery[0], previous_delivery[1]
+            result["jitters"].append(abs(interval - expected))
+        previous_delivery = (received[0], sec)
+    return result
+
+
+def build_report(sender:RecordingSender, screens:list[SimulatedScreen], groups:list[ScreenGroup],
+                 run_time:float) -> dict:
+    totals = {"slides": 0, "lost_slides": 0, "packets_expected": 0, "packets_received": 0,
+              "duplicates": 0}
+    latencies, jitters = [], []
+    invalid_packets = 0
+    for screen in screens:
+        result = analyze_screen(sender.sends.get(screen.destination, []), screen.arrivals,
+                                sender.redundancy)
+        for key in totals:
+            totals[key] += result[key]
+        latencies += result["latencies"]
+        jitters += result["jitters"]
+        invalid_packets += screen.invalid_packets
+
+    lost_packets = max(0, totals["packets_expected"] - totals["packets_received"])
+    return {
+        "config": {"screens": len(screens), "groups": len(groups), "time_s": run_time,
+                   "redundancy": sender.redundancy, "spacing_s": sender.spacing},
+        "slides_sent": totals["slides"],
+        "slides_lost": totals["lost_slides"],
+        "slide_loss_percent": 100 * totals["lost_slides"] / max(1, totals["slides"]),
+        "packets_expected": totals["packets_expected"],
+        "packets_received": totals["packets_received"],
+        "packet_loss_percent": 100 * lost_packets / max(1, totals["packets_expected"]),
+        "duplicate_packets": totals["duplicates"],
+        "invalid_packets": invalid_packets,
+        "latency": summarize(latencies),
+        "jitter": summarize(jitters),
+    }
+
+
+def print_report(report:dict):
+    config = report["config"]
+    print(f"{config['screens']} screens in {config['groups']} groups for {config['time_s']}s, "
+          f"redundancy {config['redundancy']}, spacing {config['spacing_s']}s")
+    print(f"Slides:  {report['slides_sent']} sent, {report['slides_lost']} lost "
+          f"({report['slide_loss_percent']:.2f}%)")
+    print(f"Packets: {report['packets_received']}/{report['packets_expected']} received "
+          f"({report['packet_loss_percent']:.2f}% lost), {report['duplicate_packets']} duplicates, "
+          f"{report['invalid_packets']} invalid")
+    for name in ("latency", "jitter"):
+        stats = report[name]
+        print(f"{name.capitalize() + ':':<9}mean {stats['mean_ms']:.2f} ms, "
+              f"p95 {stats['p95_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+
+
+def synthetic_playlist(slides:int):
+    image_urls = [f"http://cms.invalid/static/uploads/slide_{i}.png" for i in range(slides)]
+    system_image_urls = ["http://cms.invalid/static/uploads/system/system.png"]
+    return image_urls, system_image_urls
+
+
+def create_groups(args) -> list[ScreenGroup]:
+    """
+    Creates the groups to test, either from a runner config or evenly distributed screens.
+    """
+    if args.groups:
+        return load_groups(args.groups, args.cms or "synthetic")
+    return [ScreenGroup(f"group_{i}", [None] * (args.screens // args.group_count +
+                                              (i < args.screens % args.group_count)),
+                        args.cms or "synthetic", args.slide_duration)
+            for i in range(args.group_count)]
+
+
+async def run_scheduler(scheduler:Scheduler, run_time:float):
+    try:
+        await asyncio.wait_for(scheduler.run(), run_time)
+    except asyncio.TimeoutError:
+        pass
+
+
+def main(args):
+    groups = create_groups(args)
+
+    # Replace the destinations of all groups by simulated screens
+    simulator = ScreenSimulator(sum(len(group.destinations) for group in groups))
+    screens = iter(simulator.start())
+    for group in groups:
+        group.destinations = [next(screens).destination for _ in group.destinations]
+
+    if args.cms:
+        # Imported here, so synthetic runs don't need the CMS scraping dependencies
+        from main import get_image_urls  # pylint: disable=import-outside-toplevel
+        def fetch_playlist(cms_url):
+            image_urls = get_image_urls(cms_url)
+            system_image_urls = get_image_urls(cms_url + "/system")
+            if image_urls is None or system_image_urls is None:
+                return None
+            return image_urls, system_image_urls
+    else:
+        def fetch_playlist(_):
+            return synthetic_playlist(args.slides)
+
+    sender = RecordingSender(redundancy=args.redundancy, spacing=args.spacing)
+    scheduler = Scheduler(groups, sender, fetch_playlist, refresh_interval=args.time,
+                          health_interval=args.time)
+    asyncio.run(run_scheduler(scheduler, args.time))
+
+    time.sleep(0.5)  # Let packets in flight arrive
+    simulator.stop()
+    sender.close()
+
+    report = build_report(sender, simulator.screens, groups, args.time)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='N2i runner load test')
+    parser.add_argument('-n', '--screens', type=int, default=20, \
+                        help='Amount of simulated screens')
+    parser.add_argument('--group-count', type=int, default=1, \
+                        help='Amount of groups the screens are distributed to')
+    parser.add_argument('-g', '--groups', \
+                        help='Runner groups config to test, its destinations are simulated')
+    parser.add_argument('-c', '--cms', \
+                        help='Play the playlist of this CMS instead of a synthetic one')
+    parser.add_argument('--slides', type=int, default=10, \
+                        help='Amount of slides in the synthetic playlist')
+    parser.add_argument('--slide-duration', type=int, default=1, \
+                        help='Display duration of a slide in seconds')
+    parser.add_argument('-t', '--time', type=float, default=20, \
+                        help='Seconds to run the test')
+    parser.add_argument('-r', '--redundancy', type=int, default=3, \
+                        help='How often each packet is sent to the screens')
+    parser.add_argument('--spacing', type=float, default=0.0, \
+                        help='Seconds between two redundant sends of a packet')
+    parser.add_argument('--report', help='Write the report as json to this file')
+    main(parser.parse_args())
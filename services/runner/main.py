@@ -1,18 +1,24 @@
+import os
+import json
+import asyncio
+import hashlib
 import argparse
-import time
 
 import requests
 from bs4 import BeautifulSoup
 
-from infobeamer import infobeamer_main
+from infobeamer import get_sender
+from scheduler import Scheduler, ScreenGroup, load_groups
+
+from http_client import get_client
 
 def get_image_urls(url):
     try:
-        response = requests.get(url, timeout=10)
+        response = get_client().get(url)
         response.raise_for_status()  # Check for request errors
     except requests.RequestException as e:
         print(f"Error fetching the URL: {e}")
-        return []
+        return None
 
     soup = BeautifulSoup(response.text, 'html.parser')
     images = soup.find_all('img')
@@ -28,31 +34,67 @@ def get_image_urls(url):
 
     return img_urls
 
-def display_image(image:str, duration:int):
-    print(image)
-    for _ in range(3):
-        infobeamer_main("255.255.255.255", duration, image)
-    time.sleep(duration)
+def get_cache_path(cache_dir:str, cms_url:str):
+    return os.path.join(cache_dir, hashlib.sha1(cms_url.encode("utf-8")).hexdigest() + ".json")
+
+def load_playlist(cache_path:str):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            playlist = json.load(f)
+        return playlist.get("images", []), playlist.get("system", [])
+    except (FileNotFoundError, json.JSONDecodeError):
+        return [], []
+
+def save_playlist(cache_path:str, image_urls:list, system_image_urls:list):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"images": image_urls, "system": system_image_urls}, f)
+    os.replace(tmp_path, cache_path)
 
-def main(cms_url:str):
-    duration = 5
-    while(1):
-        image_urls = get_image_urls(cms_url)
-        system_image_urls = get_image_urls(cms_url + "/system")
+def fetch_playlist(cms_url:str, cache_dir:str):
+    """
+    Returns the playlist of the CMS and persists it or None if the CMS is unreachable.
+    """
+    image_urls = get_image_urls(cms_url)
+    system_image_urls = get_image_urls(cms_url + "/system")
+    if image_urls is None or system_image_urls is None:
+        print("CMS unreachable, keep playing the last known playlist")
+        return None
 
-        for system_image in system_image_urls:
-            display_image(system_image, duration)
+    save_playlist(get_cache_path(cache_dir, cms_url), image_urls, system_image_urls)
+    return image_urls, system_image_urls
 
-        for i, image in enumerate(image_urls):
-            if i % 6 == 5:
-                for system_image in system_image_urls:
-                    display_image(system_image, duration)
-            display_image(image, duration)
-            time.sleep(duration)
+def main(groups:list[ScreenGroup], cache_dir:str, refresh_interval:float):
+    scheduler = Scheduler(groups, get_sender(),
+                          lambda cms_url: fetch_playlist(cms_url, cache_dir),
+                          lambda cms_url: load_playlist(get_cache_path(cache_dir, cms_url)),
+                          refresh_interval=refresh_interval,
+                          health_lines=get_client().format_metrics)
+    asyncio.run(scheduler.run())
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='N2i runner')
-    parser.add_argument('-c', '--cms', required=True, \
+    parser.add_argument('-c', '--cms', \
                         help='URL of the CMS whichs content to display')
+    parser.add_argument('-g', '--groups', \
+                        help='Json file configuring the screen groups to drive, see scheduler.load_groups')
+    parser.add_argument('--cache-dir', default=os.path.expanduser('~/.cache/n2i-runner'), \
+                        help='Directory to persist the last known playlists in')
+    parser.add_argument('-r', '--redundancy', type=int, default=3, \
+                        help='How often each packet is sent to the screens')
+    parser.add_argument('--spacing', type=float, default=0.0, \
+                        help='Seconds between two redundant sends of a packet')
+    parser.add_argument('--refresh-interval', type=float, default=30, \
+                        help='Seconds between two playlist refreshes')
     args = parser.parse_args()
-    main(args.cms)
+    if not args.cms and not args.groups:
+        parser.error("either --cms or --groups is required")
+
+    if args.groups:
+        screen_groups = load_groups(args.groups, args.cms)
+    else:
+        screen_groups = [ScreenGroup("default", ["255.255.255.255"], args.cms)]
+
+    get_sender(args.redundancy, args.spacing)
+    main(screen_groups, args.cache_dir, args.refresh_interval)
@@ -0,0 +1,287 @@
+"""
+Module for scheduling the playback of slides on groups of nextride2 screens.
+
+A screen group is a set of destinations (broadcast, multicast or unicast
+addresses) which display the same playlist. All groups are driven by a single
+asyncio event loop, so one runner process can serve many groups without a
+thread or blocking sleep per group. Playlist refreshes and health reports run
+as independent tasks on the same loop, the groups keep playing their current
+playlist while a refresh is in flight.
+"""
+
+import json
+import time
+import asyncio
+import posixpath
+from urllib.parse import urlparse
+
+from communication import ProtocolError
+
+
+class Slide:
+    """
+    A slide in the schedule of a screen group.
+    """
+    def __init__(self, uri:str, duration:int):
+        self.uri = uri
+        self.duration = duration
+
+    def __repr__(self):
+        return f"Slide({self.uri!r}, {self.duration})"
+
+
+def build_schedule(image_urls:list[str], system_image_urls:list[str],
+                   system_interval:int) -> list[str]:
+    """
+    Builds the order of one round: system slides first, then the images with the
+    system slides interleaved after every system_interval-1 images.
+
+    Args:
+        image_urls (list[str]): URLs of the uploaded and extension slides.
+        system_image_urls (list[str]): URLs of the system slides.
+        system_interval (int): Position of the interleaved system slides, 0 disables interleaving.
+
+    Returns:
+        list[str]: The URLs in the order they are played.
+    """
+    schedule = list(system_image_urls)
+    for i, image_url in enumerate(image_urls):
+        if system_interval and i % system_interval == system_interval - 1:
+            schedule.extend(system_image_urls)
+        schedule.append(image_url)
+    return schedule
+
+
+class ScreenGroup:
+    """
+    A group of nextride2 screens playing the same playlist.
+    """
+    def __init__(self, name:str, destinations:list[str], cms_url:str, duration:int=5,
+                 system_interval:int=6, durations:dict=None):
+        """
+        Args:
+            name (str): Name of the group used in log messages.
+            destinations (list[str]): Addresses of the screens, optionally with ":port".
+            cms_url (str): URL of the CMS whose content the group displays.
+            duration (int): Default time in seconds a slide is displayed.
+            system_interval (int): System slides are shown every system_interval-th slide.
+            durations (dict): Display durations by file name prefix, e.g. {"mastodon_": 10}.
+        """
+        self.name = name
+        self.destinations = destinations
+        self.cms_url = cms_url
+        self.duration = duration
+        self.system_interval = system_interval
+        self.durations = durations or {}
+        self.schedule = []
+        self.position = 0
+        self.slides_sent = 0
+        self.last_slide = None
+
+    def get_duration(self, uri:str) -> int:
+        """
+        Returns the display duration of a slide based on its file name.
+        """
+        file_name = posixpath.basename(urlparse(uri).path)
+        for prefix, duration in self.durations.items():
+            if file_name.startswith(prefix):
+                return duration
+        return self.duration
+
+    def update_playlist(self, image_urls:list[str], system_image_urls:list[str]) -> bool:
+        """
+        Applies a refreshed playlist without restarting the schedule.
+
+        Slides which are still scheduled are kept and playback continues after the
+        slide which is currently displayed. If it was removed, playback continues
+        at the same position of the new schedule.
+
+        Returns:
+            bool: True if the schedule changed.
+        """
+        uris = build_schedule(image_urls, system_image_urls, self.system_interval)
+        if uris == [slide.uri for slide in self.schedule]:
+            return False
+
+        current = self.schedule[self.position - 1].uri if self.position else None
+        known_slides = {slide.uri: slide for slide in self.schedule}
+        self.schedule = [known_slides.get(uri) or Slide(uri, self.get_duration(uri))
+                         for uri in uris]
+
+        # System slides occur several times, continue after the nearest occurrence
+        occurrences = [i for i, uri in enumerate(uris) if uri == current]
+        if occurrences:
+            self.position = min(occurrences, key=lambda i: abs(i - self.position + 1)) + 1
+        else:
+            self.position = min(self.position, len(self.schedule))
+        return True
+
+    def next_slide(self):
+        """
+        Returns the next slide of the schedule or None if the schedule is empty.
+        """
+        if not self.schedule:
+            return None
+        if self.position >= len(self.schedule):
+            self.position = 0
+        slide = self.schedule[self.position]
+        self.position += 1
+        return slide
+
+
+def load_groups(config_path:str, cms_url:str=None) -> list[ScreenGroup]:
+    """
+    Loads the screen groups from a json config file.
+
+    Example:
+        {"groups": [{"name": "hall", "destinations": ["10.0.0.255"],
+                     "duration": 5, "system_interval": 6, "durations": {"mastodon_": 10}},
+                    {"name": "bar", "destinations": ["10.0.1.10", "10.0.1.11:31337"],
+                     "cms": "https://other-cms.example.com"}]}
+
+    Args:
+        config_path (str): Path of the config file.
+        cms_url (str): CMS used by groups which don't specify their own "cms".
+    """
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    groups = []
+    for group in config["groups"]:
+        group_cms_url = group.get("cms", config.get("cms", cms_url))
+        if not group_cms_url:
+            raise ValueError(f"No CMS configured for group '{group['name']}'")
+        groups.append(ScreenGroup(group["name"], group["destinations"], group_cms_url,
+                                  group.get("duration", 5), group.get("system_interval", 6),
+                                  group.get("durations")))
+    return groups
+
+
+class Scheduler:
+    """
+    Plays the schedules of all screen groups concurrently on one event loop.
+    """
+    def __init__(self, groups:list[ScreenGroup], sender, fetch_playlist, cached_playlist=None,
+                 refresh_interval:float=30, health_interval:float=60, health_lines=None):
+        """
+        Args:
+            groups (list[ScreenGroup]): The screen groups to drive.
+            sender (Nextride2PacketSender): The sender used for all groups.
+            fetch_playlist (callable): Blocking function returning the tuple
+                (image_urls, system_image_urls) for a CMS URL or None if the CMS is
+                unreachable. It runs in a worker thread.
+            cached_playlist (callable): Optional function returning the last known
+                playlist of a CMS URL, used to start playback before the first refresh.
+            refresh_interval (float): Seconds between two playlist refreshes of a CMS.
+            health_interval (float): Seconds between two health reports.
+            health_lines (callable): Optional function returning additional lines for
+                the health report, e.g. HTTP metrics.
+        """
+        self.groups = groups
+        self.sender = sender
+        self.fetch_playlist = fetch_playlist
+        self.cached_playlist = cached_playlist
+        self.refresh_interval = refresh_interval
+        self.health_interval = health_interval
+        self.health_lines = health_lines
+
+        # Groups sharing a CMS share its refreshes
+        self.cms_groups = {}
+        for group in groups:
+            self.cms_groups.setdefault(group.cms_url, []).append(group)
+        self.last_refresh = dict.fromkeys(self.cms_groups)
+        self.refresh_failures = dict.fromkeys(self.cms_groups, 0)
+
+    async def refresh(self, cms_url:str) -> bool:
+        """
+        Fetches the playlist of a CMS and applies it to all groups using the CMS.
+
+        Returns:
+            bool: False if the CMS couldn't be reached.
+        """
+        playlist = await asyncio.to_thread(self.fetch_playlist, cms_url)
+        if playlist is None:
+            self.refresh_failures[cms_url] += 1
+            return False
+
+        self.last_refresh[cms_url] = time.time()
+        for group in self.cms_groups[cms_url]:
+            if group.update_playlist(*playlist):
+                print(f"[{group.name}] Playlist updated, {len(group.schedule)} slides scheduled")
+        return True
+
+    async def refresh_loop(self, cms_url:str):
+        while True:
+            try:
+                await self.refresh(cms_url)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self.refresh_failures[cms_url] += 1
+                print(f"Error refreshing the playlist of {cms_url}: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def play_group(self, group:ScreenGroup):
+        """
+        Plays the schedule of a group forever.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            slide = group.next_slide()
+            if slide is None:
+                # Nothing to play yet, check again soon
+                deadline += 1
+            else:
+                try:
+                    await self.sender.send_batch_async(group.destinations, slide.duration,
+                                                       slide.uri)
+                    group.slides_sent += 1
+                    group.last_slide = slide
+                    deadline += slide.duration
+                except ProtocolError as e:
+                    print(f"[{group.name}] Skipping {slide.uri}: {e}")
+                    deadline += 1
+                except OSError as e:
+                    # E.g. an unreachable network, keep playing once it is back
+                    print(f"[{group.name}] Error sending {slide.uri}: {e}")
+                    deadline += 1
+
+            # Sleep until an absolute deadline, so send times don't drift
+            await asyncio.sleep(max(0, deadline - loop.time()))
+            # Don't try to catch up if the loop was stalled
+            deadline = max(deadline, loop.time())
+
+    def health_report(self) -> list[str]:
+        """
+        Returns one line per CMS and per group describing its state.
+        """
+        lines = []
+        for cms_url, last_refresh in self.last_refresh.items():
+            age = f"{time.time() - last_refresh:.0f}s ago" if last_refresh else "never"
+            lines.append(f"{cms_url}: last refresh {age}, "
+                         f"{self.refresh_failures[cms_url]} failed refreshes")
+        for group in self.groups:
+            current = group.last_slide.uri if group.last_slide else None
+            lines.append(f"[{group.name}] {len(group.schedule)} slides scheduled, "
+                         f"{group.slides_sent} sent to {len(group.destinations)} destinations, "
+                         f"current: {current}")
+        if self.health_lines:
+            lines += self.health_lines()
+        return lines
+
+    async def health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for line in self.health_report():
+                print(line)
+
+    async def run(self):
+        if self.cached_playlist:
+            for cms_url, groups in self.cms_groups.items():
+                playlist = self.cached_playlist(cms_url)
+                for group in groups:
+                    group.update_playlist(*playlist)
+
+        tasks = [self.refresh_loop(cms_url) for cms_url in self.cms_groups]
+        tasks += [self.play_group(group) for group in self.groups]
+        tasks.append(self.health_loop())
+        await asyncio.gather(*tasks)
@@ -0,0 +1,43 @@
+# pylint: skip-file
+
+import unittest
+
+import sys
+sys.path.append('services/runner')
+from communication import (encode_packet, encode_packet_into, decode_packet, ProtocolError,
+                           PACKET_SIZE, MAX_URI_LENGTH)
+
+class TestPacket(unittest.TestCase):
+    def test_encode_packet(self):
+        packet = encode_packet(5, "http://cms/a.png")
+        self.assertEqual(len(packet), PACKET_SIZE)
+        self.assertEqual(packet[:2], bytes([5, 16]))
+        self.assertEqual(packet[2:18], b"http://cms/a.png")
+        self.assertEqual(packet[18:], bytes(PACKET_SIZE - 18))
+
+    def test_encode_packet_into_reused_buffer(self):
+        buffer = bytearray(PACKET_SIZE)
+        encode_packet_into(buffer, 10, "http://cms/a_long_file_name.png")
+        encode_packet_into(buffer, 5, "http://cms/a.png")
+        self.assertEqual(bytes(buffer), encode_packet(5, "http://cms/a.png"))
+
+    def test_decode_packet(self):
+        self.assertEqual(decode_packet(encode_packet(255, "x" * MAX_URI_LENGTH)),
+                         (255, "x" * MAX_URI_LENGTH))
+
+    def test_uri_too_long(self):
+        with self.assertRaises(ProtocolError):
+            encode_packet(5, "x" * (MAX_URI_LENGTH + 1))
+
+    def test_duration_out_of_range(self):
+        for sec in (-1, 256, 5.0):
+            with self.assertRaises(ProtocolError):
+                encode_packet(sec, "http://cms/a.png")
+
+    def test_uri_not_ascii(self):
+        with self.assertRaises(ProtocolError):
+            encode_packet(5, "http://cms/ä.png")
+
+    def test_decode_wrong_size(self):
+        with self.assertRaises(ProtocolError):
+            decode_packet(encode_packet(5, "http://cms/a.png")[:-1])
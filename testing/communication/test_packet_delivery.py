@@ -0,0 +1,39 @@
+# pylint: skip-file
+
+import time
+import unittest
+
+import sys
+sys.path.append('services/runner')
+from communication import Nextride2PacketSender, Nextride2PacketReceiver
+
+class TestPacketDelivery(unittest.TestCase):
+    def setUp(self):
+        self.receiver = Nextride2PacketReceiver()
+        self.sender = Nextride2PacketSender(redundancy=3)
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def test_redundant_packets_arrive(self):
+        sent_at = time.perf_counter()
+        self.sender.send_packet(self.receiver.destination, 5, "http://cms/a.png")
+        packets = self.receiver.receive_all()
+
+        self.assertEqual(len(packets), 3)  # No loss on localhost
+        for packet in packets:
+            self.assertEqual((packet.sec, packet.uri), (5, "http://cms/a.png"))
+            self.assertLess(packet.received_at - sent_at, 0.5)
+
+    def test_batch_to_several_screens(self):
+        with Nextride2PacketReceiver() as second_receiver:
+            self.sender.send_batch([self.receiver.destination, second_receiver.destination],
+                                   7, "http://cms/b.png")
+            self.assertEqual(len(self.receiver.receive_all()), 3)
+            self.assertEqual(len(second_receiver.receive_all()), 3)
+
+    def test_invalid_packets_are_counted(self):
+        self.sender.sock.sendto(b"\x05\x01a", self.receiver.address)
+        self.assertIsNone(self.receiver.receive(timeout=0.2))
+        self.assertEqual(self.receiver.invalid_packets, 1)
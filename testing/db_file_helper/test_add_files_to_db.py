@@ -0,0 +1,128 @@
+# pylint: skip-file
+
+import os
+import json
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../html')))
+
+from db_models import Users, Queue, Uploads, db
+from db_file_helper import add_files_to_db, get_remaining_global_uploads
+
+class TestAddFilesToDb(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Flask(__name__)
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(cls.app)
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Users(user_name='alice', user_upload_amount=0, user_upload_limit=3, user_files=[]))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def get_alice(self):
+        return Users.query.filter_by(name='alice').first()
+
+    def test_add_to_queue(self):
+        files = [("a.jpg", "/queue/a.jpg", "hash_a"), ("b.jpg", "/queue/b.jpg", "hash_b")]
+        self.assertTrue(add_files_to_db(files, 'alice'))
+
+        alice = self.get_alice()
+        self.assertEqual(alice.get_user_files_queue(), ["a.jpg", "b.jpg"])
+        self.assertEqual(alice.get_user_files_uploads(), [])
+        self.assertEqual(alice.upload_amount, 2)
+        self.assertEqual([(f.file_name, f.file_password) for f in Queue.query.all()],
+                         [("a.jpg", "hash_a"), ("b.jpg", "hash_b")])
+        self.assertEqual(Uploads.query.count(), 0)
+
+    def test_add_to_uploads(self):
+        self.assertTrue(add_files_to_db([("a.jpg", "/queue/a.jpg", "hash_a")], 'alice'))
+        self.assertTrue(add_files_to_db([("b.jpg", "/uploads/b.jpg", None)], 'alice', uploads=True))
+
+        alice = self.get_alice()
+        self.assertEqual(json.loads(alice.files_queue), ["a.jpg"])
+        self.assertEqual(json.loads(alice.files_uploads), ["b.jpg"])
+        self.assertEqual(alice.upload_amount, 2)
+        self.assertEqual([f.file_name for f in Uploads.query.all()], ["b.jpg"])
+        self.assertEqual([f.file_name for f in Queue.query.all()], ["a.jpg"])
+
+    def test_user_limit_exceeded(self):
+        self.assertTrue(add_files_to_db([("a.jpg", "/queue/a.jpg", "hash_a")], 'alice'))
+        files = [(f"{name}.jpg", f"/queue/{name}.jpg", "hash") for name in ("b", "c", "d")]
+        self.assertFalse(add_files_to_db(files, 'alice'))
+
+        alice = self.get_alice()
+        self.assertEqual(alice.get_user_files_queue(), ["a.jpg"])
+        self.assertEqual(alice.upload_amount, 1)
+        self.assertEqual(Queue.query.count(), 1)
+
+    def test_unknown_owner(self):
+        self.assertFalse(add_files_to_db([("a.jpg", "/queue/a.jpg", "hash_a")], 'bob'))
+        self.assertEqual(Queue.query.count(), 0)
+
+    def test_rollback_on_failure(self):
+        # The second file has no path, the commit fails on the NOT NULL constraint
+        files = [("a.jpg", "/queue/a.jpg", "hash_a"), ("b.jpg", None, "hash_b")]
+        self.assertFalse(add_files_to_db(files, 'alice'))
+
+        alice = self.get_alice()
+        self.assertEqual(alice.get_user_files_queue(), [])
+        self.assertEqual(alice.upload_amount, 0)
+        self.assertEqual(Queue.query.count(), 0)
+
+        # The session is usable again after the rollback
+        self.assertTrue(add_files_to_db([("c.jpg", "/queue/c.jpg", "hash_c")], 'alice'))
+        self.assertEqual(self.get_alice().get_user_files_queue(), ["c.jpg"])
+
+class TestGetRemainingGlobalUploads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Flask(__name__)
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(cls.app)
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add_all([Uploads(file_name=f"{i}.jpg", file_path=f"/uploads/{i}.jpg", file_owner='alice')
+                            for i in range(3)])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    @patch.dict(os.environ, {'GLOBAL_UPLOAD_LIMIT': '5'})
+    def test_remaining_slots(self):
+        self.assertEqual(get_remaining_global_uploads(), 2)
+
+    @patch.dict(os.environ, {'GLOBAL_UPLOAD_LIMIT': '2'})
+    def test_limit_exceeded(self):
+        self.assertEqual(get_remaining_global_uploads(), 0)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_default_limit(self):
+        self.assertEqual(get_remaining_global_uploads(), 97)
+
+    def test_queued_files_not_counted(self):
+        db.session.add(Queue(file_name="q.jpg", file_path="/queue/q.jpg", file_password="hash", file_owner='alice'))
+        db.session.commit()
+        with patch.dict(os.environ, {'GLOBAL_UPLOAD_LIMIT': '5'}):
+            self.assertEqual(get_remaining_global_uploads(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
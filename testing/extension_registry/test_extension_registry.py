@@ -0,0 +1,58 @@
+# pylint: skip-file
+
+import os
+import json
+import tempfile
+import unittest
+
+from flask import Flask
+
+import sys
+sys.path.append('html')
+from extension_registry import discover_extensions
+from db_models import Extension, create_extensions, db
+
+class TestExtensionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        folder = self.temp_dir.name
+
+        os.makedirs(os.path.join(folder, "with_manifest"))
+        with open(os.path.join(folder, "with_manifest", "manifest.json"), "w") as f:
+            json.dump({"description": "Test", "managable": False, "blueprint": None}, f)
+
+        os.makedirs(os.path.join(folder, "without_manifest", "templates"))
+        open(os.path.join(folder, "without_manifest", "routes.py"), "w").close()
+
+        os.makedirs(os.path.join(folder, "__pycache__"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_discover_extensions(self):
+        manifests = discover_extensions(self.temp_dir.name)
+
+        self.assertEqual([manifest.name for manifest in manifests], ["with_manifest", "without_manifest"])
+        self.assertFalse(manifests[0].managable)
+        self.assertIsNone(manifests[0].blueprint)
+        self.assertTrue(manifests[1].managable)
+        self.assertEqual(manifests[1].blueprint, "routes.py")
+
+    def test_create_extensions(self):
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            manifests = discover_extensions(self.temp_dir.name)
+            create_extensions(manifests)
+            create_extensions(manifests)
+
+            extensions = Extension.query.order_by(Extension.name).all()
+            self.assertEqual([(e.name, e.managable, e.active) for e in extensions],
+                             [("with_manifest", False, False), ("without_manifest", True, False)])
+            db.drop_all()
+
+if __name__ == '__main__':
+    unittest.main()
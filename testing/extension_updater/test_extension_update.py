@@ -0,0 +1,178 @@
+# pylint: skip-file
+
+import os
+import shutil
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import sys
+sys.path.append('services/extension_updater')
+import n2i_extension_update
+from n2i_extension_update import Base, Extension, ExtensionJob, ExtensionWorker, \
+    discover_jobs, schedule
+
+def process_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+            state = f.read().rsplit(")", 1)[1].split()[0]
+    except FileNotFoundError:
+        return False
+    return state not in ("Z", "X")
+
+class StopSchedule(Exception):
+    pass
+
+class FakeTime:
+    """
+    Clock of the scheduler, every tick advances it by one second.
+    """
+    def __init__(self, jobs, ticks):
+        self.jobs = jobs
+        self.ticks = ticks
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Let the submitted jobs finish before the next tick
+        for job in self.jobs:
+            if job.future is not None:
+                job.future.result()
+        self.ticks -= 1
+        if self.ticks < 0:
+            raise StopSchedule()
+        self.now += seconds
+
+class TestExtensionUpdate(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def add_extension(self, name, source):
+        os.makedirs(os.path.join(self.folder, name))
+        main_path = os.path.join(self.folder, name, "main.py")
+        with open(main_path, "w", encoding="utf-8") as f:
+            f.write(textwrap.dedent(source))
+        return main_path
+
+    def create_session_factory(self, states):
+        engine = create_engine(f"sqlite:///{os.path.join(self.folder, 'uploads.db')}")
+        Base.metadata.create_all(engine)
+        session_factory = sessionmaker(bind=engine)
+        with session_factory() as session:
+            for name, active in states.items():
+                session.add(Extension(name=name, managable=True, active=active))
+            session.commit()
+        return session_factory
+
+    def run_schedule(self, jobs, session_factory, ticks):
+        runs = {job.name: 0 for job in jobs}
+        def fake_run(job):
+            runs[job.name] += 1
+            return True, 0.0, None
+
+        with mock.patch.object(n2i_extension_update, "time", FakeTime(jobs, ticks)), \
+                mock.patch.object(ExtensionJob, "run", fake_run):
+            with self.assertRaises(StopSchedule):
+                schedule(jobs, session_factory, 2, None)
+        return runs
+
+    def test_interval_schedule(self):
+        jobs = [ExtensionJob("fast", "fast/main.py", 2, 10),
+                ExtensionJob("slow", "slow/main.py", 5, 10)]
+        session_factory = self.create_session_factory({"fast": True, "slow": True})
+
+        # Ticks at 0 to 9 seconds
+        runs = self.run_schedule(jobs, session_factory, 9)
+        self.assertEqual(runs, {"fast": 5, "slow": 2})
+        self.assertEqual(jobs[0].runs, 5)
+        self.assertEqual(jobs[0].failures, 0)
+
+    def test_skips_inactive_and_missing_extensions(self):
+        self.add_extension("active", "print('active')\n")
+        self.add_extension("inactive", "print('inactive')\n")
+        self.add_extension("unknown", "print('unknown')\n")
+        os.makedirs(os.path.join(self.folder, "no_job"))
+
+        jobs = discover_jobs(self.folder, 2, {"inactive": 3}, 10)
+        self.assertEqual([job.name for job in jobs], ["active", "inactive", "unknown"])
+        self.assertEqual(jobs[1].interval, 3)
+
+        session_factory = self.create_session_factory({"active": True, "inactive": False})
+        runs = self.run_schedule(jobs, session_factory, 3)
+        self.assertEqual(runs, {"active": 2, "inactive": 0, "unknown": 0})
+
+    def test_worker_runs_entry_point(self):
+        main_path = self.add_extension("counter", """
+            def run(context):
+                context.state["runs"] = context.state.get("runs", 0) + 1
+                if context.state["runs"] == 2:
+                    raise RuntimeError("second run")
+        """)
+        job = ExtensionJob("counter", main_path, 60, 10)
+        try:
+            self.assertEqual(job.run()[0], True)
+            success, _, error = job.run()
+            self.assertFalse(success)
+            self.assertIn("second run", error)
+            self.assertTrue(job.in_process)
+            self.assertTrue(job.worker.alive)
+        finally:
+            job.worker.stop()
+
+    def test_timeout_kills_process_group(self):
+        pid_path = os.path.join(self.folder, "child.pid")
+        main_path = self.add_extension("stuck", f"""
+            import time
+            import subprocess
+
+            def run(context):
+                child = subprocess.Popen(["sleep", "60"])
+                with open({pid_path!r}, "w") as f:
+                    f.write(str(child.pid))
+                time.sleep(60)
+        """)
+        worker = ExtensionWorker("stuck", main_path)
+        self.assertEqual(worker.start(10), "ready")
+        process = worker.process
+
+        success, _, error = worker.run(1)
+        self.assertFalse(success)
+        self.assertEqual(error, "timed out after 1s")
+        self.assertFalse(worker.alive)
+        self.assertFalse(process.is_alive())
+
+        with open(pid_path, "r", encoding="utf-8") as f:
+            child_pid = int(f.read())
+        self.assertFalse(process_running(child_pid))
+
+    def test_subprocess_fallback(self):
+        main_path = self.add_extension("script", "print('done')\n")
+        job = ExtensionJob("script", main_path, 60, 10)
+
+        self.assertEqual(job.run(), (True, mock.ANY, None))
+        self.assertFalse(job.in_process)
+        self.assertFalse(job.worker.alive)
+
+        failing_path = self.add_extension("failing", "raise SystemExit('broken')\n")
+        job = ExtensionJob("failing", failing_path, 60, 10)
+        success, _, error = job.run()
+        self.assertFalse(success)
+        self.assertEqual(error, "broken")
+
+    def test_worker_dying_on_import(self):
+        main_path = self.add_extension("crashing", "import os\nos._exit(3)\n")
+        job = ExtensionJob("crashing", main_path, 60, 10)
+        self.assertEqual(job.run(), (False, 0.0, "worker couldn't import the extension"))
+        self.assertFalse(job.worker.alive)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# pylint: skip-file
+
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../html')))
+
+from db_models import Users, Queue, Uploads, db
+from filehandler import safe_files
+from extensions.cms.CMSConfig import CMSConfig
+
+class TestSafeFiles(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Flask(__name__)
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(cls.app)
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(Users(user_name='alice', user_upload_amount=0, user_upload_limit=3, user_files=[]))
+        db.session.commit()
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.temp_dir.name, "queue")
+        os.makedirs(self.folder)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.temp_dir.cleanup()
+
+    def make_uploads(self, amount):
+        uploads = []
+        for i in range(amount):
+            upload = MagicMock()
+            upload.filename = f"photo{i}.jpg"
+            upload.error = None
+            upload.path = os.path.join(self.temp_dir.name, f"{i}.upload")
+            with open(upload.path, "wb") as f:
+                f.write(b"image")
+            uploads.append(upload)
+        return uploads
+
+    @patch('filehandler.get_setting_from_config', return_value=CMSConfig(0, "email_approve", False))
+    def test_batch_within_user_limit(self, mock_get_setting_from_config):
+        uploads = self.make_uploads(5)
+        stored = safe_files(uploads, self.folder, 'alice')
+
+        self.assertEqual(len(stored), 3)
+        self.assertEqual(sorted(os.listdir(self.folder)), sorted(stored))
+        self.assertEqual([upload.error for upload in uploads[3:]], ["Upload limit reached"] * 2)
+
+        user = Users.query.filter_by(name='alice').first()
+        self.assertEqual(user.upload_amount, 3)
+        self.assertEqual(json.loads(user.files_queue), stored)
+        self.assertEqual(Queue.query.count(), 3)
+
+    def test_batch_to_uploads(self):
+        stored = safe_files(self.make_uploads(2), self.folder, 'alice', queue=False)
+
+        self.assertEqual(len(stored), 2)
+        self.assertEqual(Uploads.query.count(), 2)
+        self.assertEqual(Queue.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
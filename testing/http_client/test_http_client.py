@@ -0,0 +1,104 @@
+# pylint: skip-file
+
+import unittest
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import sys
+sys.path.append('html')
+from http_client import HttpClient
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    failures = {"count": 0}
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.client_address[1], self.headers.get('If-None-Match')))
+        if self.path == "/flaky" and Handler.failures["count"] < 2:
+            Handler.failures["count"] += 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.path == "/etag" and self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+
+        body = b"content of " + self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/etag":
+            self.send_header("ETag", '"v1"')
+            self.send_header("Cache-Control", "no-cache")
+        elif self.path == "/fresh":
+            self.send_header("Cache-Control", "max-age=60")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestHttpClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests.clear()
+        self.client = HttpClient(backoff=0)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_connections_are_reused(self):
+        for i in range(10):
+            self.assertEqual(self.client.get(f"{self.url}/slide_{i}").status_code, 200)
+        self.assertEqual(len({port for _, port, _ in Handler.requests}), 1)
+
+    def test_etag_revalidation(self):
+        first = self.client.get(f"{self.url}/etag")
+        second = self.client.get(f"{self.url}/etag")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(Handler.requests[1][2], '"v1"')
+        self.assertEqual(self.client.metrics()[self.url[7:]]["revalidated"], 1)
+
+    def test_fresh_response_served_from_cache(self):
+        self.client.get(f"{self.url}/fresh")
+        response = self.client.get(f"{self.url}/fresh")
+        self.assertEqual(response.text, "content of /fresh")
+        self.assertEqual(len(Handler.requests), 1)
+        self.assertEqual(self.client.metrics()[self.url[7:]]["cache_hits"], 1)
+
+    def test_uncacheable_response_not_cached(self):
+        self.client.get(f"{self.url}/plain")
+        self.client.get(f"{self.url}/plain")
+        self.assertEqual(len(Handler.requests), 2)
+        self.assertEqual(len(self.client.cache), 0)
+
+    def test_retry_server_errors(self):
+        Handler.failures["count"] = 0
+        self.assertEqual(self.client.get(f"{self.url}/flaky").status_code, 200)
+        self.assertEqual(len(Handler.requests), 3)
+
+class TestServiceCopies(unittest.TestCase):
+    def test_copies_in_sync(self):
+        with open('html/http_client.py', encoding='utf-8') as f:
+            source = f.read()
+        for service in ('runner', 'displayer'):
+            with open(f'services/{service}/http_client.py', encoding='utf-8') as f:
+                self.assertEqual(f.read(), source, f"services/{service}/http_client.py differs")
+
+if __name__ == '__main__':
+    unittest.main()
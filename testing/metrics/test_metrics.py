@@ -0,0 +1,78 @@
+# pylint: skip-file
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+from sqlalchemy import text
+
+import sys
+sys.path.append('html')
+import metrics
+from metrics import init_metrics, observe
+from db_models import db
+
+def create_app(instance_path):
+    app = Flask(__name__, instance_path=instance_path)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    @app.route('/items/<int:item_id>')
+    def item(item_id):
+        for _ in range(3):
+            db.session.execute(text("SELECT 1"))
+        return str(item_id)
+
+    init_metrics(app, lambda: {"n2i_queue_files": ("Files waiting for approval.", 7)})
+    return app
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.app = create_app(self.temp_dir.name)
+
+    def tearDown(self):
+        metrics.registry.folder = None
+        self.temp_dir.cleanup()
+
+    def test_requests_and_queries(self):
+        client = self.app.test_client()
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        observe("n2i_email_send_duration_seconds", 0.3, result="sent")
+
+        body = client.get("/metrics").get_data(as_text=True)
+        self.assertIn('n2i_http_requests_total{method="GET",route="/items/<int:item_id>",status="200"} 2', body)
+        self.assertIn('n2i_http_requests_total{method="GET",route="unmatched",status="404"}', body)
+        self.assertIn('n2i_db_queries_per_request_bucket{route="/items/<int:item_id>",le="2"} 0', body)
+        self.assertIn('n2i_db_queries_per_request_bucket{route="/items/<int:item_id>",le="5"} 2', body)
+        self.assertIn('n2i_db_queries_per_request_sum{route="/items/<int:item_id>"} 6', body)
+        self.assertIn('n2i_email_send_duration_seconds_bucket{result="sent",le="0.5"}', body)
+        self.assertIn("# TYPE n2i_queue_files gauge\nn2i_queue_files 7", body)
+
+    def test_aggregates_worker_files(self):
+        metrics.registry.flush()
+        with open(os.path.join(self.temp_dir.name, "metrics", "1.json"), "w", encoding="utf-8") as f:
+            f.write('{"counters": {"n2i_upload_bytes_total": {"route=\\"/upload\\"": 1000}}, "histograms": {}}')
+
+        body = self.app.test_client().get("/metrics").get_data(as_text=True)
+        self.assertIn('n2i_upload_bytes_total{route="/upload"} 1000', body)
+
+    def test_token(self):
+        client = self.app.test_client()
+        with patch.dict(os.environ, {'METRICS_TOKEN': 'secret'}):
+            self.assertEqual(client.get("/metrics").status_code, 401)
+            response = client.get("/metrics", headers={"Authorization": "Bearer secret"},
+                                  environ_base={'REMOTE_ADDR': '192.0.2.1'})
+            self.assertEqual(response.status_code, 200)
+
+        with patch.dict(os.environ, {'METRICS_TOKEN': ''}):
+            self.assertEqual(client.get("/metrics").status_code, 200)
+            response = client.get("/metrics", environ_base={'REMOTE_ADDR': '192.0.2.1'})
+            self.assertEqual(response.status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# pylint: skip-file
+
+import os
+import logging
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+import sys
+sys.path.append('html')
+import metrics
+from metrics import init_metrics
+from query_profiler import init_query_profiler, query_budget, QueryBudgetExceeded
+from db_models import Users, db, create_roles
+from db_user_helper import get_users_data_for_dashboard
+from filehandler import get_all_images_for_all_users
+
+class TestQueryProfiler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.app = Flask(__name__, instance_path=cls.temp_dir.name)
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(cls.app)
+
+        @cls.app.route('/users')
+        def users():
+            return str(len(get_users_data_for_dashboard()))
+
+        init_metrics(cls.app)
+        with patch.dict(os.environ, {'SQL_PROFILING': '1', 'SQL_QUERY_BUDGET': '3'}):
+            init_query_profiler(cls.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        metrics.registry.folder = None
+        cls.temp_dir.cleanup()
+
+    def setUp(self):
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        create_roles()
+        for i in range(5):
+            db.session.add(Users(user_name=f'user{i}', user_upload_amount=0, user_upload_limit=3, user_files=[]))
+        db.session.commit()
+        db.session.expire_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_dashboards_query_once(self):
+        with query_budget(1):
+            self.assertEqual(len(get_users_data_for_dashboard()), 5)
+        with query_budget(1):
+            self.assertEqual(len(get_all_images_for_all_users()), 5)
+
+    def test_budget_reports_repeated_statements(self):
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with query_budget(1):
+                for user in Users.query.all():
+                    user.role.name
+        self.assertIn("queries in", str(context.exception))
+        self.assertIn("x SELECT roles.id", str(context.exception))
+
+    def test_request_profiling(self):
+        with self.assertLogs(level=logging.INFO) as logs:
+            response = self.app.test_client().get("/users")
+        self.assertIn("db;dur=", response.headers["Server-Timing"])
+        self.assertTrue(any("GET /users: 1 queries" in line for line in logs.output))
+
+if __name__ == '__main__':
+    unittest.main()
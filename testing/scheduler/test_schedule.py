@@ -0,0 +1,63 @@
+# pylint: skip-file
+
+import os
+import json
+import tempfile
+import unittest
+
+import sys
+sys.path.append('services/runner')
+from scheduler import build_schedule, load_groups, ScreenGroup
+
+class TestBuildSchedule(unittest.TestCase):
+    def test_interleaves_system_slides(self):
+        schedule = build_schedule(["a", "b", "c", "d", "e"], ["s1", "s2"], 3)
+        self.assertEqual(schedule, ["s1", "s2", "a", "b", "s1", "s2", "c", "d", "e"])
+
+    def test_interval_zero_disables_interleaving(self):
+        self.assertEqual(build_schedule(["a", "b", "c"], ["s"], 0), ["s", "a", "b", "c"])
+
+    def test_without_system_slides(self):
+        self.assertEqual(build_schedule(["a", "b", "c"], [], 2), ["a", "b", "c"])
+
+class TestDurations(unittest.TestCase):
+    def test_prefix_durations(self):
+        group = ScreenGroup("hall", ["10.0.0.255"], "http://cms", duration=5,
+                            durations={"mastodon_": 10, "pibooth": 8})
+        self.assertEqual(group.get_duration("http://cms/static/uploads/mastodon_1.png?v=abc"), 10)
+        self.assertEqual(group.get_duration("http://cms/static/uploads/pibooth_2.jpg"), 8)
+        self.assertEqual(group.get_duration("http://cms/static/mastodon_/photo.png"), 5)
+
+class TestLoadGroups(unittest.TestCase):
+    def setUp(self):
+        fd, self.config_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.config_path)
+
+    def write_config(self, config):
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+    def test_cms_and_defaults(self):
+        self.write_config({"groups": [
+            {"name": "hall", "destinations": ["10.0.0.255"], "durations": {"mastodon_": 10}},
+            {"name": "bar", "destinations": ["10.0.1.10"], "cms": "http://other", "system_interval": 0}]})
+        hall, bar = load_groups(self.config_path, "http://cms")
+
+        self.assertEqual((hall.cms_url, hall.duration, hall.system_interval), ("http://cms", 5, 6))
+        self.assertEqual(hall.durations, {"mastodon_": 10})
+        self.assertEqual((bar.cms_url, bar.system_interval), ("http://other", 0))
+
+    def test_config_cms_overrides_argument(self):
+        self.write_config({"cms": "http://config", "groups": [{"name": "hall", "destinations": []}]})
+        self.assertEqual(load_groups(self.config_path, "http://cms")[0].cms_url, "http://config")
+
+    def test_group_without_cms(self):
+        self.write_config({"groups": [{"name": "hall", "destinations": ["10.0.0.255"]}]})
+        with self.assertRaises(ValueError):
+            load_groups(self.config_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# pylint: skip-file
+
+import unittest
+
+import sys
+sys.path.append('services/runner')
+from scheduler import ScreenGroup
+
+def play(group, count):
+    return [group.next_slide().uri for _ in range(count)]
+
+class TestUpdatePlaylist(unittest.TestCase):
+    def setUp(self):
+        self.group = ScreenGroup("hall", ["10.0.0.255"], "http://cms", system_interval=3)
+
+    def test_unchanged_playlist(self):
+        self.assertTrue(self.group.update_playlist(["a", "b"], ["s"]))
+        play(self.group, 2)
+        self.assertFalse(self.group.update_playlist(["a", "b"], ["s"]))
+        self.assertEqual(play(self.group, 1), ["b"])
+
+    def test_keeps_slides_and_position(self):
+        self.group.update_playlist(["a", "b", "c"], [])
+        first = self.group.schedule[0]
+        self.assertEqual(play(self.group, 2), ["a", "b"])
+
+        self.assertTrue(self.group.update_playlist(["x", "a", "b", "c"], []))
+        self.assertIs(self.group.schedule[1], first)
+        self.assertEqual(play(self.group, 2), ["c", "x"])
+
+    def test_nearest_system_slide(self):
+        # s, a, b, s, c, d, e
+        self.group.update_playlist(["a", "b", "c", "d", "e"], ["s"])
+        self.assertEqual(play(self.group, 4), ["s", "a", "b", "s"])
+
+        # s, x, a, s, b, c, d, e: the second s is nearest to the played one
+        self.group.update_playlist(["x", "a", "b", "c", "d", "e"], ["s"])
+        self.assertEqual(play(self.group, 2), ["b", "c"])
+
+    def test_removed_current_slide(self):
+        self.group.update_playlist(["a", "b", "c"], [])
+        self.assertEqual(play(self.group, 2), ["a", "b"])
+
+        self.group.update_playlist(["a", "c", "d"], [])
+        self.assertEqual(play(self.group, 2), ["d", "a"])
+
+    def test_shrunk_schedule(self):
+        self.group.update_playlist(["a", "b", "c"], [])
+        play(self.group, 3)
+        self.group.update_playlist(["x"], [])
+        self.assertEqual(play(self.group, 2), ["x", "x"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# pylint: skip-file
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import sys
+sys.path.append('services/displayer')
+from slide_cache import SlideCache
+
+class TestSlideCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = SlideCache(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_store_deduplicates_content(self):
+        path_a = self.cache.store("http://cms/a.png", b"same", etag='"1"')
+        path_b = self.cache.store("http://cms/b.png", b"same")
+        self.assertEqual(path_a, path_b)
+        self.assertEqual(self.cache.get_path("http://cms/a.png"), path_a)
+        self.assertEqual(self.cache.get_validators("http://cms/a.png"), ('"1"', None))
+        self.assertIsNone(self.cache.get_path("http://cms/missing.png"))
+
+        # The index is persisted for the next start
+        reopened = SlideCache(self.cache_dir)
+        self.assertEqual(reopened.get_path("http://cms/b.png"), path_b)
+
+    def test_save_playlist_prunes_slides(self):
+        kept = self.cache.store("http://cms/a.png", b"a")
+        removed = self.cache.store("http://cms/b.png", b"b")
+        self.cache.save_playlist(["http://cms/a.png"], [])
+
+        self.assertEqual(self.cache.load_playlist(), (["http://cms/a.png"], []))
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(removed))
+        self.assertIsNone(self.cache.get_path("http://cms/b.png"))
+
+    def test_legacy_index_entries(self):
+        path = self.cache.store("http://cms/a.png", b"a")
+        with open(os.path.join(self.cache_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"http://cms/a.png": os.path.basename(path)}, f)
+
+        cache = SlideCache(self.cache_dir)
+        self.assertEqual(cache.get_path("http://cms/a.png"), path)
+        self.assertEqual(cache.get_validators("http://cms/a.png"), (None, None))
+        cache.prune({"http://cms/a.png"})
+        self.assertTrue(os.path.exists(path))
+
+    def test_corrupt_files(self):
+        with open(os.path.join(self.cache_dir, "playlist.json"), "w", encoding="utf-8") as f:
+            f.write("{")
+        self.assertEqual(self.cache.load_playlist(), ([], []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# pylint: skip-file
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, url_for
+
+import sys
+sys.path.append('html')
+from static_delivery import init_static_delivery
+
+def create_app(static_folder, mode='app'):
+    app = Flask(__name__, static_folder=static_folder, static_url_path='/static')
+    with patch.dict(os.environ, {'STATIC_DELIVERY': mode}):
+        init_static_delivery(app)
+    return app
+
+class TestStaticDelivery(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.temp_dir.name, "uploads"))
+        with open(os.path.join(self.temp_dir.name, "uploads", "slide.png"), "wb") as f:
+            f.write(bytes(range(256)) * 4)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def get_url(self, app):
+        with app.test_request_context():
+            return url_for('static', filename='uploads/slide.png')
+
+    def test_versioned_url_is_immutable(self):
+        app = create_app(self.temp_dir.name)
+        url = self.get_url(app)
+        self.assertIn("?v=", url)
+
+        response = app.test_client().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1024)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 365 * 24 * 60 * 60)
+
+        response = app.test_client().get("/static/uploads/slide.png?v=outdated")
+        self.assertFalse(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 60)
+
+    def test_range_and_missing_file(self):
+        app = create_app(self.temp_dir.name)
+        client = app.test_client()
+
+        response = client.get("/static/uploads/slide.png", headers={"Range": "bytes=0-9"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, bytes(range(10)))
+
+        self.assertEqual(client.get("/static/uploads/missing.png").status_code, 404)
+        self.assertEqual(client.get("/static/../secret.png").status_code, 404)
+
+    def test_x_accel_redirect(self):
+        app = create_app(self.temp_dir.name, mode='x-accel-redirect')
+        response = app.test_client().get(self.get_url(app))
+
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/static-internal/uploads/slide.png')
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertEqual(response.data, b"")
+        self.assertTrue(response.cache_control.immutable)
+
+if __name__ == '__main__':
+    unittest.main()
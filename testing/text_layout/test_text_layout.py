@@ -0,0 +1,57 @@
+# pylint: skip-file
+
+import unittest
+
+import sys
+sys.path.append('html')
+from text_layout import wrap_text, fit_text, get_advance_widths, ELLIPSIS
+
+class FixedWidthFont:
+    """ A font whose characters are all 10 pixels wide """
+    def __init__(self, size=10):
+        self.size = size
+
+    def getlength(self, text):
+        return 10 * len(text)
+
+class TestTextLayout(unittest.TestCase):
+    def test_wrap_text_by_width(self):
+        lines = wrap_text("aaa bbb ccc dddd", FixedWidthFont(), 70)
+        self.assertEqual(lines, ["aaa bbb", "ccc", "dddd"])
+
+    def test_wrap_text_keeps_line_breaks(self):
+        self.assertEqual(wrap_text("a b\nc", FixedWidthFont(), 100), ["a b", "c"])
+
+    def test_wrap_text_splits_long_words(self):
+        lines = wrap_text("x " + "y" * 25, FixedWidthFont(), 100)
+        self.assertEqual(lines, ["x", "y" * 10, "y" * 10, "y" * 5])
+
+    def test_wrap_text_max_lines(self):
+        lines = wrap_text("aaaa bbbb cccc dddd eeee", FixedWidthFont(), 100, max_lines=2)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[-1].endswith(ELLIPSIS))
+        self.assertLessEqual(len(lines[-1]) * 10, 100)
+
+    def test_advance_widths_are_cached(self):
+        font = FixedWidthFont()
+        widths = get_advance_widths(font)
+        wrap_text("abc abc", font, 100)
+        self.assertIs(get_advance_widths(font), widths)
+        self.assertEqual(set(widths.widths), {"a", "b", "c", " "})
+
+    def test_fit_text_shrinks_font(self):
+        fonts = {}
+        def get_font(size):
+            return fonts.setdefault(size, FixedWidthFont(size))
+        block = fit_text("aaaa bbbb cccc", get_font, (100, 20), 20, 5)
+        self.assertEqual(block.lines, ["aaaa bbbb", "cccc"])
+        self.assertEqual(block.font.size, 10)
+        self.assertLessEqual(block.height, 20)
+
+    def test_fit_text_cuts_off_at_min_size(self):
+        block = fit_text("aaaa " * 20, FixedWidthFont, (100, 20), 20, 10)
+        self.assertEqual(len(block.lines), 2)
+        self.assertTrue(block.lines[-1].endswith(ELLIPSIS))
+
+if __name__ == '__main__':
+    unittest.main()
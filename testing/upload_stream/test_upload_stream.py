@@ -0,0 +1,98 @@
+# pylint: skip-file
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+from werkzeug.test import EnvironBuilder
+
+import sys
+sys.path.append('html')
+from upload_stream import receive_images, discard_uploads, create_rendition
+from rate_limiter import RateLimiter
+
+def build_environ(files):
+    data = {name: (io.BytesIO(content), filename) for name, (content, filename) in files.items()}
+    return EnvironBuilder(method='POST', data=data).get_environ()
+
+def png_bytes(size=(64, 64)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+class TestUploadStream(unittest.TestCase):
+    def setUp(self):
+        self.tmp_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_folder)
+
+    def test_valid_image(self):
+        uploads = receive_images(build_environ({'file': (png_bytes(), 'photo.png')}), self.tmp_folder, 1024 * 1024)
+        self.assertEqual(len(uploads), 1)
+        self.assertIsNone(uploads[0].error)
+        self.assertEqual(uploads[0].format, 'PNG')
+        self.assertTrue(os.path.exists(uploads[0].path))
+        discard_uploads(uploads)
+        self.assertEqual(os.listdir(self.tmp_folder), [])
+
+    def test_rejects_non_image(self):
+        uploads = receive_images(build_environ({'file': (b'x' * 200000, 'photo.jpg')}), self.tmp_folder,
+                                 1024 * 1024)
+        self.assertIsNotNone(uploads[0].error)
+        self.assertEqual(os.listdir(self.tmp_folder), [])
+
+    def test_rejects_extension_and_size(self):
+        uploads = receive_images(build_environ({'file': (png_bytes(), 'photo.exe')}), self.tmp_folder, 1024 * 1024)
+        self.assertEqual(uploads[0].error, "File extension not accepted")
+
+        uploads = receive_images(build_environ({'file': (png_bytes((1000, 1000)), 'photo.png')}), self.tmp_folder,
+                                 100, max_content_length=1024 * 1024)
+        self.assertIn("larger", uploads[0].error)
+        self.assertEqual(os.listdir(self.tmp_folder), [])
+
+    def test_field_filter(self):
+        environ = build_environ({'file': (png_bytes(), 'a.png'), 'other': (png_bytes(), 'b.png')})
+        uploads = receive_images(environ, self.tmp_folder, 1024 * 1024, max_content_length=1024 * 1024, field='file')
+        self.assertEqual([upload.field for upload in uploads], ['file'])
+        discard_uploads(uploads)
+        self.assertEqual(os.listdir(self.tmp_folder), [])
+
+    def test_parallel_batch(self):
+        environ = build_environ({'a': (png_bytes(), 'a.png'), 'b': (b'x' * 1000, 'b.png'),
+                                 'c': (png_bytes(), 'c.png')})
+        uploads = receive_images(environ, self.tmp_folder, 1024 * 1024, max_content_length=1024 * 1024,
+                                 max_files=2, parallel=True)
+        self.assertIsNone(uploads[0].error)
+        self.assertIsNotNone(uploads[1].error)
+        self.assertEqual(uploads[2].error, "More than 2 files")
+        discard_uploads(uploads)
+        self.assertEqual(os.listdir(self.tmp_folder), [])
+
+    def test_animated_renditions(self):
+        frames = [Image.new('RGB', (64, 64), color) for color in ('red', 'blue')]
+        for image_format, destination, expected in (('PNG', 'a.jpg', 'JPEG'), ('GIF', 'b.gif', 'GIF')):
+            source = os.path.join(self.tmp_folder, "source")
+            frames[0].save(source, image_format, save_all=True, append_images=frames[1:])
+            destination = os.path.join(self.tmp_folder, destination)
+
+            self.assertTrue(create_rendition(source, destination))
+            with Image.open(destination) as image:
+                self.assertEqual(image.format, expected)
+            self.assertFalse(os.path.exists(source))
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_and_keys(self):
+        limiter = RateLimiter(rate=0.001, capacity=2)
+        self.assertTrue(limiter.consume("a")[0])
+        self.assertTrue(limiter.consume("a")[0])
+        allowed, retry_after = limiter.consume("a")
+        self.assertFalse(allowed)
+        self.assertGreaterEqual(retry_after, 1)
+        self.assertTrue(limiter.consume("b")[0])
+
+if __name__ == '__main__':
+    unittest.main()